@@ -1,21 +1,28 @@
 import streamlit as st
 import pandas as pd
+import math
 import time
-import json
-import re
-from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import undetected_chromedriver as uc
-from io import BytesIO
-import concurrent.futures
-import threading
+from contextlib import closing
+from collections import Counter
+
+from comment_crawler.archive import DATASETS, CommentArchive
+from comment_crawler.batch import crawl_urls
+from comment_crawler.cache import ResponseCache
+from comment_crawler.export import CommentExport
+from comment_crawler.jobs import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobRunner
+from comment_crawler.filters import (REJECT_KEYWORD, REJECT_MIN_WORDS, CommentFilter, parse_keywords,
+                                     summarize_rejects)
+from comment_crawler.keywords import KeywordIndex
+from comment_crawler.memo import ResultCache
+from comment_crawler.merge import MergedView
+from comment_crawler.neardup import NearDuplicateIndex
+from comment_crawler.sentiment import ASPECT_NAMES, SentimentIndex
+from comment_crawler.driver_pool import DriverPool, memory_capped_size
+from comment_crawler.shopee import ShopeeRatingsEngine, parse_item_url, parse_id_lines
+from comment_crawler.tiktok import TikTokCrawlOptions, crawl_comments, launch_driver, reset_driver
+from comment_crawler.store import CommentStore
+from comment_crawler.times import DAY, daily_counts, display_frame, format_epoch, now_epoch, resolve_times, to_epoch
+from comment_crawler.watermark import WatermarkStore
 
 # ============================================
 # 页面配置
@@ -73,14 +80,34 @@ st.markdown("""
 st.markdown('<h1 class="main-title">🛒 印尼电商与社交媒体评论爬取工具</h1>', unsafe_allow_html=True)
 
 # 初始化session state
+# 评论数据按列存储，显示和导出直接使用零拷贝的DataFrame视图
 if 'tt_product_comments' not in st.session_state:
-    st.session_state.tt_product_comments = []
+    st.session_state.tt_product_comments = CommentStore()
 if 'shopee_comments' not in st.session_state:
-    st.session_state.shopee_comments = []
+    st.session_state.shopee_comments = CommentStore(key_fields=('shop_id', 'product_id', 'rating_id'))
 if 'tt_video_comments' not in st.session_state:
-    st.session_state.tt_video_comments = []
+    st.session_state.tt_video_comments = CommentStore()
+# 合并视图随各数据集增量更新，按版本缓存合并结果
+if 'merged_view' not in st.session_state:
+    st.session_state.merged_view = MergedView()
+# 派生结果（统计、表格、导出文件）按数据版本缓存，重跑时数据没变就直接复用
+if 'result_cache' not in st.session_state:
+    st.session_state.result_cache = ResultCache()
+# 本会话提交的后台任务ID，以及结果已全部并入存储的任务
+if 'job_ids' not in st.session_state:
+    st.session_state.job_ids = []
+    st.session_state.jobs_synced = set()
 if 'crawler_status' not in st.session_state:
     st.session_state.crawler_status = {}
+# 关键词索引随评论存储增量更新，分析页重跑时不再重新分词
+if 'keyword_index' not in st.session_state:
+    st.session_state.keyword_index = KeywordIndex()
+# 情感评分按评论缓存，只为新增评论评分
+if 'sentiment_index' not in st.session_state:
+    st.session_state.sentiment_index = SentimentIndex()
+# 入库前被过滤的评论数：{数据集: (存储的清空代数, Counter)}，存储清空后作废
+if 'rejected_counts' not in st.session_state:
+    st.session_state.rejected_counts = {}
 
 # ============================================
 # 侧边栏配置
@@ -98,6 +125,30 @@ with st.sidebar:
     if use_multithreading:
         thread_count = st.slider("线程数量", 1, 10, 3)
     
+    # Shopee接口设置（实际并发由AIMD控制器根据限流和延迟自动调整）
+    shopee_connections = st.slider("Shopee最大并发连接数", 1, 100, 20)
+    shopee_rps = st.slider("Shopee每秒请求硬上限（0 为不限）", 0, 200, 0,
+                           help="默认由自适应并发控制根据429/5xx和延迟自动调速，只在需要额外限速时设置")
+    
+    # 响应缓存：重复爬取同一商品时直接读取本地磁盘
+    use_response_cache = st.checkbox("启用Shopee响应缓存", value=True)
+    if use_response_cache:
+        cache_ttl_hours = st.slider("缓存有效期(小时)", 1, 168, 24)
+    
+    # 增量爬取：只抓取上次水位线之后的新评论
+    shopee_incremental = st.checkbox("Shopee增量爬取（仅新评论）", value=False,
+                                     help="评论多于最大评论数时，之后每次先爬新评论，再接着补爬上次没爬完的旧评论")
+    # Shopee评论常只有星级没有文字，默认不按字数过滤（TikTok的最少字数在TikTok高级设置中）
+    shopee_min_words = st.number_input("Shopee最少字数", 0, 100, 0,
+                                       help="少于该词数的Shopee评论在入库前丢弃，0 为不限；排除关键词与TikTok共用")
+    
+    # TikTok浏览器池
+    driver_pool_size = st.slider("TikTok浏览器池大小", 1, 8, 2)
+    warm_browser_pool = st.checkbox("预热TikTok浏览器", value=False)
+    
+    # 本地归档库：刷新页面或重启后数据仍可查询，重复评论自动去重
+    persist_comments = st.checkbox("保存到本地数据库", value=True)
+    
     # 代理设置
     use_proxy = st.checkbox("使用代理服务器", value=False)
     if use_proxy:
@@ -109,7 +160,8 @@ with st.sidebar:
     st.markdown("### 📊 数据保存")
     
     # 数据格式
-    output_format = st.radio("输出格式", ["Excel", "CSV", "JSON"])
+    output_format = st.radio("输出格式", ["Excel", "CSV", "JSON", "NDJSON", "Parquet", "Feather"],
+                             help="Parquet/Feather按固定结构导出全部字段，保留原生类型，适合后续分析")
     
     # 自动保存
     auto_save = st.checkbox("自动保存数据", value=True)
@@ -150,9 +202,380 @@ with st.sidebar:
         ```
         """)
 
+# ============================================
+# 本地评论归档库
+# ============================================
+@st.cache_resource
+def get_comment_archive():
+    return CommentArchive("data/comments.sqlite")
+
+
+def archive_writer(dataset):
+    """在脚本线程中取得归档库，返回供后台任务按批写入的函数 write(context, rows) -> 新增条数"""
+    archive = get_comment_archive() if persist_comments else None
+    failures = []
+    
+    def write(context, rows):
+        if archive is None or not rows:
+            return 0
+        try:
+            return archive.upsert(dataset, rows)
+        except Exception as e:
+            # 同一任务只提示一次
+            if not failures:
+                context.note(f"写入数据库失败: {e}", 'warning')
+            failures.append(e)
+            return 0
+    
+    return write
+
+
+# ============================================
+# 后台爬取任务
+# ============================================
+# 同时运行的爬取任务数（进程内所有会话共享）
+JOB_WORKERS = 4
+# 有任务在运行时任务面板的刷新间隔（秒）
+JOB_POLL_SECONDS = 1.0
+JOB_STATES = {QUEUED: "⏳ 排队中", RUNNING: "🔄 运行中", DONE: "✅ 完成", FAILED: "❌ 失败", CANCELLED: "⏹️ 已取消"}
+
+
+@st.cache_resource
+def get_job_runner():
+    # 爬取在后台线程中运行，不阻塞Streamlit脚本线程；控件交互和切换选项卡不会中断爬取
+    return JobRunner(JOB_WORKERS)
+
+
+def submit_job(dataset, label, fn, replace=True):
+    """提交后台爬取任务；replace 时先清空该数据集，但同一数据集已有任务在运行时保留，结果合并"""
+    runner = get_job_runner()
+    if replace and not runner.active(dataset, st.session_state.job_ids):
+        st.session_state[f"{dataset}_comments"].clear()
+    st.session_state.job_ids.append(runner.submit(dataset, label, fn))
+    # 重跑一次，让任务面板出现并开始轮询
+    st.rerun()
+
+
+def sync_jobs():
+    """把后台任务已输出的评论并入会话中的存储；返回是否有任务刚刚结束"""
+    runner = get_job_runner()
+    finished = False
+    for job in runner.jobs(st.session_state.job_ids):
+        # 先看状态再取结果：任务结束前输出的行一定能在这一轮取完
+        done = job.finished
+        rows = runner.drain(job.id)
+        if rows:
+            st.session_state[f"{job.kind}_comments"].extend(rows)
+        if done and job.id not in st.session_state.jobs_synced:
+            st.session_state.jobs_synced.add(job.id)
+            if job.kind == 'shopee' and job.result:
+                record_rejects(job.kind, sum((result.rejected for result in job.result), Counter()))
+            finished = True
+    return finished
+
+
+def render_job_note(level, content):
+    if not content:
+        return
+    if level == 'table':
+        st.dataframe(pd.DataFrame(content), use_container_width=True)
+    elif level == 'caption':
+        st.caption(content)
+    else:
+        getattr(st, level)(content)
+
+
+def render_job_panel():
+    runner = get_job_runner()
+    if sync_jobs():
+        # 定时刷新时有任务结束：整页重跑，刷新结果表、分析和合并视图
+        st.rerun()
+    jobs = runner.jobs(st.session_state.job_ids)
+    if not jobs:
+        return
+    
+    st.markdown("### ⏳ 后台爬取任务")
+    for job in reversed(jobs):
+        with st.container(border=True):
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.markdown(f"**#{job.id} {job.label}** | {JOB_STATES[job.state]} | "
+                            f"{job.rows_emitted} 条评论 | {job.elapsed:.0f} 秒")
+                if not job.finished:
+                    st.progress(job.progress, text=job.message or None)
+                    if job.detail:
+                        st.caption(job.detail)
+                else:
+                    if job.error:
+                        st.error(f"❌ 爬取失败: {job.error}")
+                    for level, content in job.notes:
+                        render_job_note(level, content)
+            with col2:
+                if not job.finished:
+                    if st.button("取消", key=f"cancel_job_{job.id}", use_container_width=True):
+                        runner.cancel(job.id)
+                elif st.button("移除", key=f"forget_job_{job.id}", use_container_width=True):
+                    runner.forget(job.id)
+                    st.session_state.job_ids.remove(job.id)
+                    st.rerun()
+
+
+def render_jobs():
+    # 整页运行时在这里并入结果，片段内不会再检测到刚结束的任务，避免重跑吞掉本次的按钮点击
+    sync_jobs()
+    # 只在有任务运行时定时刷新；刷新只重跑任务面板这一片段
+    active = get_job_runner().active(job_ids=st.session_state.job_ids)
+    st.fragment(render_job_panel, run_every=JOB_POLL_SECONDS if active else None)()
+
+
+# ============================================
+# 数据导出
+# ============================================
+# timestamp 为导出时由 create_time 派生的WIB时间文本；time_text 为TikTok页面上的原始时间文本
+EXPORT_FIELDS = ['username', 'comment', 'rating', 'likes', 'timestamp', 'platform', 'product_id', 'shop_id',
+                 'video_id', 'item_name', 'variation', 'reply_count', 'images', 'product_url', 'crawl_date',
+                 'time_text']
+
+
+# 大表分页渲染，每页的行数
+TABLE_PAGE_ROWS = 1000
+
+
+def memo(key, version, compute):
+    """按数据版本缓存派生结果；key 需包含影响结果的所有参数"""
+    return st.session_state.result_cache.get(key, version, compute)
+
+
+@st.fragment
+def render_table(df, key, page_rows=TABLE_PAGE_ROWS):
+    # 只把当前页的行做显示转换并发送到浏览器；翻页只重跑本片段，不重跑整个页面
+    if len(df) <= page_rows:
+        st.dataframe(display_frame(df), use_container_width=True)
+        return
+    pages = math.ceil(len(df) / page_rows)
+    page = st.number_input(f"页码（共 {pages} 页）", 1, pages, 1, key=f"{key}_page")
+    start = (page - 1) * page_rows
+    stop = min(start + page_rows, len(df))
+    st.dataframe(display_frame(df.iloc[start:stop]), use_container_width=True)
+    st.caption(f"第 {start + 1}-{stop} 行，共 {len(df)} 行")
+
+
+def render_download(df, basename, sheet_name, label="📥 下载评论数据", version=None):
+    # 导出设置渲染在页面底部，通过session_state读取；文件在点击下载时才逐块生成
+    # 给定数据版本时，同一数据和导出设置生成的文件会被缓存，重复下载不再重新生成
+    export = CommentExport(
+        df,
+        f"{basename}_{format_epoch(now_epoch(), '%Y%m%d_%H%M%S')}",
+        output_format,
+        fields=st.session_state.get('export_fields', ['username', 'comment', 'rating', 'timestamp', 'platform']),
+        compress=st.session_state.get('export_compress', False),
+        split_size=st.session_state.get('export_split_size', 5000) if st.session_state.get('export_split') else None,
+        sheet_name=sheet_name
+    )
+    data = export.getvalue
+    if version is not None:
+        cache = st.session_state.result_cache
+        key = ('export', basename, export.fmt, tuple(export.columns or ()), export.compress, export.split_size,
+               sheet_name)
+        data = lambda: cache.get(key, version, export.getvalue)
+    st.download_button(
+        label=label,
+        data=data,
+        file_name=export.file_name,
+        mime=export.mime,
+        on_click="ignore",
+        use_container_width=True
+    )
+    if export.parts > 1:
+        st.caption(f"共 {len(export.frame)} 行，分为 {export.parts} 个文件打包下载")
+
+
 # ============================================
 # TikTok产品评论爬取模块
 # ============================================
+@st.cache_resource
+def _shared_driver_pool():
+    # 浏览器池在进程内共享，跨Streamlit重跑和会话存活；{'lean': 启动参数, 'pool': DriverPool}
+    return {}
+
+
+def get_driver_pool():
+    # 轻量浏览器模式决定Chrome启动参数，设置变化时换一个新池：旧池的空闲浏览器立即关闭，使用中的归还时关闭
+    lean = st.session_state.get('tt_lean_profile', True)
+    shared = _shared_driver_pool()
+    pool = shared.get('pool')
+    if pool is None or shared.get('lean') != lean:
+        if pool is not None:
+            pool.close()
+        pool = DriverPool(lambda: launch_driver(lean), max_size=driver_pool_size, warm_size=1, reset=reset_driver)
+        shared.update(lean=lean, pool=pool)
+    if pool.max_size != memory_capped_size(driver_pool_size):
+        pool.resize(driver_pool_size)
+    return pool
+
+
+BLOCKED_LABELS = {'media': "视频", 'image': "图片", 'font': "字体", 'tracker': "统计脚本", 'other': "其他"}
+
+
+# ============================================
+# 入库前评论过滤
+# ============================================
+@st.cache_resource
+def get_comment_filter(exclude_keywords, min_words):
+    # 关键词自动机只在设置变化时重新编译；过滤器无状态，可在会话和工作进程间共享
+    return CommentFilter(exclude_keywords, min_words)
+
+
+def comment_filter(min_words=None):
+    # 排除关键词在TikTok高级设置中，同时作用于TikTok和Shopee；最少字数默认取TikTok的设置，Shopee单独传入
+    if min_words is None:
+        min_words = st.session_state.get('filter_min_words', 3)
+    return get_comment_filter(parse_keywords(st.session_state.get('filter_exclude_keywords', '')), min_words)
+
+
+def record_rejects(dataset, rejected):
+    # 与当前存储对应；存储被清空（新的爬取替换旧结果）后重新计数
+    generation = st.session_state[f"{dataset}_comments"].generation
+    previous, counts = st.session_state.rejected_counts.get(dataset, (None, Counter()))
+    if previous != generation:
+        counts = Counter()
+    counts.update(rejected)
+    st.session_state.rejected_counts[dataset] = (generation, counts)
+
+
+def rejected_counts(dataset):
+    generation, counts = st.session_state.rejected_counts.get(dataset, (None, Counter()))
+    return counts if generation == st.session_state[f"{dataset}_comments"].generation else Counter()
+
+
+def reject_summary(rejected):
+    totals, keywords = summarize_rejects(rejected)
+    parts = []
+    if totals[REJECT_KEYWORD]:
+        detail = "、".join(f"{keyword} {count}" for keyword, count in keywords[:5])
+        parts.append(f"命中排除关键词 {totals[REJECT_KEYWORD]} 条（{detail}）")
+    if totals[REJECT_MIN_WORDS]:
+        parts.append(f"字数不足 {totals[REJECT_MIN_WORDS]} 条")
+    return "已过滤: " + " | ".join(parts) if parts else ''
+
+
+def tiktok_crawl_options():
+    # 高级设置中的控件渲染在爬取按钮之后，通过session_state读取
+    return TikTokCrawlOptions(
+        max_comments=max_comments,
+        include_ratings=include_ratings,
+        include_replies=include_replies,
+        capture_mode='network' if st.session_state.get('tt_capture_mode', "网络拦截") == "网络拦截" else 'dom',
+        wait_time=st.session_state.get('tt_wait_time', 3),
+        scroll_timeout=st.session_state.get('tt_scroll_pause', 2),
+        max_idle_scrolls=st.session_state.get('tt_retry_count', 2) + 1,
+        prune_nodes=st.session_state.get('tt_prune_nodes', True),
+        lean_profile=st.session_state.get('tt_lean_profile', True),
+        block_images=not include_images,
+        comment_filter=comment_filter()
+    )
+
+
+def tiktok_product_job(url):
+    # 控件取值和共享资源在脚本线程中取好，任务线程中不访问st
+    options = tiktok_crawl_options()
+    pool = get_driver_pool()
+    write_archive = archive_writer('tt_product')
+    
+    def run(context):
+        context.report(0, "正在获取浏览器...")
+        # 从预热的浏览器池取出driver，用完归还（不再每次冷启动Chrome）
+        with pool.driver() as driver:
+            context.report(0, "正在访问TikTok页面并加载评论...")
+            
+            def on_tt_rows(rows, loaded):
+                context.emit(rows)
+                write_archive(context, rows)
+                context.report(min(loaded / options.max_comments, 1.0), f"已加载 {loaded} 条评论...")
+            
+            rows, crawl_stats = crawl_comments(driver, url, options, on_tt_rows)
+        
+        if not rows:
+            context.note("未找到评论数据", 'warning')
+        for warning in crawl_stats.warnings:
+            context.note(warning, 'warning')
+        if crawl_stats.errors:
+            context.note(f"处理评论时出错: {crawl_stats.errors} 条评论解析失败", 'warning')
+        context.note(reject_summary(crawl_stats.rejected), 'caption')
+        if crawl_stats.responses:
+            context.note(f"截获评论接口响应 {crawl_stats.responses} 个，滚动 {crawl_stats.scrolls} 次", 'caption')
+        if crawl_stats.bytes_received or crawl_stats.blocked:
+            blocked_total = sum(crawl_stats.blocked.values())
+            blocked_detail = "、".join(f"{BLOCKED_LABELS.get(k, k)} {v}" for k, v in crawl_stats.blocked.items())
+            context.note(f"下载 {crawl_stats.bytes_received / 1024 / 1024:.1f} MB | 屏蔽请求 {blocked_total} 个"
+                     f"{'（' + blocked_detail + '）' if blocked_detail else ''} | "
+                     f"估计节省 {crawl_stats.estimated_bytes_saved() / 1024 / 1024:.1f} MB", 'caption')
+        
+        pool_stats = pool.stats()
+        context.note(f"浏览器池: 空闲 {pool_stats['idle']} | 使用中 {pool_stats['busy']} | "
+                 f"上限 {pool_stats['max_size']} | 已启动 {pool_stats['launched']} | "
+                 f"回收 {pool_stats['recycled']} | 崩溃 {pool_stats['crashed']}", 'caption')
+    
+    return run
+
+
+def tiktok_batch_job(urls):
+    options = tiktok_crawl_options()
+    # 每个工作进程各自持有一个无头浏览器，某个浏览器崩溃只影响触发崩溃的URL
+    workers = memory_capped_size(thread_count if use_multithreading else 1)
+    write_archive = archive_writer('tt_product')
+    
+    def run(context):
+        context.report(0, f"准备爬取 {len(urls)} 个产品的评论（{min(workers, len(urls))} 个浏览器进程）...")
+        summary = []
+        loaded = 0
+        rejected = Counter()
+        start_time = time.time()
+        # 取消时不等正在爬的页面：进程池收到取消信号后立即终止工作进程和浏览器
+        with closing(crawl_urls(urls, options, workers, stop=context.cancel_event)) as results:
+            for result in results:
+                context.emit(result.rows)
+                write_archive(context, result.rows)
+                rejected.update(result.rejected)
+                summary.append({
+                    'URL': result.url,
+                    '评论数': len(result.rows),
+                    '状态': "✅ 完成" if not result.error else f"❌ {result.error}",
+                    '备注': "；".join(result.warnings)
+                })
+                loaded += len(result.rows)
+                context.report(len(summary) / len(urls), f"已完成 {len(summary)}/{len(urls)} 个产品，共 {loaded} 条评论")
+        context.check()
+        
+        failed = sum(1 for row in summary if row['状态'] != "✅ 完成")
+        context.note(summary, 'table')
+        context.note(f"耗时 {time.time() - start_time:.1f} 秒 | 失败 {failed} 个", 'caption')
+        context.note(reject_summary(rejected), 'caption')
+    
+    return run
+
+
+def render_tt_product_results():
+    # 显示结果（后台任务的结果在任务面板轮询时并入存储）
+    if st.session_state.tt_product_comments:
+        st.success(f"✅ 成功爬取 {len(st.session_state.tt_product_comments)} 条评论")
+        
+        # 创建DataFrame
+        df_tt_product = st.session_state.tt_product_comments.frame()
+        
+        # 显示数据
+        render_table(df_tt_product, "tt_product_table")
+        
+        # 下载按钮
+        render_download(df_tt_product, "tiktok_product_comments", 'TikTok产品评论',
+                        version=st.session_state.tt_product_comments.version)
+
+
+if warm_browser_pool:
+    get_driver_pool()
+
+render_jobs()
+
 st.markdown('<div class="section-header">1. TikTok印尼产品评论爬取</div>', unsafe_allow_html=True)
 
 # 创建选项卡
@@ -184,177 +607,7 @@ with tab1:
         if not tt_product_url:
             st.error("请输入TikTok产品URL")
         else:
-            with st.spinner("正在初始化爬虫..."):
-                # 清空之前的数据
-                st.session_state.tt_product_comments = []
-                
-                # 创建状态指示器
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                try:
-                    # 初始化Chrome选项
-                    chrome_options = Options()
-                    chrome_options.add_argument("--headless")  # 无头模式
-                    chrome_options.add_argument("--no-sandbox")
-                    chrome_options.add_argument("--disable-dev-shm-usage")
-                    chrome_options.add_argument("--disable-gpu")
-                    chrome_options.add_argument("--window-size=1920,1080")
-                    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-                    
-                    # 使用undetected-chromedriver避免被检测
-                    driver = uc.Chrome(options=chrome_options)
-                    
-                    status_text.text("正在访问TikTok页面...")
-                    driver.get(tt_product_url)
-                    
-                    # 等待页面加载
-                    time.sleep(5)
-                    
-                    # 尝试获取视频ID
-                    video_id_match = re.search(r'video/(\d+)', tt_product_url)
-                    video_id = video_id_match.group(1) if video_id_match else "unknown"
-                    
-                    # 模拟滚动以加载评论
-                    status_text.text("正在加载评论...")
-                    
-                    # 获取初始评论
-                    comments_loaded = 0
-                    max_scrolls = 20  # 最大滚动次数
-                    
-                    for scroll in range(max_scrolls):
-                        # 执行JavaScript滚动
-                        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                        time.sleep(2)
-                        
-                        # 提取评论
-                        try:
-                            # 尝试不同的评论选择器
-                            comment_selectors = [
-                                "div[data-e2e='comment-list'] div.css-1soki6-DivCommentItemContainer",
-                                "div[class*='CommentItem']",
-                                "div.comment-item",
-                                "div[data-e2e='comment-item']"
-                            ]
-                            
-                            for selector in comment_selectors:
-                                comments = driver.find_elements(By.CSS_SELECTOR, selector)
-                                if comments:
-                                    break
-                            
-                            new_comments = len(comments) - comments_loaded
-                            if new_comments > 0:
-                                # 处理每个评论
-                                for i in range(comments_loaded, len(comments)):
-                                    try:
-                                        comment_element = comments[i]
-                                        
-                                        # 获取评论信息
-                                        comment_data = {
-                                            'video_id': video_id,
-                                            'crawl_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                            'platform': 'TikTok Shop'
-                                        }
-                                        
-                                        # 尝试获取用户名
-                                        try:
-                                            username_elem = comment_element.find_element(By.CSS_SELECTOR, "a[href*='/@'], span[class*='username']")
-                                            comment_data['username'] = username_elem.text.strip()
-                                        except:
-                                            comment_data['username'] = "Unknown"
-                                        
-                                        # 尝试获取评论内容
-                                        try:
-                                            content_elem = comment_element.find_element(By.CSS_SELECTOR, "div[class*='content'], p, span[class*='text']")
-                                            comment_data['comment'] = content_elem.text.strip()
-                                        except:
-                                            comment_data['comment'] = ""
-                                        
-                                        # 尝试获取点赞数
-                                        if include_ratings:
-                                            try:
-                                                likes_elem = comment_element.find_element(By.CSS_SELECTOR, "span[class*='like'], button[class*='like']")
-                                                comment_data['likes'] = likes_elem.text.strip()
-                                            except:
-                                                comment_data['likes'] = "0"
-                                        
-                                        # 尝试获取时间
-                                        try:
-                                            time_elem = comment_element.find_element(By.CSS_SELECTOR, "span[class*='time'], time")
-                                            comment_data['timestamp'] = time_elem.text.strip()
-                                        except:
-                                            comment_data['timestamp'] = ""
-                                        
-                                        # 尝试获取回复
-                                        if include_replies:
-                                            try:
-                                                reply_elem = comment_element.find_element(By.CSS_SELECTOR, "div[class*='reply'], button[class*='reply']")
-                                                comment_data['reply_count'] = reply_elem.text.strip()
-                                            except:
-                                                comment_data['reply_count'] = "0"
-                                        
-                                        st.session_state.tt_product_comments.append(comment_data)
-                                        
-                                    except Exception as e:
-                                        st.warning(f"处理评论时出错: {str(e)}")
-                                        continue
-                                
-                                comments_loaded = len(comments)
-                                st.session_state.crawler_status['tt_product'] = f"已加载 {comments_loaded} 条评论"
-                                
-                                # 更新进度
-                                progress = min((scroll + 1) / max_scrolls, 1.0)
-                                progress_bar.progress(progress)
-                                status_text.text(f"已加载 {comments_loaded} 条评论...")
-                                
-                        except Exception as e:
-                            st.warning(f"提取评论时出错: {str(e)}")
-                        
-                        # 如果达到最大数量，停止
-                        if comments_loaded >= max_comments:
-                            break
-                    
-                    driver.quit()
-                    
-                    # 显示结果
-                    if st.session_state.tt_product_comments:
-                        st.success(f"✅ 成功爬取 {len(st.session_state.tt_product_comments)} 条评论")
-                        
-                        # 创建DataFrame
-                        df_tt_product = pd.DataFrame(st.session_state.tt_product_comments)
-                        
-                        # 显示数据
-                        st.dataframe(df_tt_product, use_container_width=True)
-                        
-                        # 下载按钮
-                        output = BytesIO()
-                        if output_format == "Excel":
-                            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                                df_tt_product.to_excel(writer, index=False, sheet_name='TikTok产品评论')
-                            mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            file_name = f"tiktok_product_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                        elif output_format == "CSV":
-                            output.write(df_tt_product.to_csv(index=False).encode('utf-8'))
-                            mime_type = "text/csv"
-                            file_name = f"tiktok_product_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                        else:  # JSON
-                            output.write(df_tt_product.to_json(orient='records', indent=2).encode('utf-8'))
-                            mime_type = "application/json"
-                            file_name = f"tiktok_product_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                        
-                        st.download_button(
-                            label="📥 下载评论数据",
-                            data=output.getvalue(),
-                            file_name=file_name,
-                            mime=mime_type,
-                            use_container_width=True
-                        )
-                    else:
-                        st.warning("⚠️ 未找到评论数据")
-                
-                except Exception as e:
-                    st.error(f"❌ 爬取失败: {str(e)}")
-                    st.code(f"错误详情: {e}")
+            submit_job('tt_product', f"TikTok产品 {tt_product_url}", tiktok_product_job(tt_product_url))
 
 with tab2:
     st.markdown("### 📋 批量产品评论爬取")
@@ -370,8 +623,8 @@ with tab2:
         if not tt_urls_text.strip():
             st.error("请输入至少一个URL")
         else:
-            urls = [url.strip() for url in tt_urls_text.split('\n') if url.strip()]
-            st.info(f"准备爬取 {len(urls)} 个产品的评论...")
+            urls = list(dict.fromkeys(url.strip() for url in tt_urls_text.split('\n') if url.strip()))
+            submit_job('tt_product', f"TikTok批量 {len(urls)} 个产品", tiktok_batch_job(urls))
 
 with tab3:
     st.markdown("### ⚙️ TikTok爬取高级设置")
@@ -380,21 +633,181 @@ with tab3:
     
     with col1:
         st.markdown("**爬取策略**")
-        wait_time = st.slider("页面等待时间(秒)", 1, 10, 3)
-        scroll_pause = st.slider("滚动间隔时间(秒)", 1, 5, 2)
-        retry_count = st.slider("重试次数", 0, 5, 2)
+        wait_time = st.slider("页面等待时间(秒)", 1, 10, 3, key="tt_wait_time",
+                              help="评论列表出现即开始，此为最长等待时间")
+        scroll_pause = st.slider("滚动间隔时间(秒)", 1, 5, 2, key="tt_scroll_pause",
+                                 help="新评论加载完成即继续滚动，此为每次滚动的最长等待时间")
+        retry_count = st.slider("重试次数", 0, 5, 2, key="tt_retry_count",
+                                help="连续无新评论的额外滚动次数，超过后判定到达列表末尾")
+        prune_nodes = st.checkbox("释放已处理的评论节点", value=True, key="tt_prune_nodes",
+                                  help="提取后清空评论节点内容，长评论串也能保持浏览器内存稳定")
+        lean_profile = st.checkbox("轻量浏览器模式", value=True, key="tt_lean_profile",
+                                   help="屏蔽视频、字体和统计脚本（未勾选“包含图片”时也屏蔽图片），并限制渲染进程内存")
+        capture_mode = st.radio("评论采集方式", ["网络拦截", "页面解析"], key="tt_capture_mode", horizontal=True,
+                                help="网络拦截直接读取评论接口JSON（精确ID、整数点赞数、时间戳）；页面解析读取渲染后的文本")
     
     with col2:
         st.markdown("**数据过滤**")
-        min_words = st.number_input("最少字数", 0, 100, 3)
-        exclude_keywords = st.text_input("排除关键词（逗号分隔）", placeholder="spam,广告,推广")
+        min_words = st.number_input("最少字数", 0, 100, 3, key="filter_min_words",
+                                    help="按词计数（中文每个字算一个词），只作用于TikTok爬取；Shopee在侧边栏单独设置")
+        exclude_keywords = st.text_input("排除关键词（逗号分隔）", placeholder="spam,广告,推广",
+                                         key="filter_exclude_keywords",
+                                         help="不区分大小写，包含任一关键词的评论在入库前丢弃，同时作用于TikTok和Shopee爬取")
     
     st.markdown("**Cookies设置**")
     cookies_json = st.text_area("Cookies JSON", placeholder='{"tt_chain_token": "your_token", ...}', height=100)
 
+render_tt_product_results()
+
 # ============================================
 # Shopee印尼产品评论爬取模块
 # ============================================
+def shopee_filter_value(rating_filter):
+    return 0 if rating_filter == "全部" else int(rating_filter[0])
+
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache("data/http_cache.sqlite")
+
+
+def make_shopee_engine():
+    cache = None
+    if use_response_cache:
+        cache = get_response_cache()
+        cache.ttl = cache_ttl_hours * 3600
+    return ShopeeRatingsEngine(shopee_connections, shopee_rps, cache=cache)
+
+
+@st.cache_resource
+def get_watermark_store():
+    return WatermarkStore("data/watermarks.sqlite")
+
+
+def shopee_job(targets, rating_filter):
+    # 控件取值和共享资源在脚本线程中取好，任务线程中不访问st
+    engine = make_shopee_engine()
+    limit = max_comments
+    row_filter = comment_filter(shopee_min_words)
+    watermark_store = get_watermark_store() if shopee_incremental else None
+    cache = engine.cache
+    write_archive = archive_writer('shopee')
+    
+    def run(context):
+        items_done = []
+        
+        def on_page(result, rows):
+            # 每页写入一次归档库（一个事务），中途失败也不丢已爬数据
+            context.emit(rows)
+            write_archive(context, rows)
+            if len(targets) == 1:
+                context.report(min(len(result.rows) / limit, 1.0), f"已加载 {len(result.rows)} 条评论...",
+                               throttle_summary(engine))
+            else:
+                context.report(detail=throttle_summary(engine))
+        
+        def on_item(result):
+            items_done.append(result)
+            if len(targets) > 1:
+                context.report(len(items_done) / len(targets),
+                               f"已完成 {len(items_done)}/{len(targets)} 个产品，共 {engine.requests_sent} 次请求")
+        
+        started = time.time()
+        if watermark_store is not None:
+            results, known = engine.crawl_incremental(targets, watermark_store, limit, rating_filter,
+                                                      on_page, on_item, row_filter)
+        else:
+            results = engine.crawl_sync(targets, limit, rating_filter, on_page, on_item, row_filter=row_filter)
+        elapsed = time.time() - started
+        fetched = sum(len(r.rows) for r in results)
+        
+        rejected = Counter()
+        for result in results:
+            rejected.update(result.rejected)
+        
+        if watermark_store is not None:
+            # 已有数据按 (shop_id, product_id, rating_id) 去重，只追加新评论
+            context.note(f"增量模式: {known}/{len(targets)} 个产品已有水位线，新增 {fetched} 条评论")
+        
+        if len(targets) == 1:
+            if results[0].error:
+                context.note(results[0].error, 'error')
+            elif not results[0].rows:
+                context.note("未找到更多评论数据", 'warning')
+        else:
+            context.note(f"耗时 {elapsed:.1f} 秒，{engine.requests_sent} 次请求，"
+                         f"{fetched / max(elapsed, 1e-6):.1f} 条/秒", 'caption')
+            # 各产品爬取概况
+            context.note([
+                {'shop_id': r.shopid, 'product_id': r.itemid, 'comments': len(r.rows),
+                 'pages': r.pages, 'error': r.error}
+                for r in results
+            ], 'table')
+        context.note(reject_summary(rejected), 'caption')
+        if cache is not None:
+            context.note(cache_summary(cache), 'caption')
+        return results
+    
+    return run
+
+
+def cache_summary(cache):
+    stats = cache.stats()
+    return (
+        f"响应缓存: 命中 {stats['hits']} | 未命中 {stats['misses']} | "
+        f"重新验证 {stats['revalidated']} | 淘汰 {stats['evictions']} | "
+        f"{stats['entries']} 条 / {stats['size_bytes'] / 1024 / 1024:.1f} MB"
+    )
+
+
+def throttle_summary(engine):
+    stats = engine.stats()
+    return (
+        f"并发 {stats.get('concurrency', 0)}（在途 {stats.get('in_flight', 0)}） | "
+        f"吞吐 {stats.get('throughput', 0):.1f} 请求/秒 | "
+        f"p95延迟 {stats.get('p95_latency', 0) * 1000:.0f}ms | "
+        f"错误率 {stats.get('error_rate', 0):.0%} | "
+        f"退避 {stats.get('backoffs', 0)} 次 | 状态: {stats.get('state', '-')}"
+    )
+
+
+def render_shopee_results():
+    # 显示结果（后台任务的结果在任务面板轮询时并入存储）
+    rejected = reject_summary(rejected_counts('shopee'))
+    if st.session_state.shopee_comments:
+        st.success(f"✅ 成功爬取 {len(st.session_state.shopee_comments)} 条Shopee评论")
+        if rejected:
+            st.caption(rejected)
+        
+        # 创建DataFrame
+        df_shopee = st.session_state.shopee_comments.frame()
+        
+        # 显示数据
+        render_table(df_shopee, "shopee_table")
+        
+        # 显示统计信息
+        version = st.session_state.shopee_comments.version
+        avg_rating, total_likes, with_images = memo(('shopee_stats',), version, lambda: (
+            df_shopee['rating'].mean(),
+            df_shopee['likes'].sum(),
+            df_shopee['images'].notna().sum() if 'images' in df_shopee.columns else 0
+        ))
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("平均评分", f"{avg_rating:.1f} ⭐")
+        
+        with col2:
+            st.metric("总点赞数", total_likes)
+        
+        with col3:
+            st.metric("带图评论", with_images)
+        
+        # 下载按钮
+        render_download(df_shopee, "shopee_comments", 'Shopee评论', version=version)
+    elif rejected:
+        st.warning(f"爬取到的Shopee评论全部在入库前被过滤。{rejected}")
+
+
 st.markdown('<div class="section-header">2. Shopee印尼产品评论爬取</div>', unsafe_allow_html=True)
 
 shopee_tab1, shopee_tab2 = st.tabs(["单产品爬取", "产品ID批量爬取"])
@@ -426,154 +839,27 @@ with shopee_tab1:
         if not shopee_url:
             st.error("请输入Shopee产品URL")
         else:
-            with st.spinner("正在解析Shopee产品信息..."):
-                try:
-                    # 从URL提取shopid和itemid
-                    shopid_match = re.search(r'i\.(\d+)\.(\d+)', shopee_url)
-                    if shopid_match:
-                        shopid = shopid_match.group(1)
-                        itemid = shopid_match.group(2)
-                        
-                        st.success(f"✅ 解析成功: ShopID={shopid}, ItemID={itemid}")
-                        
-                        # 使用Shopee API获取评论
-                        base_url = "https://shopee.co.id/api/v2/item/get_ratings"
-                        
-                        comments = []
-                        offset = 0
-                        limit = 50
-                        
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        while len(comments) < max_comments:
-                            # 构建API参数
-                            params = {
-                                'itemid': itemid,
-                                'shopid': shopid,
-                                'limit': limit,
-                                'offset': offset,
-                                'filter': 0 if shopee_rating_filter == "全部" else int(shopee_rating_filter[0]),
-                                'flag': 1,
-                                'type': 0
-                            }
-                            
-                            # 添加请求头
-                            headers = {
-                                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                                'Accept': 'application/json',
-                                'Accept-Language': 'id-ID,id;q=0.9,en;q=0.8',
-                                'Referer': shopee_url
-                            }
-                            
-                            # 发送请求
-                            response = requests.get(base_url, params=params, headers=headers)
-                            
-                            if response.status_code == 200:
-                                data = response.json()
-                                
-                                if data.get('data') and data['data'].get('ratings'):
-                                    ratings = data['data']['ratings']
-                                    
-                                    for rating in ratings:
-                                        comment_data = {
-                                            'product_id': itemid,
-                                            'shop_id': shopid,
-                                            'crawl_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                            'platform': 'Shopee Indonesia',
-                                            'username': rating.get('author_username', ''),
-                                            'rating': rating.get('rating_star', 0),
-                                            'comment': rating.get('comment', ''),
-                                            'likes': rating.get('like_count', 0),
-                                            'timestamp': datetime.fromtimestamp(rating.get('ctime', 0)).strftime('%Y-%m-%d %H:%M:%S'),
-                                            'item_name': rating.get('product_items', [{}])[0].get('name', '') if rating.get('product_items') else '',
-                                            'variation': rating.get('product_items', [{}])[0].get('model_name', '') if rating.get('product_items') else ''
-                                        }
-                                        
-                                        # 处理图片
-                                        if rating.get('images'):
-                                            comment_data['images'] = ','.join(rating['images'])
-                                        
-                                        comments.append(comment_data)
-                                    
-                                    st.session_state.shopee_comments = comments
-                                    status_text.text(f"已加载 {len(comments)} 条评论...")
-                                    progress_bar.progress(min(len(comments) / max_comments, 1.0))
-                                    
-                                    # 如果没有更多评论或达到限制，停止
-                                    if len(ratings) < limit or len(comments) >= max_comments:
-                                        break
-                                    
-                                    offset += limit
-                                    time.sleep(1)  # 避免请求过快
-                                
-                                else:
-                                    st.warning("未找到更多评论数据")
-                                    break
-                            else:
-                                st.error(f"API请求失败: {response.status_code}")
-                                break
-                        
-                        # 显示结果
-                        if st.session_state.shopee_comments:
-                            st.success(f"✅ 成功爬取 {len(st.session_state.shopee_comments)} 条Shopee评论")
-                            
-                            # 创建DataFrame
-                            df_shopee = pd.DataFrame(st.session_state.shopee_comments)
-                            
-                            # 显示数据
-                            st.dataframe(df_shopee, use_container_width=True)
-                            
-                            # 显示统计信息
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                avg_rating = df_shopee['rating'].mean()
-                                st.metric("平均评分", f"{avg_rating:.1f} ⭐")
-                            
-                            with col2:
-                                total_likes = df_shopee['likes'].sum()
-                                st.metric("总点赞数", total_likes)
-                            
-                            with col3:
-                                with_images = df_shopee['images'].notna().sum() if 'images' in df_shopee.columns else 0
-                                st.metric("带图评论", with_images)
-                            
-                            # 下载按钮
-                            output = BytesIO()
-                            if output_format == "Excel":
-                                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                                    df_shopee.to_excel(writer, index=False, sheet_name='Shopee评论')
-                                mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                file_name = f"shopee_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                            elif output_format == "CSV":
-                                output.write(df_shopee.to_csv(index=False).encode('utf-8'))
-                                mime_type = "text/csv"
-                                file_name = f"shopee_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                            else:  # JSON
-                                output.write(df_shopee.to_json(orient='records', indent=2).encode('utf-8'))
-                                mime_type = "application/json"
-                                file_name = f"shopee_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                            
-                            st.download_button(
-                                label="📥 下载Shopee评论数据",
-                                data=output.getvalue(),
-                                file_name=file_name,
-                                mime=mime_type,
-                                use_container_width=True
-                            )
-                        else:
-                            st.warning("⚠️ 未找到评论数据")
-                    
-                    else:
-                        st.error("❌ 无法从URL解析产品ID")
-                
-                except Exception as e:
-                    st.error(f"❌ 爬取失败: {str(e)}")
-                    st.code(f"错误详情: {e}")
+            # 从URL提取shopid和itemid
+            parsed = parse_item_url(shopee_url)
+            if parsed:
+                shopid, itemid = parsed
+                submit_job('shopee', f"Shopee产品 ShopID={shopid}, ItemID={itemid}",
+                           shopee_job([(shopid, itemid)], shopee_filter_value(shopee_rating_filter)),
+                           replace=not shopee_incremental)
+            else:
+                st.error("❌ 无法从URL解析产品ID")
 
 with shopee_tab2:
     st.markdown("### 📋 通过产品ID批量爬取")
     
+    if use_response_cache and st.button("🗑️ 清空Shopee响应缓存"):
+        get_response_cache().clear()
+        st.success("✅ 缓存已清空")
+    
+    if shopee_incremental and st.button("🔄 重置增量水位线"):
+        get_watermark_store().reset()
+        st.success("✅ 水位线已重置，下次将全量爬取")
+    
     shopee_ids_text = st.text_area(
         "输入多个产品ID（格式: shopid,itemid，每行一对）",
         placeholder="123456789,9876543210\n234567890,8765432109",
@@ -584,8 +870,14 @@ with shopee_tab2:
         if not shopee_ids_text.strip():
             st.error("请输入至少一个产品ID")
         else:
-            ids = [line.strip() for line in shopee_ids_text.split('\n') if line.strip()]
-            st.info(f"准备爬取 {len(ids)} 个产品的评论...")
+            targets = parse_id_lines(shopee_ids_text)
+            if not targets:
+                st.error("未解析到有效的产品ID（格式: shopid,itemid）")
+            else:
+                submit_job('shopee', f"Shopee批量 {len(targets)} 个产品", shopee_job(targets, 0),
+                           replace=not shopee_incremental)
+
+render_shopee_results()
 
 # ============================================
 # TikTok热门视频评论爬取模块
@@ -648,7 +940,7 @@ with tt_video_tab1:
                 'username': 'user_indonesia1',
                 'comment': 'Produknya bagus banget! 👍',
                 'likes': 45,
-                'timestamp': '2小时前',
+                'time_text': '2小时前',
                 'user_followers': '1.2k',
                 'location': 'Jakarta'
             },
@@ -657,7 +949,7 @@ with tt_video_tab1:
                 'username': 'reviewer_id',
                 'comment': 'Harga terjangkau, kualitas oke',
                 'likes': 89,
-                'timestamp': '5小时前',
+                'time_text': '5小时前',
                 'user_followers': '5.7k',
                 'location': 'Surabaya'
             },
@@ -666,14 +958,15 @@ with tt_video_tab1:
                 'username': 'shop_lover',
                 'comment': 'Mau coba juga nih, ada diskon ga?',
                 'likes': 23,
-                'timestamp': '1天前',
+                'time_text': '1天前',
                 'user_followers': '890',
                 'location': 'Bandung'
             }
         ]
         
         df_example = pd.DataFrame(example_comments)
-        st.dataframe(df_example, use_container_width=True)
+        df_example['create_time'] = resolve_times(df_example['time_text'], now_epoch()).view('datetime64[s]')
+        st.dataframe(display_frame(df_example), use_container_width=True)
         
         st.markdown("""
         **实际实现需要**: 
@@ -739,7 +1032,9 @@ with tt_video_tab2:
 # ============================================
 st.markdown('<div class="section-header">📊 数据管理与导出</div>', unsafe_allow_html=True)
 
-data_tabs = st.tabs(["数据合并", "数据分析", "导出设置"])
+DATASET_LABELS = {'tt_product': "TikTok产品评论", 'shopee': "Shopee评论", 'tt_video': "TikTok视频评论"}
+
+data_tabs = st.tabs(["数据合并", "数据分析", "导出设置", "历史数据库"])
 
 with data_tabs[0]:
     st.markdown("### 🔗 合并所有爬取的数据")
@@ -747,77 +1042,76 @@ with data_tabs[0]:
     # 选择要合并的数据集
     datasets_to_merge = st.multiselect(
         "选择要合并的数据集",
-        ["TikTok产品评论", "Shopee评论", "TikTok视频评论"],
-        default=["TikTok产品评论", "Shopee评论"]
+        DATASETS,
+        default=['tt_product', 'shopee'],
+        format_func=DATASET_LABELS.get
     )
     
+    # 只转换上次合并之后新增的评论
+    merged_view = st.session_state.merged_view
+    for dataset in DATASETS:
+        merged_view.sync(dataset, st.session_state[f"{dataset}_comments"])
+    
     if st.button("合并数据", use_container_width=True):
-        all_data = []
-        
-        if "TikTok产品评论" in datasets_to_merge and st.session_state.tt_product_comments:
-            all_data.extend(st.session_state.tt_product_comments)
-        
-        if "Shopee评论" in datasets_to_merge and st.session_state.shopee_comments:
-            all_data.extend(st.session_state.shopee_comments)
-        
-        if "TikTok视频评论" in datasets_to_merge and st.session_state.tt_video_comments:
-            all_data.extend(st.session_state.tt_video_comments)
-        
-        if all_data:
-            df_merged = pd.DataFrame(all_data)
-            st.success(f"✅ 合并成功！共 {len(all_data)} 条记录")
-            st.dataframe(df_merged.head(20), use_container_width=True)
+        st.session_state.merge_shown = True
+    
+    if st.session_state.get('merge_shown'):
+        df_merged = merged_view.frame(datasets_to_merge)
+        if df_merged is not None:
+            st.success(f"✅ 合并成功！共 {len(df_merged)} 条记录")
+            st.caption(f"数据版本 v{merged_view.version}，有新数据时自动更新")
+            render_table(df_merged, "merged_table")
             
             # 导出合并数据
-            output = BytesIO()
-            if output_format == "Excel":
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df_merged.to_excel(writer, index=False, sheet_name='合并评论数据')
-                mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                file_name = f"merged_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-            elif output_format == "CSV":
-                output.write(df_merged.to_csv(index=False).encode('utf-8'))
-                mime_type = "text/csv"
-                file_name = f"merged_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            else:  # JSON
-                output.write(df_merged.to_json(orient='records', indent=2).encode('utf-8'))
-                mime_type = "application/json"
-                file_name = f"merged_comments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            
-            st.download_button(
-                label="📥 下载合并数据",
-                data=output.getvalue(),
-                file_name=file_name,
-                mime=mime_type,
-                use_container_width=True
-            )
+            render_download(df_merged, "merged_comments", '合并评论数据', label="📥 下载合并数据",
+                            version=(merged_view.version, tuple(datasets_to_merge)))
         else:
             st.warning("没有可合并的数据")
 
+SENTIMENT_LABELS = {'comments': "评论数", 'score': "平均情感", 'positive': "正面占比", 'negative': "负面占比",
+                    'price': "价格", 'quality': "质量", 'shipping': "物流", 'packaging': "包装", 'service': "服务"}
+
+TEMPLATE_LABELS = {'comments': "评论数", 'users': "账号数", 'items': "商品/视频数", 'example': "示例评论"}
+
+
+def near_duplicate_index(threshold, min_cluster_size, min_length):
+    # 检测设置变化时重建索引，否则沿用已有签名和分桶，只处理新增评论
+    index = st.session_state.get('near_duplicate_index')
+    if index is None or index.config() != (threshold, index.num_perm, index.shingle_size, min_length, min_cluster_size):
+        index = NearDuplicateIndex(threshold, min_length=min_length, min_cluster_size=min_cluster_size)
+        st.session_state.near_duplicate_index = index
+    return index
+
+
 with data_tabs[1]:
     st.markdown("### 📈 数据分析")
     
     if st.session_state.shopee_comments:
-        df_shopee = pd.DataFrame(st.session_state.shopee_comments)
+        df_shopee = st.session_state.shopee_comments.frame()
+        # 以下统计都按Shopee数据版本缓存，与数据无关的控件交互不会触发重算
+        shopee_version = st.session_state.shopee_comments.version
         
         col1, col2, col3 = st.columns(3)
         
         with col1:
             # 评分分布
             st.markdown("**评分分布**")
-            rating_counts = df_shopee['rating'].value_counts().sort_index()
+            rating_counts = memo(('rating_counts',), shopee_version,
+                                 lambda: df_shopee['rating'].value_counts().sort_index())
             for rating, count in rating_counts.items():
                 st.write(f"{'⭐' * int(rating)}: {count} 条")
         
         with col2:
-            # 词云生成（模拟）
+            # 热门关键词（增量索引，只处理新增评论）
             st.markdown("**热门关键词**")
-            from collections import Counter
-            import re
+            keyword_index = st.session_state.keyword_index
+            keyword_index.sync('shopee', st.session_state.shopee_comments)
             
-            all_comments = ' '.join(df_shopee['comment'].dropna().astype(str))
-            words = re.findall(r'\b\w{3,}\b', all_comments.lower())
-            word_counts = Counter(words).most_common(10)
+            ngram = st.selectbox("词组长度", [1, 2, 3], format_func=lambda n: f"{n}个词", key="kw_ngram")
+            keyword_items = memo(('keyword_items',), shopee_version, lambda: keyword_index.items('shopee'))
+            keyword_item = st.selectbox("商品", ["全部"] + keyword_items, key="kw_item")
+            word_counts = memo(('keywords', ngram, keyword_item), shopee_version, lambda: keyword_index.top(
+                'shopee', 10, n=ngram, item=None if keyword_item == "全部" else keyword_item))
             
             for word, count in word_counts:
                 st.write(f"{word}: {count}")
@@ -825,11 +1119,70 @@ with data_tabs[1]:
         with col3:
             # 时间分布
             st.markdown("**评论时间分布**")
-            if 'timestamp' in df_shopee.columns:
-                df_shopee['date'] = pd.to_datetime(df_shopee['timestamp']).dt.date
-                daily_counts = df_shopee['date'].value_counts().sort_index().tail(7)
-                for date, count in daily_counts.items():
+            if 'create_time' in df_shopee.columns:
+                # 直接对UTC epoch按WIB自然日计数，不解析字符串
+                recent_days = memo(('daily_counts',), shopee_version,
+                                   lambda: daily_counts(df_shopee['create_time'], days=7))
+                for date, count in recent_days.items():
                     st.write(f"{date}: {count} 条")
+        
+        # 情感与方面分析（离线词典，向量化批量评分）
+        st.markdown("**情感分析**")
+        sentiment_index = st.session_state.sentiment_index
+        
+        def summarize_sentiment():
+            sentiment = sentiment_index.sync('shopee', st.session_state.shopee_comments)
+            shares = [(sentiment['label'] == label).mean() for label in (1, 0, -1)]
+            aspects = pd.DataFrame([{
+                '方面': SENTIMENT_LABELS[name],
+                '提及评论数': int(sentiment[name].notna().sum()),
+                '平均得分': round(float(sentiment[name].mean()), 2) if sentiment[name].notna().any() else None,
+            } for name in ASPECT_NAMES])
+            return shares, aspects
+        
+        (positive, neutral, negative), aspects = memo(('sentiment',), shopee_version, summarize_sentiment)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("正面评论", f"{positive:.0%}")
+        with col2:
+            st.metric("中性评论", f"{neutral:.0%}")
+        with col3:
+            st.metric("负面评论", f"{negative:.0%}")
+        
+        st.dataframe(aspects, use_container_width=True, hide_index=True)
+        
+        sentiment_by = st.radio("汇总方式", ["按商品", "按日期"], horizontal=True, key="sentiment_by")
+        sentiment_summary = memo(('sentiment_by', sentiment_by), shopee_version, lambda: sentiment_index.aggregate(
+            'shopee', st.session_state.shopee_comments, by='item' if sentiment_by == "按商品" else 'day'))
+        st.dataframe(sentiment_summary.rename(columns=SENTIMENT_LABELS).round(2), use_container_width=True)
+    
+    # 近似重复与模板评论（MinHash + LSH），TikTok和Shopee数据均可检测
+    st.markdown("**疑似模板/刷单评论**")
+    with st.expander("检测设置"):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            dup_dataset = st.selectbox("数据集", DATASETS, index=DATASETS.index('shopee'),
+                                       format_func=DATASET_LABELS.get, key="dup_dataset")
+        with col2:
+            dup_threshold = st.slider("相似度阈值", 0.5, 0.95, 0.7, 0.05, key="dup_threshold",
+                                      help="按5字符片段估计的Jaccard相似度，超过即视为同一模板")
+        with col3:
+            dup_min_cluster = st.number_input("最少重复条数", 2, 100, 3, key="dup_min_cluster")
+        with col4:
+            dup_min_length = st.number_input("最短评论长度", 5, 200, 20, key="dup_min_length",
+                                             help="更短的评论（如 “bagus”）自然重复很多，不参与检测")
+    
+    dup_store = st.session_state[f"{dup_dataset}_comments"]
+    if dup_store:
+        dup_index = near_duplicate_index(dup_threshold, dup_min_cluster, dup_min_length)
+        templates = memo(('templates', dup_dataset) + dup_index.config(), dup_store.version,
+                         lambda: dup_index.templates(dup_dataset, dup_store))
+        if templates.empty:
+            st.info("未发现来自多个账号或商品的近似重复评论")
+        else:
+            st.caption(f"发现 {len(templates)} 个模板簇，共 {templates['comments'].sum()} 条评论")
+            st.dataframe(templates.drop(columns='cluster').rename(columns=TEMPLATE_LABELS).head(50),
+                         use_container_width=True, hide_index=True)
 
 with data_tabs[2]:
     st.markdown("### ⚙️ 导出设置")
@@ -839,16 +1192,19 @@ with data_tabs[2]:
     with col1:
         st.markdown("**导出选项**")
         include_metadata = st.checkbox("包含元数据", value=True)
-        compress_data = st.checkbox("压缩数据", value=False)
-        split_large_files = st.checkbox("分割大文件", value=False)
+        compress_data = st.checkbox("压缩数据", value=False, key="export_compress",
+                                    help="CSV/JSON导出为gzip，分卷导出为压缩的zip")
+        split_large_files = st.checkbox("分割大文件", value=False, key="export_split")
         
         if split_large_files:
-            split_size = st.number_input("每个文件最大行数", 1000, 10000, 5000)
+            split_size = st.number_input("每个文件最大行数", 1000, 1000000, 5000, key="export_split_size",
+                                         help="超过此行数时按分卷打包为zip")
     
     with col2:
         st.markdown("**字段选择**")
         default_fields = ['username', 'comment', 'rating', 'timestamp', 'platform']
-        selected_fields = st.multiselect("选择导出的字段", default_fields, default=default_fields)
+        selected_fields = st.multiselect("选择导出的字段", EXPORT_FIELDS, default=default_fields, key="export_fields",
+                                         help="数据集中没有的字段会被跳过；不选则导出全部字段")
     
     st.markdown("**自动导出设置**")
     auto_export_interval = st.selectbox(
@@ -856,6 +1212,57 @@ with data_tabs[2]:
         ["不自动导出", "每小时", "每天", "每次爬取后"]
     )
 
+with data_tabs[3]:
+    st.markdown("### 🗄️ 历史数据库")
+    
+    archive = get_comment_archive()
+    summary = archive.summary()
+    if not summary:
+        st.info("数据库中还没有评论，爬取时勾选侧边栏的“保存到本地数据库”即可自动归档")
+    else:
+        st.dataframe(pd.DataFrame([{
+            '数据集': DATASET_LABELS.get(row['dataset'], row['dataset']),
+            '评论数': row['comments'],
+            '商品/视频数': row['items'],
+            '最早评论': format_epoch(row['first_comment'], '%Y-%m-%d'),
+            '最新评论': format_epoch(row['last_comment'], '%Y-%m-%d'),
+            '最近爬取': format_epoch(row['last_crawl'], '%Y-%m-%d %H:%M'),
+        } for row in summary]), use_container_width=True)
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            db_dataset = st.selectbox("数据集", DATASETS, format_func=DATASET_LABELS.get, key="db_dataset")
+        with col2:
+            db_item = st.text_input("商品/视频ID", key="db_item")
+        with col3:
+            db_dates = st.date_input("评论日期范围", value=(), key="db_dates")
+        with col4:
+            db_rating = st.selectbox("评分", [0, 1, 2, 3, 4, 5], format_func=lambda r: "全部" if not r else f"{r}⭐",
+                                     key="db_rating")
+        
+        # 日期范围（WIB自然日）按索引过滤 created_at，结束日期包含当天
+        db_filters = {'dataset': db_dataset, 'item_id': db_item.strip() or None, 'rating': db_rating or None}
+        if len(db_dates) == 2:
+            db_filters['start'] = to_epoch(db_dates[0])
+            db_filters['end'] = to_epoch(db_dates[1]) + DAY
+        
+        matched = archive.count(**db_filters)
+        st.caption(f"符合条件的评论: {matched} 条")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔍 预览最近1000条", use_container_width=True):
+                preview = CommentStore()
+                preview.extend(next(archive.query(limit=1000, **db_filters), []))
+                st.dataframe(display_frame(preview.frame()), use_container_width=True)
+        with col2:
+            if st.button("📂 载入到当前会话", use_container_width=True):
+                target = st.session_state[f"{db_dataset}_comments"]
+                target.clear()
+                for batch in archive.query(**db_filters):
+                    target.extend(batch)
+                st.success(f"✅ 已载入 {len(target)} 条{DATASET_LABELS[db_dataset]}")
+
 # ============================================
 # 页脚
 # ============================================
@@ -892,15 +1299,18 @@ with st.expander("📋 部署说明"):
     4. 点击 Commit changes
     5. 创建 requirements.txt 文件，内容如下：
     ```
+    """)
     
     st.code("""
-streamlit>=1.28.0
+streamlit>=1.52.0
 pandas>=2.0.0
 requests>=2.31.0
 beautifulsoup4>=4.12.0
 selenium>=4.15.0
 undetected-chromedriver>=3.5.0
 lxml>=4.9.0
+aiohttp>=3.9.0
+pyarrow>=14.0.0
 """, language='text')
     
     st.markdown("""
@@ -0,0 +1 @@
+# 印尼电商评论爬取核心库（与Streamlit界面解耦）
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .store import parse_count
+from .times import to_epoch
+
+# 数据集名称（与session_state中的存储一一对应）
+DATASETS = ('tt_product', 'shopee', 'tt_video')
+
+# 独立成列的字段，其余字段放在extra(JSON)中
+COLUMN_FIELDS = ('platform', 'item_id', 'shop_id', 'username', 'comment', 'rating', 'likes',
+                 'reply_count', 'created_at', 'crawled_at')
+MAPPED_FIELDS = {'product_id', 'video_id', 'rating_id', 'comment_id', 'create_time', 'crawl_date'}
+# 旧版本行中格式化后的时间文本，由 created_at 派生，不再保存
+DISPLAY_FIELDS = {'timestamp'}
+# 重复爬取时需要刷新的可变字段
+MUTABLE_FIELDS = ('likes', 'reply_count', 'crawled_at', 'extra')
+
+
+def native_id(row):
+    """平台原生评论ID（Shopee rating_id / TikTok comment_id），没有时用内容哈希"""
+    for name in ('rating_id', 'comment_id'):
+        if row.get(name) not in (None, ''):
+            return str(row[name])
+    # 页面解析得到的相对时间会随时间变化，不参与哈希
+    content = '\x1f'.join(str(row.get(name) or '') for name in ('video_id', 'product_id', 'username', 'comment'))
+    return 'h:' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def row_to_record(dataset, row):
+    extra = {k: v for k, v in row.items()
+             if k not in MAPPED_FIELDS and k not in COLUMN_FIELDS and k not in DISPLAY_FIELDS}
+    return {
+        'dataset': dataset,
+        'platform': row.get('platform') or dataset,
+        'native_id': native_id(row),
+        'item_id': str(row.get('product_id') or row.get('video_id') or ''),
+        'shop_id': None if row.get('shop_id') is None else str(row['shop_id']),
+        'username': row.get('username'),
+        'comment': row.get('comment'),
+        'rating': parse_count(row.get('rating')),
+        'likes': parse_count(row.get('likes')),
+        'reply_count': parse_count(row.get('reply_count')),
+        'created_at': to_epoch(row.get('create_time')),
+        'crawled_at': to_epoch(row.get('crawl_date')) or int(time.time()),
+        'extra': json.dumps(extra, ensure_ascii=False, default=str) if extra else None,
+    }
+
+
+def record_to_row(record):
+    """数据库记录还原为爬虫输出的行格式"""
+    record = dict(record)
+    row = {
+        'platform': record['platform'],
+        'username': record['username'],
+        'comment': record['comment'],
+    }
+    if record['dataset'] == 'shopee':
+        row.update(product_id=record['item_id'], shop_id=record['shop_id'])
+        # 内容哈希ID（h:…）不是评分ID，留空
+        if not record['native_id'].startswith('h:'):
+            row['rating_id'] = parse_count(record['native_id'])
+    else:
+        row['video_id'] = record['item_id']
+        if not record['native_id'].startswith('h:'):
+            row['comment_id'] = record['native_id']
+    for name in ('rating', 'likes', 'reply_count'):
+        if record[name] is not None:
+            row[name] = record[name]
+    if record['created_at'] is not None:
+        row['create_time'] = record['created_at']
+    row['crawl_date'] = record['crawled_at']
+    if record['extra']:
+        extra = json.loads(record['extra'])
+        for name in DISPLAY_FIELDS:
+            extra.pop(name, None)
+        row.update(extra)
+    return row
+
+
+# ============================================
+# 本地评论归档库（SQLite WAL，按平台+原生ID去重）
+# ============================================
+class CommentArchive:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS comments (
+                id INTEGER PRIMARY KEY,
+                dataset TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                native_id TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                shop_id TEXT,
+                username TEXT,
+                comment TEXT,
+                rating INTEGER,
+                likes INTEGER,
+                reply_count INTEGER,
+                created_at INTEGER,
+                crawled_at INTEGER NOT NULL,
+                extra TEXT
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_comments_native ON comments(platform, native_id);
+            CREATE INDEX IF NOT EXISTS idx_comments_item ON comments(dataset, item_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_comments_created ON comments(dataset, created_at);
+            CREATE INDEX IF NOT EXISTS idx_comments_rating ON comments(dataset, rating);
+        """)
+        self._conn.commit()
+
+    def upsert(self, dataset, rows):
+        """一个事务写入一批评论；已存在的评论只刷新点赞数等可变字段。返回新增条数"""
+        records = {}
+        for row in rows:
+            record = row_to_record(dataset, row)
+            records[(record['platform'], record['native_id'])] = record
+        if not records:
+            return 0
+
+        columns = ('dataset', 'native_id') + COLUMN_FIELDS + ('extra',)
+        updates = ', '.join(f"{name} = COALESCE(excluded.{name}, comments.{name})" for name in MUTABLE_FIELDS)
+        with self._lock:
+            existing = 0
+            keys = list(records)
+            # 按平台分组查询已有ID，SQLite单条语句的参数上限为999
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                for platform in {p for p, _ in chunk}:
+                    ids = [i for p, i in chunk if p == platform]
+                    existing += self._conn.execute(
+                        f"SELECT COUNT(*) FROM comments WHERE platform = ? AND native_id IN ({','.join('?' * len(ids))})",
+                        [platform] + ids
+                    ).fetchone()[0]
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO comments ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)}) "
+                    f"ON CONFLICT(platform, native_id) DO UPDATE SET {updates}",
+                    list(records.values())
+                )
+        return len(records) - existing
+
+    def _where(self, dataset=None, item_id=None, start=None, end=None, rating=None):
+        clauses, params = [], []
+        if dataset:
+            clauses.append("dataset = ?")
+            params.append(dataset)
+        if item_id:
+            clauses.append("item_id = ?")
+            params.append(str(item_id))
+        if start is not None:
+            clauses.append("created_at >= ?")
+            params.append(int(start))
+        if end is not None:
+            clauses.append("created_at < ?")
+            params.append(int(end))
+        if rating:
+            clauses.append("rating = ?")
+            params.append(int(rating))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, **filters):
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM comments{where}", params).fetchone()[0]
+
+    def query(self, limit=None, batch_size=5000, **filters):
+        """按条件分批产出评论行（最近写入的在前），不把整个归档读入内存"""
+        where, params = self._where(**filters)
+        # 键集分页：每批是一次独立的索引查询，批次之间不占用连接
+        where += (" AND " if where else " WHERE ") + "id < ?"
+        last_id = None
+        remaining = limit or float('inf')
+        while remaining > 0:
+            size = int(min(batch_size, remaining))
+            with self._lock:
+                records = self._conn.execute(
+                    f"SELECT * FROM comments{where} ORDER BY id DESC LIMIT ?",
+                    params + [last_id if last_id is not None else 2 ** 63 - 1, size]
+                ).fetchall()
+            if not records:
+                return
+            remaining -= len(records)
+            last_id = records[-1]['id']
+            yield [record_to_row(r) for r in records]
+
+    def summary(self):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute("""
+                SELECT dataset, COUNT(*) AS comments, COUNT(DISTINCT item_id) AS items,
+                       MIN(created_at) AS first_comment, MAX(created_at) AS last_comment,
+                       MAX(crawled_at) AS last_crawl
+                FROM comments GROUP BY dataset
+            """)]
+
+    def clear(self, dataset=None):
+        with self._lock, self._conn:
+            if dataset:
+                self._conn.execute("DELETE FROM comments WHERE dataset = ?", (dataset,))
+            else:
+                self._conn.execute("DELETE FROM comments")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
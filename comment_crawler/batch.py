@@ -0,0 +1,159 @@
+import atexit
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import partial
+
+from .tiktok import crawl_comments, launch_driver, prepare_driver_binary, reset_driver
+
+
+@dataclass
+class UrlResult:
+    url: str
+    rows: list = field(default_factory=list)
+    error: str = ''
+    warnings: list = field(default_factory=list)
+    scrolls: int = 0
+    bytes_received: int = 0
+    rejected: dict = field(default_factory=dict)
+
+
+# ============================================
+# 工作进程：每个进程持有自己的无头浏览器，跨URL复用
+# ============================================
+_worker_launcher = None
+_worker_started = None
+_worker_driver = None
+
+
+def _quit_worker_driver():
+    global _worker_driver
+    if _worker_driver is not None:
+        try:
+            _worker_driver.quit()
+        except Exception:
+            pass
+        _worker_driver = None
+
+
+def _kill_worker_browser(signum, frame):
+    # 取消时父进程发送SIGTERM。会话可能正阻塞在页面脚本中，不经过WebDriver，
+    # 直接结束Chrome和chromedriver进程（它们不会随本进程退出），然后立即退出
+    service = getattr(_worker_driver, 'service', None)
+    for pid in (getattr(_worker_driver, 'browser_pid', None), getattr(getattr(service, 'process', None), 'pid', None)):
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+    os._exit(1)
+
+
+def _init_worker(launcher, started):
+    global _worker_launcher, _worker_started
+    _worker_launcher = launcher
+    _worker_started = started
+    atexit.register(_quit_worker_driver)
+    signal.signal(signal.SIGTERM, _kill_worker_browser)
+
+
+def _crawl_one(url, options):
+    global _worker_driver
+    # 同步写入管道，进程随后崩溃时主进程也能知道它正在处理哪个URL
+    _worker_started.put(url)
+    try:
+        if _worker_driver is None:
+            _worker_driver = _worker_launcher(options.lean_profile)
+        rows, stats = crawl_comments(_worker_driver, url, options)
+    except Exception as e:
+        # 浏览器异常只影响当前URL：丢弃该浏览器，下一个URL重新启动
+        _quit_worker_driver()
+        return UrlResult(url, error=f"{type(e).__name__}: {e}")
+
+    try:
+        reset_driver(_worker_driver)
+    except Exception:
+        _quit_worker_driver()
+    rows = [dict(row, product_url=url) for row in rows]
+    return UrlResult(url, rows, '', stats.warnings, stats.scrolls, stats.bytes_received, dict(stats.rejected))
+
+
+def _stop_workers(executor, timeout=5):
+    """取消未开始的URL并终止工作进程，不等正在滚动的页面爬完"""
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(deadline - time.monotonic(), 0))
+        if process.is_alive():
+            process.kill()
+            process.join(1)
+
+
+# ============================================
+# 批量执行：URL分发到进程池，结果按完成顺序流式返回
+# ============================================
+def crawl_urls(urls, options, workers=3, launcher=launch_driver, stop=None, poll=0.5):
+    """逐个产出 UrlResult；工作进程崩溃时，崩溃时正在处理的URL各自单独重试一次。
+    stop（threading.Event）被设置或生成器被关闭时立即终止工作进程及其浏览器"""
+    queue = list(dict.fromkeys(urls))
+    suspects = []
+    if launcher is launch_driver and queue:
+        # 在父进程中修补一次chromedriver，工作进程只复用，避免同时改写同一个文件
+        prepare_driver_binary()
+        launcher = partial(launch_driver, prepared=True)
+    # spawn避免fork Streamlit进程中的线程和浏览器句柄
+    context = multiprocessing.get_context('spawn')
+
+    while queue or suspects:
+        if queue:
+            batch, queue, isolated = queue, [], False
+        else:
+            batch, isolated = [suspects.pop(0)], True
+
+        started = context.SimpleQueue()
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(batch)),
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(launcher, started)
+        )
+        futures = {executor.submit(_crawl_one, url, options): url for url in batch}
+        pending = set(futures)
+        running = set()
+        finished = False
+        try:
+            while pending:
+                # 定时醒来检查 stop，不必等到下一个URL爬完
+                done, pending = wait(pending, timeout=poll, return_when=FIRST_COMPLETED)
+                if stop is not None and stop.is_set():
+                    return
+                for future in done:
+                    url = futures[future]
+                    try:
+                        yield future.result()
+                    except BrokenProcessPool:
+                        if isolated:
+                            yield UrlResult(url, error="浏览器进程崩溃")
+                            continue
+                        while not started.empty():
+                            running.add(started.get())
+                        # 崩溃时正在处理的URL逐个隔离重试，尚未开始的URL放回队列正常并行
+                        if url in running:
+                            suspects.append(url)
+                        else:
+                            queue.append(url)
+            finished = True
+        finally:
+            if finished:
+                executor.shutdown(wait=True)
+            else:
+                # 取消或出错：不等正在爬的页面，直接结束工作进程
+                _stop_workers(executor)
+            started.close()
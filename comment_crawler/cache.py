@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# get_ratings 中决定响应内容的参数
+CACHE_KEY_PARAMS = ('itemid', 'shopid', 'offset', 'limit', 'filter', 'flag', 'type')
+
+
+def cache_key(params):
+    normalized = {name: str(params.get(name, '')) for name in CACHE_KEY_PARAMS}
+    return json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+
+
+# ============================================
+# 磁盘HTTP响应缓存（TTL + 按大小LRU淘汰 + ETag/Last-Modified重新验证）
+# ============================================
+class ResponseCache:
+    def __init__(self, path, ttl=24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def lookup(self, params, revalidate=False):
+        """返回 (data, 是否新鲜, 验证头)；未缓存时返回 (None, False, {})。
+        revalidate=True 时调用方无论是否新鲜都会发请求，此时不计命中，等304确认后再计"""
+        key = cache_key(params)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, False, {}
+            body, etag, last_modified, fetched_at = row
+            now = time.time()
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        fresh = now - fetched_at < self.ttl
+        validators = {}
+        if etag:
+            validators['If-None-Match'] = etag
+        if last_modified:
+            validators['If-Modified-Since'] = last_modified
+        if fresh and not revalidate:
+            self.hits += 1
+        elif not validators:
+            # 过期且无法重新验证，视为未缓存
+            return None, False, {}
+        return json.loads(body), fresh, validators
+
+    def mark_revalidated(self, params):
+        """服务器返回304时刷新缓存时间；缓存内容被实际使用，计为一次命中"""
+        self.hits += 1
+        self.revalidated += 1
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?",
+                               (time.time(), cache_key(params)))
+            self._conn.commit()
+
+    def store(self, params, data, etag=None, last_modified=None):
+        """保存从网络获取的完整响应（每次调用计为一次未命中）"""
+        self.misses += 1
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        now = time.time()
+        key = cache_key(params)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, now, now, len(body))
+            )
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # 按最近访问时间从旧到新淘汰，直到降到上限的90%
+        target = self.max_bytes * 0.9
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_bytes': self._total_bytes,
+        }
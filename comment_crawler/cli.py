@@ -0,0 +1,262 @@
+import argparse
+import sys
+import time
+from collections import Counter
+from contextlib import closing
+
+from .filters import CommentFilter, parse_keywords, summarize_rejects
+from .sinks import SINK_FORMATS, open_sink
+
+# 重依赖（aiohttp、selenium、pandas/pyarrow）只在对应子命令或输出格式真正用到时才导入，
+# 命令行启动和 --help 不加载它们
+
+
+def parse_urls(text):
+    return list(dict.fromkeys(line.strip() for line in text.splitlines() if line.strip()))
+
+
+def read_lines(path):
+    """读取目标文件（'-' 为标准输入）"""
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+class Progress:
+    """进度输出到标准错误，标准输出留给 -o - 的评论数据"""
+
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.started = time.time()
+
+    def __call__(self, message):
+        if not self.quiet:
+            print(f"[{time.time() - self.started:6.1f}s] {message}", file=sys.stderr, flush=True)
+
+    def rejects(self, rejected):
+        totals, keywords = summarize_rejects(rejected)
+        if totals:
+            top = '，'.join(f"{k}({n})" for k, n in keywords[:5])
+            self(f"已过滤 {sum(totals.values())} 条评论" + (f"，命中关键词: {top}" if top else ''))
+
+
+# ============================================
+# 子命令
+# ============================================
+def run_shopee(args, sink, row_filter, progress):
+    from .shopee import ShopeeRatingsEngine, parse_targets
+
+    targets = parse_targets(read_lines(args.targets)) if args.targets else []
+    cache = watermark_store = None
+    if args.cache:
+        from .cache import ResponseCache
+
+        cache = ResponseCache(args.cache, ttl=args.cache_ttl * 3600)
+    if args.watermarks:
+        from .watermark import WatermarkStore
+
+        watermark_store = WatermarkStore(args.watermarks)
+    engine = ShopeeRatingsEngine(args.connections, args.rps, cache=cache)
+
+    def crawl(targets, on_page=None, on_item=None):
+        if watermark_store is None:
+            return engine.crawl_sync(targets, args.max_comments, args.rating, on_page, on_item,
+                                     row_filter=row_filter)
+        results, known = engine.crawl_incremental(targets, watermark_store, args.max_comments, args.rating,
+                                                  on_page, on_item, row_filter)
+        progress(f"增量模式: {known}/{len(targets)} 个产品已有水位线")
+        return results
+
+    if args.queue:
+        # 队列中的目标为 "shopid,itemid" 文本
+        def crawl_batch(batch, on_result):
+            crawl([tuple(target.split(',', 1)) for target in batch],
+                  on_item=lambda result: on_result(f"{result.shopid},{result.itemid}", result.rows, result.error))
+
+        return run_queue_worker(args, 'shopee', queue_targets('shopee', targets), crawl_batch, sink, progress)
+
+    if not targets:
+        progress("没有有效的产品（每行一个产品URL或 shopid,itemid）")
+        return 1
+    done = []
+
+    def on_page(result, rows):
+        sink.write('shopee', rows)
+
+    def on_item(result):
+        done.append(result)
+        status = f"失败: {result.error}" if result.error else f"{len(result.rows)} 条评论"
+        progress(f"({len(done)}/{len(targets)}) {result.shopid},{result.itemid} {status}")
+
+    progress(f"开始爬取 {len(targets)} 个Shopee产品")
+    results = crawl(targets, on_page, on_item)
+    stats = engine.stats()
+    progress(f"请求 {stats['requests']} 次 | 写入 {sink.rows} 条评论")
+    progress.rejects(sum((result.rejected for result in results), Counter()))
+    return 1 if any(result.error for result in results) else 0
+
+
+def run_tiktok(args, sink, row_filter, progress):
+    from .batch import crawl_urls
+    from .tiktok import TikTokCrawlOptions
+
+    urls = parse_urls(read_lines(args.targets)) if args.targets else []
+    options = TikTokCrawlOptions(
+        max_comments=args.max_comments,
+        capture_mode=args.capture,
+        lean_profile=not args.no_lean,
+        comment_filter=row_filter
+    )
+
+    if args.queue:
+        def crawl_batch(batch, on_result):
+            with closing(crawl_urls(batch, options, args.workers)) as results:
+                for result in results:
+                    on_result(result.url, result.rows, result.error)
+
+        return run_queue_worker(args, 'tt_product', urls, crawl_batch, sink, progress)
+
+    if not urls:
+        progress("没有有效的TikTok URL")
+        return 1
+    failed = 0
+    rejected = Counter()
+    progress(f"开始爬取 {len(urls)} 个TikTok页面（{min(args.workers, len(urls))} 个浏览器进程）")
+    with closing(crawl_urls(urls, options, args.workers)) as results:
+        for count, result in enumerate(results, 1):
+            sink.write('tt_product', result.rows)
+            rejected.update(result.rejected)
+            failed += bool(result.error)
+            status = f"失败: {result.error}" if result.error else f"{len(result.rows)} 条评论"
+            progress(f"({count}/{len(urls)}) {result.url} {status}")
+    progress(f"写入 {sink.rows} 条评论 | 失败 {failed} 个")
+    progress.rejects(rejected)
+    return 1 if failed else 0
+
+
+def queue_targets(kind, targets):
+    """队列中的目标统一为文本：Shopee为 "shopid,itemid"，TikTok为URL"""
+    if kind == 'shopee':
+        return [f"{shopid},{itemid}" for shopid, itemid in targets]
+    return list(targets)
+
+
+def run_queue_worker(args, kind, targets, crawl, sink, progress):
+    """分布式模式：目标先加入共享队列，本进程作为其中一个爬虫领取并爬取，直到队列中没有剩余目标"""
+    from .workqueue import FAILED, WorkQueue, default_worker_id, run_worker
+
+    queue = WorkQueue(args.queue, args.max_attempts)
+    if targets:
+        progress(f"加入队列 {queue.enqueue(kind, targets)} 个新目标（共 {len(targets)} 个）")
+    worker = args.worker_id or default_worker_id()
+
+    def on_task(task, rows, error):
+        status = f"失败（第 {task.attempts} 次）: {error}" if error else f"{rows} 条评论"
+        progress(f"{task.target} {status}")
+
+    progress(f"爬虫 {worker} 开始领取目标")
+    with closing(queue):
+        done, failed = run_worker(queue, kind, crawl, lambda rows: sink.write(kind, rows), worker,
+                                  args.batch_size, args.lease, on_task=on_task)
+        progress(f"本爬虫完成 {done} 个目标，失败 {failed} 次 | 写入 {sink.rows} 条评论")
+        counts, _ = queue.summary()
+    return 1 if any(k == kind and state == FAILED for k, state, _, _ in counts) else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='comment_crawler', description="印尼TikTok和Shopee评论爬取（命令行）")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('targets', nargs='?', help="目标文件，每行一个；'-' 从标准输入读取（使用 --queue 时可省略）")
+    common.add_argument('-o', '--output', default='-',
+                        help="输出文件，按扩展名选择格式（.jsonl/.csv/.parquet/.feather/.db）；默认 JSON Lines 到标准输出")
+    common.add_argument('--format', choices=sorted(set(SINK_FORMATS.values())), help="覆盖按扩展名推断的格式")
+    common.add_argument('--max-comments', type=int, default=100, help="每个产品最多评论数")
+    common.add_argument('--exclude', default='', help="排除关键词，逗号分隔")
+    common.add_argument('--min-words', type=int, default=0, help="少于该词数的评论不保存")
+    common.add_argument('-q', '--quiet', action='store_true', help="不输出进度")
+    distributed = common.add_argument_group("分布式爬取（多台机器共享同一个队列文件）")
+    distributed.add_argument('--queue', metavar='PATH',
+                             help="任务队列（SQLite）；目标先加入队列，再作为爬虫领取。多台机器共用时须放在支持文件锁的共享目录")
+    distributed.add_argument('--worker-id', help="爬虫名称，默认 主机名:进程号")
+    distributed.add_argument('--batch-size', type=int, default=10, help="每次领取的目标数")
+    distributed.add_argument('--lease', type=float, default=120, help="租约时长（秒），期间自动续期")
+    distributed.add_argument('--max-attempts', type=int, default=3, help="每个目标最多尝试次数")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    shopee = commands.add_parser('shopee', parents=[common], help="通过评论API爬取Shopee产品评论")
+    shopee.add_argument('--rating', type=int, default=0, choices=range(6), help="评分筛选，0 为全部")
+    shopee.add_argument('--connections', type=int, default=20, help="最大并发连接数")
+    shopee.add_argument('--rps', type=float, default=0, help="每秒请求数硬上限，0 为不限（由自适应并发控制调速）")
+    shopee.add_argument('--cache', metavar='PATH', help="HTTP响应缓存（SQLite）")
+    shopee.add_argument('--cache-ttl', type=float, default=24, help="缓存有效期（小时）")
+    shopee.add_argument('--watermarks', metavar='PATH', help="增量爬取水位线（SQLite），只爬上次之后的新评论，再补爬上次因 --max-comments 没爬完的旧评论")
+    shopee.set_defaults(run=run_shopee)
+
+    tiktok = commands.add_parser('tiktok', parents=[common], help="用无头浏览器爬取TikTok页面评论")
+    tiktok.add_argument('--workers', type=int, default=3, help="浏览器进程数")
+    tiktok.add_argument('--capture', choices=('dom', 'network'), default='dom', help="页面解析或网络拦截")
+    tiktok.add_argument('--no-lean', action='store_true', help="不屏蔽视频、字体等资源")
+    tiktok.set_defaults(run=run_tiktok)
+
+    queue = commands.add_parser('queue', help="查看或管理分布式任务队列")
+    queue.add_argument('action', choices=('status', 'add', 'retry'),
+                       help="status 查看进度；add 加入目标；retry 失败的目标重新排队")
+    queue.add_argument('queue', metavar='PATH', help="任务队列（SQLite）")
+    queue.add_argument('targets', nargs='?', help="add：目标文件，'-' 从标准输入读取")
+    queue.add_argument('--kind', choices=('shopee', 'tiktok'), default='shopee', help="add：目标类型")
+    queue.set_defaults(run=None)
+    return parser
+
+
+def run_queue_admin(args):
+    from .workqueue import WorkQueue
+
+    queue = WorkQueue(args.queue)
+    if args.action == 'add':
+        if not args.targets:
+            print("需要目标文件", file=sys.stderr)
+            return 2
+        text = read_lines(args.targets)
+        if args.kind == 'shopee':
+            from .shopee import parse_targets
+
+            kind, targets = 'shopee', queue_targets('shopee', parse_targets(text))
+        else:
+            kind, targets = 'tt_product', parse_urls(text)
+        print(f"加入队列 {queue.enqueue(kind, targets)} 个新目标（共 {len(targets)} 个）")
+        return 0
+    if args.action == 'retry':
+        print(f"重新排队 {queue.retry_failed()} 个目标")
+        return 0
+    counts, workers = queue.summary()
+    for kind, state, count, rows in counts:
+        print(f"{kind:<12} {state:<8} {count:>8} 个目标 {rows:>10} 条评论")
+    for worker, count in sorted(workers.items()):
+        print(f"爬虫 {worker}: 持有 {count} 个租约")
+    for kind, target, attempts, error in queue.failures():
+        print(f"失败 {kind} {target}（{attempts} 次）: {error}")
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'queue':
+        return run_queue_admin(args)
+    if not args.targets and not args.queue:
+        parser.error("需要目标文件（或使用 --queue 从已有队列领取）")
+    progress = Progress(args.quiet)
+    row_filter = CommentFilter(parse_keywords(args.exclude), args.min_words)
+    try:
+        sink = open_sink(args.output, args.format)
+    except (ValueError, OSError) as e:
+        progress(f"无法打开输出: {e}")
+        return 2
+    try:
+        # 正常结束、出错或中断时都关闭输出（写出列式文件、关闭归档库连接）
+        with sink:
+            return args.run(args, sink, row_filter if row_filter else None, progress)
+    except KeyboardInterrupt:
+        progress(f"已中断，已写入 {sink.rows} 条评论")
+        return 130
@@ -0,0 +1,158 @@
+import pandas as pd
+
+from .times import NAT, epoch_values, to_epoch
+
+# Parquet每个行组的行数：足够大以保证压缩率，又足够小让按商品/评分/日期的过滤能跳过整组
+ROW_GROUP_ROWS = 64 * 1024
+# 固定导出结构中与爬虫字段名不同的列：列名 -> 来源字段
+SOURCE_FIELDS = {'created_at': 'create_time'}
+
+
+def comment_schema():
+    """Parquet/Feather导出的固定结构；低基数字段字典编码，时间和计数使用原生类型"""
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    utc = pa.timestamp('s', tz='UTC')
+    return pa.schema([
+        ('platform', category),
+        ('shop_id', category),
+        ('product_id', pa.string()),
+        ('video_id', pa.string()),
+        ('item_name', category),
+        ('variation', category),
+        ('rating_id', pa.int64()),
+        ('comment_id', pa.string()),
+        ('username', pa.string()),
+        ('comment', pa.string()),
+        ('rating', pa.int8()),
+        ('likes', pa.int64()),
+        ('reply_count', pa.int64()),
+        ('created_at', utc),
+        ('crawl_date', utc),
+        ('time_text', pa.string()),
+        ('images', pa.string()),
+        ('product_url', pa.string()),
+    ])
+
+
+def _source(frame, name):
+    source = SOURCE_FIELDS.get(name, name)
+    return frame[source] if source in frame.columns else None
+
+
+def _as_text(series):
+    values = series.astype(object)
+    return values.where(series.notna(), None).map(lambda v: v if v is None else str(v))
+
+
+def build_dictionaries(frame, schema):
+    """整个导出共用一份字典（IPC文件要求每列只有一个字典，Parquet也因此各行组一致）"""
+    import pyarrow as pa
+
+    dictionaries = {}
+    for field in schema:
+        series = _source(frame, field.name)
+        if not pa.types.is_dictionary(field.type) or series is None:
+            continue
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = [str(v) for v in series.cat.categories]
+        else:
+            values = list(pd.unique(_as_text(series.dropna())))
+        dictionaries[field.name] = pd.Index(list(dict.fromkeys(values)), dtype=object)
+    return dictionaries
+
+
+def _to_arrow(series, field, dictionary=None):
+    import pyarrow as pa
+
+    type_ = field.type
+    if pa.types.is_dictionary(type_):
+        if isinstance(series.dtype, pd.CategoricalDtype) and list(map(str, series.cat.categories)) == list(dictionary):
+            codes = series.cat.codes.to_numpy()
+        else:
+            codes = pd.Categorical(_as_text(series), categories=dictionary).codes
+        indices = pa.array(codes, mask=codes < 0).cast(type_.index_type)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(dictionary, type=pa.string()))
+    if pa.types.is_string(type_):
+        return pa.array(_as_text(series), type=type_)
+    if pa.types.is_timestamp(type_):
+        # 存储中的UTC时间列或epoch秒
+        epochs = epoch_values(series)
+        return pa.array(epochs, mask=epochs == NAT, type=pa.int64()).cast(type_)
+    numbers = pd.to_numeric(series, errors='coerce').astype('Int64')
+    return pa.array(numbers, type=pa.int64(), from_pandas=True).cast(type_, safe=False)
+
+
+def frame_to_batch(chunk, schema, dictionaries):
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        series = _source(chunk, field.name)
+        if series is None:
+            arrays.append(pa.nulls(len(chunk), field.type))
+        else:
+            arrays.append(_to_arrow(series, field, dictionaries.get(field.name)))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+# ============================================
+# 写入：每个行组单独转换，内存只保留一个行组
+# ============================================
+def _batches(frame, schema):
+    dictionaries = build_dictionaries(frame, schema)
+    for offset in range(0, len(frame), ROW_GROUP_ROWS):
+        yield frame_to_batch(frame.iloc[offset:offset + ROW_GROUP_ROWS], schema, dictionaries)
+
+
+def write_parquet(frame, stream):
+    import pyarrow.parquet as pq
+
+    schema = comment_schema()
+    with pq.ParquetWriter(stream, schema, compression='zstd', write_statistics=True) as writer:
+        for batch in _batches(frame, schema):
+            writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+
+
+def write_feather(frame, stream):
+    import pyarrow.ipc as ipc
+
+    schema = comment_schema()
+    # Feather v2 即 Arrow IPC 文件格式
+    with ipc.new_file(stream, schema, options=ipc.IpcWriteOptions(compression='zstd')) as writer:
+        for batch in _batches(frame, schema):
+            writer.write_batch(batch)
+
+
+# ============================================
+# 读取：按商品/评分/日期下推过滤，只读需要的行组和列
+# ============================================
+def read_comments(source, columns=None, item_id=None, rating=None, start=None, end=None, fmt=None):
+    """读取导出的Parquet/Feather文件（或目录、文件列表），返回DataFrame；目录需指定fmt"""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    paths = source if isinstance(source, (list, tuple)) else [source]
+    if fmt is None:
+        fmt = 'feather' if str(paths[0]).endswith(('.feather', '.arrow')) else 'parquet'
+    dataset = ds.dataset(source, format='ipc' if fmt == 'feather' else fmt, schema=comment_schema())
+
+    condition = None
+    if item_id is not None:
+        item_id = str(item_id)
+        condition = (ds.field('product_id') == item_id) | (ds.field('video_id') == item_id)
+    if rating is not None:
+        clause = ds.field('rating') == int(rating)
+        condition = clause if condition is None else condition & clause
+    # 不带时区的起止时间按WIB解释
+    created_at = comment_schema().field('created_at').type
+    if start is not None:
+        clause = ds.field('created_at') >= pa.scalar(to_epoch(start), pa.int64()).cast(created_at)
+        condition = clause if condition is None else condition & clause
+    if end is not None:
+        clause = ds.field('created_at') < pa.scalar(to_epoch(end), pa.int64()).cast(created_at)
+        condition = clause if condition is None else condition & clause
+    # 计数列保持可空整数，不因缺失值退化为float
+    nullable = {pa.int8(): pd.Int8Dtype(), pa.int64(): pd.Int64Dtype()}
+    return dataset.to_table(columns=columns, filter=condition).to_pandas(types_mapper=nullable.get)
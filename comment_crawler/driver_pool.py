@@ -0,0 +1,220 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 单个无头Chrome实例的大致常驻内存（MB），用于根据可用内存限制池大小
+DRIVER_MEMORY_MB = 350
+
+
+def available_memory_mb():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def memory_capped_size(requested, memory_fraction=0.5):
+    available = available_memory_mb()
+    if available is None:
+        return requested
+    return max(1, min(requested, int(available * memory_fraction / DRIVER_MEMORY_MB)))
+
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.monotonic()
+
+
+# ============================================
+# 预热的浏览器池：跨爬取任务和Streamlit重跑复用
+# ============================================
+class DriverPool:
+    def __init__(self, factory, max_size=2, warm_size=1, max_pages_per_driver=50, checkout_timeout=120,
+                 reset=None):
+        self.factory = factory
+        self.reset = reset or (lambda driver: driver.get("about:blank"))
+        self.max_size = memory_capped_size(max_size)
+        self.warm_size = min(warm_size, self.max_size)
+        self.max_pages_per_driver = max_pages_per_driver
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = []
+        self._busy = {}
+        self._starting = 0
+        self._warming = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.launched = 0
+        self.recycled = 0
+        self.crashed = 0
+
+        atexit.register(self.close)
+        self.warm_up()
+
+    def _total(self):
+        return len(self._idle) + len(self._busy) + self._starting
+
+    def _launch(self):
+        try:
+            pooled = _PooledDriver(self.factory())
+        except Exception:
+            with self._cond:
+                self._starting -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._starting -= 1
+            self.launched += 1
+            if self._closed:
+                self._quit(pooled)
+                return None
+        return pooled
+
+    def warm_up(self):
+        """在后台预启动浏览器，直到空闲实例数达到warm_size"""
+        with self._cond:
+            missing = min(self.warm_size - len(self._idle) - self._warming, self.max_size - self._total())
+            self._starting += max(missing, 0)
+            self._warming += max(missing, 0)
+
+        def start():
+            try:
+                pooled = self._launch()
+            except Exception:
+                pooled = None
+            with self._cond:
+                self._warming -= 1
+                if pooled is not None:
+                    self._idle.append(pooled)
+                self._cond.notify_all()
+
+        for _ in range(max(missing, 0)):
+            threading.Thread(target=start, daemon=True).start()
+
+    def resize(self, max_size):
+        with self._cond:
+            self.max_size = memory_capped_size(max_size)
+            self.warm_size = min(self.warm_size, self.max_size)
+            # 多余的空闲实例立即关闭，忙碌实例在归还时按需淘汰
+            surplus = []
+            while self._idle and self._total() > self.max_size:
+                surplus.append(self._idle.pop(0))
+            self._cond.notify_all()
+        for pooled in surplus:
+            self._quit(pooled)
+
+    def _healthy(self, driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+
+    def checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                pooled = self._idle.pop() if self._idle else None
+                # 有实例正在后台预热时等它就绪，而不是再冷启动一个
+                if pooled is None and not self._warming and self._total() < self.max_size:
+                    self._starting += 1
+                elif pooled is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("等待可用浏览器超时")
+                    self._cond.wait(remaining)
+                    continue
+
+            if pooled is None:
+                pooled = self._launch()
+                if pooled is None:
+                    continue
+            elif not self._healthy(pooled.driver):
+                # 渲染进程崩溃或会话失效，丢弃并重新获取
+                self.crashed += 1
+                self._quit(pooled)
+                continue
+
+            with self._cond:
+                self._busy[id(pooled.driver)] = pooled
+            return pooled.driver
+
+    def checkin(self, driver, pages=1, broken=False):
+        with self._cond:
+            pooled = self._busy.pop(id(driver), None)
+        if pooled is None:
+            return
+        pooled.pages += pages
+
+        with self._cond:
+            oversized = self._total() >= self.max_size
+        retire = broken or self._closed or oversized or pooled.pages >= self.max_pages_per_driver
+        if not retire:
+            try:
+                self.reset(driver)
+            except Exception:
+                retire = True
+        if retire:
+            if not broken and not self._closed:
+                self.recycled += 1
+            self._quit(pooled)
+            with self._cond:
+                self._cond.notify_all()
+            if not self._closed:
+                self.warm_up()
+            return
+
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify_all()
+
+    @contextmanager
+    def driver(self):
+        driver = self.checkout()
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = not self._healthy(driver)
+            raise
+        finally:
+            self.checkin(driver, broken=broken)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'idle': len(self._idle),
+                'busy': len(self._busy),
+                'starting': self._starting,
+                'max_size': self.max_size,
+                'launched': self.launched,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+            }
@@ -0,0 +1,204 @@
+import codecs
+import gzip
+import io
+import math
+import tempfile
+import zipfile
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .times import DERIVED_FIELDS, display_frame
+
+# 每次从DataFrame取出并序列化的行数，决定导出时的内存峰值
+CHUNK_ROWS = 10000
+# Excel单个工作表最多 1048576 行（含表头）
+EXCEL_MAX_ROWS = 1048575
+# 内存中最多缓存的导出字节数，超过后转存临时文件
+SPOOL_BYTES = 16 * 1024 * 1024
+
+EXPORT_FORMATS = {
+    'Excel': ('.xlsx', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'CSV': ('.csv', "text/csv"),
+    'JSON': ('.json', "application/json"),
+    'NDJSON': ('.jsonl', "application/x-ndjson"),
+    'Parquet': ('.parquet', "application/vnd.apache.parquet"),
+    'Feather': ('.feather', "application/vnd.apache.arrow.file"),
+}
+# 列式格式使用固定结构（时间列保持UTC原生类型）且内部已zstd压缩，不做字段投影和外层gzip
+COLUMNAR_FORMATS = {'Parquet', 'Feather'}
+
+
+def project_fields(frame, fields):
+    """选中的输出列（按选择顺序，timestamp 等派生列只要来源列存在即可）；没有任何匹配时导出全部字段"""
+    if fields:
+        columns = [name for name in fields if name in frame.columns or DERIVED_FIELDS.get(name) in frame.columns]
+        if columns:
+            return columns
+    return list(frame.columns)
+
+
+def _chunks(frame, start=0, stop=None, columns=None):
+    # 时间列只在这里逐块换算为WIB并格式化
+    stop = len(frame) if stop is None else stop
+    for offset in range(start, stop, CHUNK_ROWS):
+        yield display_frame(frame.iloc[offset:min(offset + CHUNK_ROWS, stop)], columns)
+
+
+def _excel_rows(chunk):
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    values = chunk.astype(object).where(chunk.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        # openpyxl拒绝控制字符，评论中偶尔会出现
+        yield [ILLEGAL_CHARACTERS_RE.sub('', v) if isinstance(v, str) else v for v in row]
+
+
+# ============================================
+# 各格式的逐块写入
+# ============================================
+def write_csv(frame, stream, start=0, stop=None, columns=None):
+    # 带BOM（utf-8-sig），Excel直接打开时印尼文/中文不乱码；与命令行的CSV输出一致。
+    # 每个文件（分卷）开头显式写一次BOM，不依赖流能否定位
+    stream.write(codecs.BOM_UTF8)
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+    header = True
+    for chunk in _chunks(frame, start, stop, columns):
+        chunk.to_csv(text, index=False, header=header)
+        header = False
+    if header:
+        display_frame(frame.iloc[:0], columns).to_csv(text, index=False)
+    text.detach()
+
+
+def write_ndjson(frame, stream, start=0, stop=None, columns=None):
+    for chunk in _chunks(frame, start, stop, columns):
+        lines = chunk.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+        stream.write(lines.rstrip('\n').encode('utf-8') + b'\n')
+
+
+def write_json(frame, stream, start=0, stop=None, columns=None):
+    stream.write(b'[')
+    first = True
+    for chunk in _chunks(frame, start, stop, columns):
+        lines = chunk.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+        for line in lines.splitlines():
+            stream.write((b'\n  ' if first else b',\n  ') + line.encode('utf-8'))
+            first = False
+    stream.write(b'\n]\n' if not first else b']\n')
+
+
+def write_excel(frame, stream, start=0, stop=None, columns=None, sheet_name='评论数据'):
+    from openpyxl import Workbook
+
+    # 只写模式：行直接序列化到临时文件，不在内存中保留单元格对象
+    workbook = Workbook(write_only=True)
+    stop = len(frame) if stop is None else stop
+    header = [str(name) for name in (frame.columns if columns is None else columns)]
+    for sheet_index, sheet_start in enumerate(range(start, max(stop, start + 1), EXCEL_MAX_ROWS)):
+        sheet = workbook.create_sheet(sheet_name if sheet_index == 0 else f"{sheet_name}_{sheet_index + 1}")
+        sheet.append(header)
+        for chunk in _chunks(frame, sheet_start, min(sheet_start + EXCEL_MAX_ROWS, stop), columns):
+            for row in _excel_rows(chunk):
+                sheet.append(row)
+    workbook.save(stream)
+
+
+def write_parquet(frame, stream, start=0, stop=None, columns=None):
+    from .columnar import write_parquet as write
+
+    write(frame.iloc[start:stop], stream)
+
+
+def write_feather(frame, stream, start=0, stop=None, columns=None):
+    from .columnar import write_feather as write
+
+    write(frame.iloc[start:stop], stream)
+
+
+WRITERS = {'Excel': write_excel, 'CSV': write_csv, 'JSON': write_json, 'NDJSON': write_ndjson,
+           'Parquet': write_parquet, 'Feather': write_feather}
+
+
+# ============================================
+# 导出任务：字段投影、按行数分卷、gzip/zip压缩
+# ============================================
+@dataclass
+class CommentExport:
+    frame: pd.DataFrame
+    basename: str
+    fmt: str = 'CSV'
+    fields: list = None
+    compress: bool = False
+    split_size: int = None
+    sheet_name: str = '评论数据'
+
+    def __post_init__(self):
+        self.columns = None if self.fmt in COLUMNAR_FORMATS else project_fields(self.frame, self.fields)
+
+    @property
+    def parts(self):
+        if not self.split_size or len(self.frame) <= self.split_size:
+            return 1
+        return math.ceil(len(self.frame) / self.split_size)
+
+    @property
+    def extension(self):
+        return EXPORT_FORMATS[self.fmt][0]
+
+    @property
+    def gzipped(self):
+        # xlsx本身就是zip压缩格式，列式格式内部已压缩，不再套一层gzip
+        return self.compress and self.fmt != 'Excel' and self.fmt not in COLUMNAR_FORMATS
+
+    @property
+    def file_name(self):
+        if self.parts > 1:
+            return self.basename + '.zip'
+        if self.gzipped:
+            return self.basename + self.extension + '.gz'
+        return self.basename + self.extension
+
+    @property
+    def mime(self):
+        if self.parts > 1:
+            return "application/zip"
+        if self.gzipped:
+            return "application/gzip"
+        return EXPORT_FORMATS[self.fmt][1]
+
+    def _write_part(self, stream, start=0, stop=None):
+        if self.fmt == 'Excel':
+            write_excel(self.frame, stream, start, stop, self.columns, self.sheet_name)
+        else:
+            WRITERS[self.fmt](self.frame, stream, start, stop, self.columns)
+
+    def write(self, target):
+        """把导出内容写入二进制流 target"""
+        if self.parts > 1:
+            method = zipfile.ZIP_DEFLATED if self.compress else zipfile.ZIP_STORED
+            with zipfile.ZipFile(target, 'w', compression=method) as archive:
+                for part in range(self.parts):
+                    start = part * self.split_size
+                    name = f"{self.basename}_part{part + 1:03d}{self.extension}"
+                    # 每个分卷直接流式写入压缩包条目
+                    with archive.open(name, 'w', force_zip64=True) as entry:
+                        self._write_part(entry, start, min(start + self.split_size, len(self.frame)))
+        elif self.gzipped:
+            with gzip.GzipFile(filename=self.basename + self.extension, mode='wb', fileobj=target) as stream:
+                self._write_part(stream)
+        else:
+            self._write_part(target)
+        return target
+
+    def open(self):
+        """生成导出文件并返回从头读取的文件对象（大文件落盘，不占用内存）"""
+        target = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        self.write(target)
+        target.seek(0)
+        return target
+
+    def getvalue(self):
+        """完整导出内容（bytes）；序列化过程仍逐块进行，内存中只保留最终文件"""
+        with self.open() as stream:
+            return stream.read()
@@ -0,0 +1,127 @@
+import re
+from collections import Counter, deque
+
+# 字数统计：中日文每个字算一个词，其余按连续的字母/数字计
+WORD_PATTERN = re.compile(r'[぀-ヿ㐀-鿿]|[^\W぀-ヿ㐀-鿿_]+')
+KEYWORD_SEPARATORS = re.compile(r'[,，;；\n]+')
+
+# 过滤原因
+REJECT_KEYWORD = 'keyword'
+REJECT_MIN_WORDS = 'min_words'
+
+
+def parse_keywords(text):
+    """"spam, 广告，推广" -> ('spam', '广告', '推广')；去空白、去重、保持顺序"""
+    return tuple(dict.fromkeys(k.strip() for k in KEYWORD_SEPARATORS.split(text or '') if k.strip()))
+
+
+def count_words(text):
+    return len(WORD_PATTERN.findall(text))
+
+
+# ============================================
+# Aho–Corasick 多模式匹配：关键词编译成一个自动机，
+# 每条评论只从头到尾扫描一遍，耗时与关键词数量无关
+# ============================================
+class KeywordAutomaton:
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(k.casefold() for k in keywords if k))
+        self._goto = [{}]
+        self._fail = [0]
+        # 在该状态结束的关键词（包含沿失败链可达的较短关键词）
+        self._output = [None]
+        for keyword in self.keywords:
+            self._insert(keyword)
+        self._link()
+
+    def _insert(self, keyword):
+        state = 0
+        for char in keyword:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            state = following
+        if self._output[state] is None:
+            self._output[state] = keyword
+
+    def _link(self):
+        # 广度优先计算失败指针
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                if self._output[following] is None:
+                    self._output[following] = self._output[self._fail[following]]
+
+    def __bool__(self):
+        return bool(self.keywords)
+
+    def search(self, text):
+        """返回文本中第一个出现的关键词（不区分大小写），没有则返回 None"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+
+# ============================================
+# 入库前的评论过滤（无状态，可在会话和进程间共享）
+# ============================================
+class CommentFilter:
+    def __init__(self, exclude_keywords=(), min_words=0, field='comment'):
+        self.automaton = KeywordAutomaton(exclude_keywords)
+        self.min_words = int(min_words or 0)
+        self.field = field
+
+    def __bool__(self):
+        return bool(self.automaton) or self.min_words > 0
+
+    def reason(self, text):
+        """评论应被过滤的原因 (原因, 详情)，保留则返回 None"""
+        text = text or ''
+        if self.automaton:
+            keyword = self.automaton.search(text)
+            if keyword is not None:
+                return REJECT_KEYWORD, keyword
+        if self.min_words and count_words(text) < self.min_words:
+            return REJECT_MIN_WORDS, ''
+        return None
+
+    def apply(self, rows, rejected=None):
+        """返回保留的行；被过滤的行按 (原因, 详情) 计入 rejected"""
+        if not self:
+            return rows
+        kept = []
+        for row in rows:
+            reason = self.reason(str(row.get(self.field) or ''))
+            if reason is None:
+                kept.append(row)
+            elif rejected is not None:
+                rejected[reason] += 1
+        return kept
+
+
+def summarize_rejects(rejected):
+    """{(原因, 详情): 条数} -> ({原因: 条数}, 命中最多的关键词列表)"""
+    totals = Counter()
+    keywords = Counter()
+    for (reason, detail), count in rejected.items():
+        totals[reason] += count
+        if reason == REJECT_KEYWORD:
+            keywords[detail] += count
+    return totals, keywords.most_common()
@@ -0,0 +1,187 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = {DONE, FAILED, CANCELLED}
+
+
+class JobCancelled(BaseException):
+    """取消信号；与 asyncio.CancelledError 一样继承 BaseException，爬虫内部的 except Exception 不会吞掉它"""
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    label: str
+    state: str = QUEUED
+    progress: float = 0.0
+    message: str = ''
+    detail: str = ''
+    error: str = ''
+    # 完成后展示的说明：(级别, 内容)，级别为 info/warning/caption/table
+    notes: list = field(default_factory=list)
+    result: object = None
+    rows_emitted: int = 0
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobContext:
+    """任务函数与界面之间的通道：上报进度、输出部分结果、响应取消"""
+
+    def __init__(self, runner, job):
+        self._runner = runner
+        self.job = job
+
+    @property
+    def cancelled(self):
+        return self._runner._cancel_events[self.job.id].is_set()
+
+    @property
+    def cancel_event(self):
+        """取消时被设置的Event，供阻塞等待中的代码（如进程池）自行检查"""
+        return self._runner._cancel_events[self.job.id]
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, progress=None, message=None, detail=None):
+        self.check()
+        with self._runner._lock:
+            if progress is not None:
+                self.job.progress = max(0.0, min(float(progress), 1.0))
+            if message is not None:
+                self.job.message = message
+            if detail is not None:
+                self.job.detail = detail
+
+    def emit(self, rows):
+        """输出一批部分结果，界面轮询时通过 JobRunner.drain 取走"""
+        self.check()
+        if not rows:
+            return
+        with self._runner._lock:
+            self._runner._pending[self.job.id].extend(rows)
+            self.job.rows_emitted += len(rows)
+
+    def note(self, content, level='info'):
+        with self._runner._lock:
+            self.job.notes.append((level, content))
+
+
+# ============================================
+# 后台任务执行器：爬取在线程池中运行，不阻塞Streamlit脚本线程；
+# 界面按任务ID轮询状态和部分结果
+# ============================================
+class JobRunner:
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='crawl-job')
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._futures = {}
+        self._pending = {}
+        self._cancel_events = {}
+
+    def submit(self, kind, label, fn, *args, **kwargs):
+        """提交任务 fn(context, *args, **kwargs)，返回任务ID；kind 为结果所属的数据集"""
+        with self._lock:
+            job = Job(next(self._ids), kind, label)
+            self._jobs[job.id] = job
+            self._pending[job.id] = []
+            self._cancel_events[job.id] = threading.Event()
+        self._futures[job.id] = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        context = JobContext(self, job)
+        with self._lock:
+            if self._cancel_events[job.id].is_set():
+                job.state, job.finished_at = CANCELLED, time.time()
+                return
+            job.state, job.started_at = RUNNING, time.time()
+        result, error = None, ''
+        try:
+            result = fn(context, *args, **kwargs)
+            state = DONE
+        except JobCancelled:
+            state = CANCELLED
+        except Exception as e:
+            state, error = FAILED, f"{type(e).__name__}: {e}"
+        with self._lock:
+            job.result, job.error = result, error
+            job.state, job.finished_at = state, time.time()
+            if state == DONE:
+                job.progress = 1.0
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, job_ids=None):
+        with self._lock:
+            if job_ids is None:
+                return list(self._jobs.values())
+            return [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+
+    def active(self, kind=None, job_ids=None):
+        return [job for job in self.jobs(job_ids) if not job.finished and (kind is None or job.kind == kind)]
+
+    def drain(self, job_id):
+        """取走任务自上次调用以来输出的行"""
+        with self._lock:
+            rows = self._pending.get(job_id)
+            if not rows:
+                return []
+            self._pending[job_id] = []
+            return rows
+
+    def cancel(self, job_id):
+        """请求取消；排队中的任务不再执行，运行中的任务在下一次上报进度或输出结果时停止"""
+        event = self._cancel_events.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            with self._lock:
+                job = self._jobs[job_id]
+                job.state, job.finished_at = CANCELLED, time.time()
+        return True
+
+    def forget(self, job_id):
+        """移除已结束的任务及其未取走的结果"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.finished:
+                return False
+            for table in (self._jobs, self._pending, self._cancel_events):
+                table.pop(job_id, None)
+        self._futures.pop(job_id, None)
+        return True
+
+    def shutdown(self):
+        for event in list(self._cancel_events.values()):
+            event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,102 @@
+from collections import Counter, defaultdict
+
+from .text import STOPWORDS, tokenize_texts
+
+# 关键词最短长度（与原先 \w{3,} 一致）
+MIN_TOKEN_LENGTH = 3
+MAX_NGRAM = 3
+
+
+def keyword_tokens(tokens):
+    return [t for t in tokens if len(t) >= MIN_TOKEN_LENGTH and t not in STOPWORDS]
+
+
+def ngrams(tokens, n):
+    if n == 1:
+        return tokens
+    return [' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+
+
+class _Counts:
+    def __init__(self):
+        self.documents = 0
+        self.tf = [Counter() for _ in range(MAX_NGRAM)]
+        self.df = [Counter() for _ in range(MAX_NGRAM)]
+
+
+# ============================================
+# 增量关键词索引：每条评论只分词一次
+# ============================================
+class KeywordIndex:
+    """按数据集和商品/视频维护词频(tf)与文档频率(df)，支持1~3元词组的top-k查询"""
+
+    def __init__(self):
+        self._counts = defaultdict(_Counts)
+        # 每个数据集已索引到的行数，以及对应存储的清空代数
+        self._synced = {}
+
+    def add(self, dataset, texts, items=None):
+        """索引一批评论；texts/items 为 pandas Series"""
+        tokenized = tokenize_texts(texts)
+        item_values = items.tolist() if items is not None else [None] * len(tokenized)
+
+        # 先按 (商品, n) 收集整批词组，再一次性计数合并，避免逐条更新Counter
+        grams_by_key = defaultdict(list)
+        unique_by_key = defaultdict(list)
+        documents = Counter()
+        for tokens, item in zip(tokenized, item_values):
+            tokens = keyword_tokens(tokens)
+            # Categorical 列中缺失的商品ID取出来是 NaN，只计入全部评论，不当作名为 'nan' 的商品
+            item = None if item is None or item != item else str(item)
+            documents[item] += 1
+            for n in range(1, MAX_NGRAM + 1):
+                grams = ngrams(tokens, n)
+                if not grams:
+                    break
+                grams_by_key[(item, n)].extend(grams)
+                unique_by_key[(item, n)].extend(set(grams))
+
+        total = self._counts[(dataset, None)]
+        total.documents += sum(documents.values())
+        for item, count in documents.items():
+            if item is not None:
+                self._counts[(dataset, item)].documents += count
+        for (item, n), grams in grams_by_key.items():
+            tf, df = Counter(grams), Counter(unique_by_key[(item, n)])
+            scopes = (total,) if item is None else (total, self._counts[(dataset, item)])
+            for scope in scopes:
+                scope.tf[n - 1].update(tf)
+                scope.df[n - 1].update(df)
+
+    def sync(self, dataset, store, text_field='comment', item_fields=('product_id', 'video_id')):
+        """只索引 CommentStore 中上次同步之后追加的评论；存储被清空后重建该数据集"""
+        generation, indexed = self._synced.get(dataset, (None, 0))
+        if generation != store.generation or indexed > len(store):
+            self.reset(dataset)
+            indexed = 0
+        if indexed < len(store):
+            frame = store.frame()
+            if text_field in frame.columns:
+                item_field = next((name for name in item_fields if name in frame.columns), None)
+                self.add(dataset, frame[text_field].iloc[indexed:],
+                         frame[item_field].iloc[indexed:] if item_field else None)
+        self._synced[dataset] = (store.generation, len(store))
+
+    def reset(self, dataset):
+        for key in [key for key in self._counts if key[0] == dataset]:
+            del self._counts[key]
+        self._synced.pop(dataset, None)
+
+    def documents(self, dataset, item=None):
+        counts = self._counts.get((dataset, None if item is None else str(item)))
+        return counts.documents if counts else 0
+
+    def items(self, dataset):
+        return sorted(key[1] for key in self._counts if key[0] == dataset and key[1] is not None)
+
+    def top(self, dataset, k=10, n=1, item=None, by='tf'):
+        """出现次数最多的 n 元词组；by='df' 时按包含该词组的评论数排序"""
+        counts = self._counts.get((dataset, None if item is None else str(item)))
+        if counts is None or not 1 <= n <= MAX_NGRAM:
+            return []
+        return (counts.df if by == 'df' else counts.tf)[n - 1].most_common(k)
@@ -0,0 +1,78 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def result_size(value):
+    """派生结果的大致内存占用（字节），用于按总大小淘汰"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(index=True, deep=False)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# ============================================
+# 按数据版本缓存派生结果（统计、表格、导出文件）：
+# 每个键只保留最新版本的结果，按LRU淘汰，限制条数和总字节数
+# ============================================
+class ResultCache:
+    def __init__(self, max_entries=128, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 下载按钮的数据在点击时由其他线程生成，读写都要加锁
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version, compute):
+        """key 相同且版本一致时返回缓存结果，否则调用 compute() 并替换旧版本"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        # 计算可能较慢，不持有锁；并发时重复计算无害，后写入的覆盖先写入的
+        value = compute()
+        size = result_size(value)
+        with self._lock:
+            self._discard(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (version, value, size)
+                self._total_bytes += size
+                self._evict()
+        return value
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[2]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .archive import DATASETS
+
+# 合并视图的统一字段；其余字段（shop_id、item_name……）原样附在后面
+SOURCE_DTYPE = pd.CategoricalDtype(DATASETS)
+ITEM_FIELDS = ('product_id', 'video_id')
+ID_FIELDS = ('rating_id', 'comment_id')
+COUNT_FIELDS = ('rating', 'likes', 'reply_count')
+TIME_FIELDS = ('create_time', 'crawl_date')
+MERGED_FIELDS = ('source', 'platform', 'item_id', 'comment_id', 'username', 'comment') + COUNT_FIELDS + TIME_FIELDS
+
+
+def _text(frame, names):
+    """第一个存在的字段转为字符串列（object，与存储一致），缺失为 None"""
+    name = next((name for name in names if name in frame.columns), None)
+    values = np.full(len(frame), None, dtype=object)
+    if name is not None:
+        series = frame[name]
+        present = series.notna().to_numpy()
+        values[present] = series[present].astype(str).to_numpy(dtype=object)
+    return pd.Series(values, dtype=object, copy=False)
+
+
+def reconcile(dataset, frame):
+    """单个数据集的评论 -> 合并视图的统一结构"""
+    n = len(frame)
+    data = {
+        'source': pd.Categorical.from_codes(np.full(n, DATASETS.index(dataset), dtype=np.int8), dtype=SOURCE_DTYPE),
+        'platform': pd.Categorical(_text(frame, ('platform',))),
+        'item_id': _text(frame, ITEM_FIELDS),
+        'comment_id': _text(frame, ID_FIELDS),
+        'username': _text(frame, ('username',)),
+        'comment': _text(frame, ('comment',)),
+    }
+    for name in COUNT_FIELDS:
+        # 存储中已解析为整数；统一为可空整数，缺失字段全部为 <NA>
+        data[name] = (frame[name].astype('Int64').array if name in frame.columns
+                      else pd.array(np.full(n, pd.NA), dtype='Int64'))
+    for name in TIME_FIELDS:
+        data[name] = (frame[name].to_numpy(dtype='datetime64[s]') if name in frame.columns
+                      else np.full(n, np.datetime64('NaT'), dtype='datetime64[s]'))
+    skipped = set(MERGED_FIELDS) | set(ITEM_FIELDS) | set(ID_FIELDS)
+    for name in frame.columns:
+        if name not in skipped:
+            data[name] = pd.Series(frame[name].to_numpy(dtype=object), dtype=object, copy=False)
+    return pd.DataFrame(data, index=pd.RangeIndex(n), copy=False)
+
+
+def _concat(frames):
+    merged = pd.concat(frames, ignore_index=True, copy=False)
+    # 各块的平台类别不同，直接concat会退化为object，这里合并类别表
+    merged['platform'] = union_categoricals([frame['platform'].array for frame in frames])
+    return merged
+
+
+# ============================================
+# 增量合并视图：各数据集新增的评论只转换一次，
+# 合并结果按版本缓存，数据不变时预览和导出复用同一个DataFrame
+# ============================================
+class MergedView:
+    def __init__(self):
+        # version 在任一数据集有新增或被清空时递增
+        self.version = 0
+        self._parts = {}
+        self._synced = {}
+        self._cache = {}
+
+    def sync(self, dataset, store):
+        """只转换上次同步之后追加的评论；存储被清空后重建该数据集"""
+        generation, merged = self._synced.get(dataset, (None, 0))
+        if generation != store.generation or merged > len(store):
+            if self._parts.pop(dataset, None):
+                self.version += 1
+            merged = 0
+        if merged < len(store):
+            part = reconcile(dataset, store.frame().iloc[merged:])
+            self._parts.setdefault(dataset, []).append(part)
+            self.version += 1
+        self._synced[dataset] = (store.generation, len(store))
+
+    def _dataset_frame(self, dataset):
+        parts = self._parts.get(dataset)
+        if not parts:
+            return None
+        if len(parts) > 1:
+            # 多次追加的小块压缩成一块，之后的合并不再逐块拼接
+            parts[:] = [_concat(parts)]
+        return parts[0]
+
+    def frame(self, datasets=DATASETS):
+        """所选数据集的合并DataFrame（按数据集顺序）；没有数据时返回 None"""
+        key = tuple(dataset for dataset in DATASETS if dataset in datasets)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        frames = [frame for frame in map(self._dataset_frame, key) if frame is not None]
+        merged = None
+        if frames:
+            merged = frames[0] if len(frames) == 1 else _concat(frames)
+        self._cache[key] = (self.version, merged)
+        return merged
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+from .text import _clean_lines
+
+# 每批处理的评论数，以及MinHash计算时每块的shingle数（决定临时矩阵大小）
+DEDUP_CHUNK_ROWS = 20000
+HASH_BLOCK = 1 << 16
+# 多项式滚动哈希的底数
+ROLLING_BASE = np.uint64(1000003)
+
+
+def lsh_params(threshold, num_perm):
+    """选择 (bands, rows)，使LSH的S曲线拐点 (1/b)^(1/r) 最接近相似度阈值"""
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def _shingle_hashes(lines, size):
+    """整批评论的字符shingle哈希（向量化滚动哈希），返回 (哈希, 所属评论下标)，均按评论顺序"""
+    joined = '\x00'.join(lines)
+    codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    windows = len(codes) - size + 1
+    if windows <= 0:
+        return np.empty(0, np.uint64), np.empty(0, np.int64)
+    hashes = np.zeros(windows, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * ROLLING_BASE + codes[offset:offset + windows]
+    # 跨越评论分隔符的窗口无效
+    separators = np.cumsum(codes == 0)
+    valid = (codes[:windows] != 0) & (separators[size - 1:] == separators[:windows])
+    return hashes[valid], separators[:windows][valid]
+
+
+class _Corpus:
+    def __init__(self, num_perm, bands, capacity=1024):
+        # 预分配、按倍数扩容（与 CommentStore 相同），多次小批量同步不会反复复制整个数组
+        self.size = 0
+        self._signatures = np.zeros((capacity, num_perm), dtype=np.uint16)
+        self.parent = np.arange(capacity, dtype=np.int64)
+        self._eligible = np.zeros(capacity, dtype=bool)
+        # 每个LSH band：桶键 -> 第一次落入该桶的行（锚点）
+        self.buckets = [{} for _ in range(bands)]
+
+    @property
+    def signatures(self):
+        return self._signatures[:self.size]
+
+    @property
+    def eligible(self):
+        return self._eligible[:self.size]
+
+    def grow(self, n):
+        needed = self.size + n
+        capacity = len(self.parent)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            signatures = np.zeros((capacity, self._signatures.shape[1]), dtype=np.uint16)
+            signatures[:self.size] = self._signatures[:self.size]
+            self._signatures = signatures
+            # 新行的父节点是自己
+            parent = np.arange(capacity, dtype=np.int64)
+            parent[:self.size] = self.parent[:self.size]
+            self.parent = parent
+            eligible = np.zeros(capacity, dtype=bool)
+            eligible[:self.size] = self._eligible[:self.size]
+            self._eligible = eligible
+        self.size = needed
+
+    def find(self, row):
+        parent = self.parent
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # 以较早的行为簇根，簇ID稳定
+            self.parent[max(a, b)] = min(a, b)
+
+    def roots(self):
+        """所有行的簇根（指针跳跃，向量化）"""
+        roots = self.parent[:self.size].copy()
+        while True:
+            jumped = roots[roots]
+            if np.array_equal(jumped, roots):
+                return roots
+            roots = jumped
+
+
+# ============================================
+# 增量近似重复/模板评论检测：MinHash签名 + LSH分桶，
+# 新评论只与同桶锚点比较，不做两两比较
+# ============================================
+class NearDuplicateIndex:
+    def __init__(self, threshold=0.7, num_perm=64, shingle_size=5, min_length=20, min_cluster_size=3, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # 太短的评论（"bagus"、"mantap"）大量自然重复，不参与检测
+        self.min_length = max(min_length, shingle_size)
+        self.min_cluster_size = min_cluster_size
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        # 乘移位哈希族：h(x) = (a*x + b) >> 32，a 为奇数
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+        self._band_mix = rng.integers(1, 2 ** 63, self.rows, dtype=np.uint64) | np.uint64(1)
+        self._corpora = {}
+        # 每个数据集已处理的行数，以及对应存储的清空代数
+        self._synced = {}
+
+    def config(self):
+        return (self.threshold, self.num_perm, self.shingle_size, self.min_length, self.min_cluster_size)
+
+    def signatures(self, texts):
+        """pandas Series -> (MinHash签名矩阵 uint32, 参与检测的行掩码)"""
+        lines = [' '.join(line.split()) for line in _clean_lines(texts)]
+        eligible = np.fromiter((len(line) >= self.min_length for line in lines), dtype=bool, count=len(lines))
+        signatures = np.full((len(lines), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        hashes, docs = _shingle_hashes([line if ok else '' for line, ok in zip(lines, eligible)],
+                                       self.shingle_size)
+        for start in range(0, len(hashes), HASH_BLOCK):
+            block = hashes[start:start + HASH_BLOCK]
+            block_docs = docs[start:start + HASH_BLOCK]
+            values = ((self._a[:, None] * block[None, :] + self._b[:, None]) >> np.uint64(32)).astype(np.uint32)
+            # 同一评论的shingle连续排列，按段取最小值；跨块的评论与已有结果再取一次最小值
+            bounds = np.flatnonzero(np.r_[True, block_docs[1:] != block_docs[:-1]])
+            minima = np.minimum.reduceat(values, bounds, axis=1).T
+            owners = block_docs[bounds]
+            signatures[owners] = np.minimum(signatures[owners], minima)
+        return signatures, eligible
+
+    def _band_keys(self, signatures, band):
+        keys = np.zeros(len(signatures), dtype=np.uint64)
+        columns = signatures[:, band * self.rows:(band + 1) * self.rows].astype(np.uint64)
+        for i in range(self.rows):
+            keys = keys * self._band_mix[i] + columns[:, i]
+        return keys
+
+    def add(self, dataset, texts):
+        """为一批新评论计算签名、分桶，并把与已有锚点足够相似的评论并入同一簇"""
+        corpus = self._corpora.setdefault(dataset, _Corpus(self.num_perm, self.bands))
+        signatures, eligible = self.signatures(texts)
+        offset = corpus.size
+        corpus.grow(len(signatures))
+        # 只保存低16位（b-bit MinHash）用于后续核对，内存为完整签名的一半
+        corpus.signatures[offset:] = signatures.astype(np.uint16)
+        corpus.eligible[offset:] = eligible
+
+        rows = np.flatnonzero(eligible)
+        candidates = []
+        for band, buckets in enumerate(corpus.buckets):
+            keys = self._band_keys(signatures[rows], band)
+            unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            anchors = np.fromiter((buckets.get(k, -1) for k in unique.tolist()), dtype=np.int64, count=len(unique))
+            new = anchors < 0
+            anchors[new] = rows[first[new]] + offset
+            buckets.update(zip(unique[new].tolist(), anchors[new].tolist()))
+            pairs = np.stack([rows + offset, anchors[inverse]], axis=1)
+            candidates.append(pairs[pairs[:, 0] != pairs[:, 1]])
+        if not candidates:
+            return
+        pairs = np.unique(np.concatenate(candidates), axis=0)
+        if not len(pairs):
+            return
+        # 同桶只说明可能相似，用签名估计Jaccard相似度核对
+        similarity = (corpus.signatures[pairs[:, 0]] == corpus.signatures[pairs[:, 1]]).mean(axis=1)
+        for a, b in pairs[similarity >= self.threshold].tolist():
+            corpus.union(a, b)
+
+    def sync(self, dataset, store, text_field='comment'):
+        """只处理上次同步之后追加的评论；存储被清空后重建"""
+        generation, indexed = self._synced.get(dataset, (None, 0))
+        if generation != store.generation or indexed > len(store):
+            self.reset(dataset)
+            indexed = 0
+        if indexed < len(store):
+            frame = store.frame()
+            if text_field in frame.columns:
+                for start in range(indexed, len(frame), DEDUP_CHUNK_ROWS):
+                    self.add(dataset, frame[text_field].iloc[start:start + DEDUP_CHUNK_ROWS])
+            else:
+                self._corpora.setdefault(dataset, _Corpus(self.num_perm, self.bands)).grow(len(frame) - indexed)
+        self._synced[dataset] = (store.generation, len(store))
+
+    def reset(self, dataset):
+        self._corpora.pop(dataset, None)
+        self._synced.pop(dataset, None)
+
+    def clusters(self, dataset, store):
+        """与存储逐行对应：cluster（簇根行号，未参与检测为-1）和 cluster_size"""
+        self.sync(dataset, store)
+        corpus = self._corpora.get(dataset)
+        if corpus is None:
+            return pd.DataFrame({'cluster': np.empty(0, np.int64), 'cluster_size': np.empty(0, np.int64)})
+        roots = corpus.roots()
+        sizes = np.bincount(roots, minlength=corpus.size)[roots]
+        return pd.DataFrame({'cluster': np.where(corpus.eligible, roots, -1),
+                             'cluster_size': np.where(corpus.eligible, sizes, 0)})
+
+    def templates(self, dataset, store, user_field='username', item_fields=('product_id', 'video_id')):
+        """疑似模板/刷单评论簇：至少 min_cluster_size 条，且来自多个账号或多个商品"""
+        clusters = self.clusters(dataset, store)
+        frame = store.frame()
+        flagged = clusters['cluster_size'] >= self.min_cluster_size
+        # 没有评论文本列时（如只含计数字段的数据）不会有任何簇
+        if 'comment' not in frame.columns or not flagged.any():
+            return pd.DataFrame(columns=['cluster', 'comments', 'users', 'items', 'example'])
+        data = {'cluster': clusters['cluster'][flagged].to_numpy(),
+                'comment': frame['comment'][flagged.to_numpy()].to_numpy()}
+        if user_field in frame.columns:
+            data['user'] = frame[user_field][flagged.to_numpy()].astype(object).to_numpy()
+        item_field = next((name for name in item_fields if name in frame.columns), None)
+        if item_field:
+            data['item'] = frame[item_field][flagged.to_numpy()].astype(object).to_numpy()
+        grouped = pd.DataFrame(data).groupby('cluster', sort=False)
+        summary = pd.DataFrame({
+            'comments': grouped.size(),
+            'users': grouped['user'].nunique() if 'user' in data else 1,
+            'items': grouped['item'].nunique() if 'item' in data else 1,
+            'example': grouped['comment'].first(),
+        })
+        summary = summary[(summary['users'] > 1) | (summary['items'] > 1)]
+        return summary.sort_values('comments', ascending=False).reset_index()
@@ -0,0 +1,230 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from .text import tokenize_texts
+from .times import DAY, NAT, WIB_OFFSET, epoch_values
+
+# 每批评分的评论数，决定展开后的词数组大小
+SCORE_CHUNK_ROWS = 20000
+# 否定词/程度词/方面词的作用范围（前后各几个词，不跨子句）
+NEGATION_WINDOW = 3
+ASPECT_WINDOW = 3
+# 评分落在 ±NEUTRAL_BAND 内视为中性
+NEUTRAL_BAND = 0.1
+
+# 情感词典（词形为 text.normalize_token 规范化之后的形式，俚语已映射为标准词）
+LEXICON = {
+    # 正面
+    'bagus': 2.0, 'baik': 1.5, 'mantap': 2.0, 'keren': 2.0, 'puas': 2.0, 'memuaskan': 2.0, 'suka': 1.5,
+    'senang': 1.5, 'cepat': 1.0, 'murah': 1.0, 'terjangkau': 1.0, 'hemat': 1.0, 'awet': 1.5, 'rapi': 1.0,
+    'rapih': 1.0, 'aman': 1.0, 'selamat': 1.0, 'sesuai': 1.0, 'original': 1.0, 'asli': 1.0, 'lembut': 1.0,
+    'nyaman': 1.5, 'cantik': 1.5, 'ramah': 1.5, 'responsif': 1.5, 'sabar': 1.0, 'rekomendasi': 2.0,
+    'worth': 1.5, 'top': 1.5, 'oke': 1.0, 'sempurna': 2.0, 'terbaik': 2.0, 'wangi': 1.0, 'pas': 1.0,
+    'berfungsi': 1.0, 'lancar': 1.0, 'enak': 1.5, 'cocok': 1.5, 'kuat': 1.0, 'mulus': 1.0, 'jos': 1.5,
+    'juara': 2.0, 'gercep': 1.5, 'amanah': 2.0, 'terpercaya': 2.0, 'love': 1.5, 'good': 1.5, 'nice': 1.5,
+    'best': 2.0, 'langganan': 1.0, 'lengkap': 1.0, 'tebal': 0.5, 'bersih': 1.0, 'halus': 1.0,
+    # 负面
+    'jelek': -2.0, 'buruk': -2.0, 'kecewa': -2.5, 'mengecewakan': -2.5, 'rusak': -2.0, 'lambat': -1.5,
+    'lama': -1.0, 'telat': -1.5, 'mahal': -1.0, 'palsu': -2.0, 'cacat': -2.0, 'sobek': -1.5, 'pecah': -1.5,
+    'bau': -1.0, 'kotor': -1.5, 'salah': -1.5, 'tipis': -0.5, 'luntur': -1.5, 'penipu': -3.0, 'tipu': -3.0,
+    'zonk': -2.0, 'parah': -2.0, 'hancur': -2.0, 'ancur': -2.0, 'retur': -1.0, 'refund': -1.0, 'lecet': -1.0,
+    'bohong': -2.0, 'nyesel': -2.0, 'menyesal': -2.0, 'kapok': -2.5, 'gagal': -1.5, 'mati': -1.0,
+    'bocor': -1.5, 'penyok': -1.5, 'hilang': -1.0, 'kasar': -1.0, 'jutek': -1.5, 'abal': -2.0,
+    'masalah': -1.0, 'kurang': -1.0, 'bad': -1.5, 'worst': -2.5, 'lecek': -1.0, 'berantakan': -1.5,
+}
+# 多词短语：命中时分数记在第一个词上，第二个词不再单独计分
+PHRASES = {
+    ('terima', 'kasih'): 1.0,
+    ('sesuai', 'pesanan'): 1.5,
+    ('sesuai', 'deskripsi'): 1.5,
+    ('sesuai', 'gambar'): 1.5,
+    ('biasa', 'saja'): -0.5,
+    ('tidak', 'apa'): 0.0,
+}
+# 否定词：翻转其后 NEGATION_WINDOW 个词内的情感；"kurang bagus" 弱于 "tidak bagus"
+NEGATIONS = {'tidak': -1.0, 'bukan': -1.0, 'belum': -0.8, 'jangan': -1.0, 'tanpa': -1.0, 'kurang': -0.7}
+# 程度词：放大紧邻（前一个或后一个）情感词，如 "bagus banget"、"sangat puas"
+INTENSIFIERS = {'banget': 1.5, 'sangat': 1.5, 'sekali': 1.5, 'amat': 1.5, 'super': 1.5, 'paling': 1.5,
+                'benar': 1.3, 'bener': 1.3, 'sungguh': 1.3, 'terlalu': 1.3}
+
+# 转折词：与句读符号一起切分子句，"pengiriman lambat tapi harga murah" 中的 "lambat" 不影响价格
+CONTRASTS = {'tapi', 'tetapi', 'namun', 'cuma'}
+
+# 方面词：方面得分取同一子句内方面词前后 ASPECT_WINDOW 个词的情感
+ASPECTS = {
+    'price': {'harga', 'murah', 'mahal', 'diskon', 'promo', 'ongkir', 'worth', 'hemat', 'terjangkau'},
+    'quality': {'kualitas', 'bahan', 'awet', 'rusak', 'cacat', 'jahitan', 'original', 'asli', 'palsu',
+                'tebal', 'tipis', 'kuat', 'luntur', 'produk', 'barang', 'abal'},
+    'shipping': {'pengiriman', 'kirim', 'dikirim', 'kurir', 'ekspedisi', 'sampai', 'datang', 'telat',
+                 'lambat', 'paket', 'jne', 'jnt', 'sicepat', 'gercep'},
+    'packaging': {'kemasan', 'bubble', 'dus', 'kardus', 'bungkus', 'dibungkus', 'penyok', 'segel'},
+    'service': {'penjual', 'admin', 'respon', 'ramah', 'pelayanan', 'toko', 'jutek', 'responsif', 'cs',
+                'amanah', 'sabar'},
+}
+ASPECT_NAMES = list(ASPECTS)
+
+
+def _lookup(uniques, table, default=0.0):
+    return pd.Series(uniques, dtype=object).map(table).fillna(default).to_numpy(dtype=np.float64)
+
+
+def _shifted(values, doc, k, fill):
+    """values[i - k]（k<0 时为 i + |k|），跨评论边界处为 fill"""
+    shifted = np.full(len(values), fill, dtype=values.dtype)
+    if k > 0:
+        shifted[k:] = np.where(doc[k:] == doc[:-k], values[:-k], fill)
+    elif k < 0:
+        shifted[:k] = np.where(doc[:k] == doc[-k:], values[-k:], fill)
+    return shifted
+
+
+# ============================================
+# 批量评分：整批评论展开成一维词数组，全部用数组运算完成
+# ============================================
+def score_texts(texts):
+    """pandas Series -> (情感得分[-1,1], 各方面得分矩阵，未提及的方面为NaN)"""
+    # 重复评论（"Barang bagus"、刷单模板）只评分一次
+    codes, unique_texts = pd.factorize(pd.Series(texts, dtype=object).fillna('').astype(str),
+                                       use_na_sentinel=False)
+    tokenized = tokenize_texts(pd.Series(unique_texts, dtype=object), punctuation=True)
+    n_docs = len(tokenized)
+    lengths = np.fromiter(map(len, tokenized), dtype=np.int64, count=n_docs)
+    doc = np.repeat(np.arange(n_docs), lengths)
+    words, vocabulary = pd.factorize(pd.Series(list(chain.from_iterable(tokenized)), dtype=object))
+    vocabulary = np.asarray(vocabulary, dtype=object)
+
+    polarity = _lookup(vocabulary, LEXICON)[words]
+    negation = _lookup(vocabulary, NEGATIONS, 1.0)[words]
+    boost = _lookup(vocabulary, INTENSIFIERS, 1.0)[words]
+
+    # 子句编号：每条评论的第一个词、转折词和句读符号开始一个新子句；窗口只在子句内取
+    clause_break = np.fromiter((word in CONTRASTS or not word[0].isalpha() for word in vocabulary),
+                               dtype=bool, count=len(vocabulary))[words]
+    clause_start = clause_break | (_shifted(doc, doc, 1, -1) == -1)
+    clause = np.cumsum(clause_start) - 1
+
+    # 短语：当前词与下一个词组成词典中的短语
+    position = {word: i for i, word in enumerate(vocabulary)}
+    following = _shifted(words, doc, -1, -1)
+    for (first, second), value in PHRASES.items():
+        if first in position and second in position:
+            hit = (words == position[first]) & (following == position[second])
+            polarity[hit] = value
+            polarity[np.flatnonzero(hit) + 1] = 0.0
+            negation[hit] = 1.0
+
+    # 否定：取前 NEGATION_WINDOW 个词中最近的否定词；否定词自身不再计分
+    factor = np.ones(len(words))
+    pending = np.ones(len(words), dtype=bool)
+    for k in range(1, NEGATION_WINDOW + 1):
+        previous = _shifted(negation, clause, k, 1.0)
+        hit = pending & (previous != 1.0)
+        factor[hit] = previous[hit]
+        pending &= ~hit
+    polarity = np.where(negation != 1.0, 0.0, polarity)
+    polarity *= factor
+    # 程度词：前后紧邻
+    polarity *= np.maximum(_shifted(boost, clause, 1, 1.0), _shifted(boost, clause, -1, 1.0))
+
+    total = np.bincount(doc, weights=polarity, minlength=n_docs)
+    scores = np.tanh(total / 2)
+
+    # 方面：方面词所在子句窗口内情感之和（前缀和求窗口），按(评论, 方面)累加
+    aspects = np.full((n_docs, len(ASPECT_NAMES)), np.nan)
+    if len(words):
+        starts = np.flatnonzero(clause_start)
+        ends = np.append(starts[1:], len(words))
+        prefix = np.concatenate([[0.0], np.cumsum(polarity)])
+        index = np.arange(len(words))
+        low = np.maximum(index - ASPECT_WINDOW, starts[clause])
+        high = np.minimum(index + ASPECT_WINDOW + 1, ends[clause])
+        window = prefix[high] - prefix[low]
+        for column, name in enumerate(ASPECT_NAMES):
+            mentioned = np.isin(vocabulary, list(ASPECTS[name]))[words]
+            if mentioned.any():
+                mention_docs = doc[mentioned]
+                sums = np.bincount(mention_docs, weights=window[mentioned], minlength=n_docs)
+                hit = np.bincount(mention_docs, minlength=n_docs) > 0
+                aspects[hit, column] = np.tanh(sums[hit] / 2)
+    return scores[codes], aspects[codes]
+
+
+def sentiment_labels(scores):
+    """1 正面 / 0 中性 / -1 负面"""
+    return np.where(scores > NEUTRAL_BAND, 1, np.where(scores < -NEUTRAL_BAND, -1, 0)).astype(np.int8)
+
+
+class _Scores:
+    def __init__(self):
+        self.chunks = []
+        self._frame = None
+
+    def append(self, scores, aspects):
+        self.chunks.append((scores.astype(np.float32), aspects.astype(np.float32)))
+        self._frame = None
+
+    def frame(self):
+        if self._frame is None:
+            if self.chunks:
+                scores = np.concatenate([c[0] for c in self.chunks])
+                aspects = np.concatenate([c[1] for c in self.chunks])
+            else:
+                scores, aspects = np.empty(0, np.float32), np.empty((0, len(ASPECT_NAMES)), np.float32)
+            data = {'score': scores, 'label': sentiment_labels(scores)}
+            data.update({name: aspects[:, i] for i, name in enumerate(ASPECT_NAMES)})
+            self._frame = pd.DataFrame(data)
+        return self._frame
+
+
+# ============================================
+# 增量情感索引：每条评论只评分一次，结果与 CommentStore 的行一一对应
+# ============================================
+class SentimentIndex:
+    def __init__(self):
+        self._scores = {}
+        # 每个数据集已评分的行数，以及对应存储的清空代数
+        self._synced = {}
+
+    def sync(self, dataset, store, text_field='comment'):
+        """只为上次同步之后追加的评论评分；存储被清空后重新评分"""
+        generation, scored = self._synced.get(dataset, (None, 0))
+        if generation != store.generation or scored > len(store):
+            self.reset(dataset)
+            scored = 0
+        scores = self._scores.setdefault(dataset, _Scores())
+        if scored < len(store):
+            frame = store.frame()
+            texts = frame[text_field] if text_field in frame.columns else pd.Series([''] * len(frame))
+            for start in range(scored, len(frame), SCORE_CHUNK_ROWS):
+                scores.append(*score_texts(texts.iloc[start:start + SCORE_CHUNK_ROWS]))
+        self._synced[dataset] = (store.generation, len(store))
+        return scores.frame()
+
+    def reset(self, dataset):
+        self._scores.pop(dataset, None)
+        self._synced.pop(dataset, None)
+
+    def aggregate(self, dataset, store, by='item', item_fields=('product_id', 'video_id')):
+        """按商品/视频（by='item'）或评论日期（by='day'，WIB自然日）汇总评论数、平均情感、正负面占比和各方面得分"""
+        scores = self.sync(dataset, store)
+        frame = store.frame()
+        if by == 'day':
+            field = 'create_time' if 'create_time' in frame.columns else 'crawl_date'
+            if field not in frame.columns:
+                return pd.DataFrame()
+            epochs = epoch_values(frame[field])
+            days = np.where(epochs == NAT, NAT, (epochs + WIB_OFFSET) // DAY * DAY).view('datetime64[s]')
+            key = pd.Series(days, name='day').dt.date
+        else:
+            field = next((name for name in item_fields if name in frame.columns), None)
+            if field is None:
+                return pd.DataFrame()
+            key = frame[field].rename('item')
+        grouped = scores.assign(positive=scores['label'] == 1, negative=scores['label'] == -1).groupby(
+            key.reset_index(drop=True), observed=True, sort=True)
+        result = grouped.agg(comments=('score', 'size'), score=('score', 'mean'),
+                             positive=('positive', 'mean'), negative=('negative', 'mean'),
+                             **{name: (name, 'mean') for name in ASPECT_NAMES})
+        return result
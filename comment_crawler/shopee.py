@@ -0,0 +1,356 @@
+import asyncio
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import aiohttp
+
+from .throttle import AdaptiveLimiter, TokenBucket, parse_retry_after
+from .times import now_epoch
+from .watermark import Watermark
+
+# ============================================
+# Shopee get_ratings 接口
+# ============================================
+RATINGS_URL = "https://shopee.co.id/api/v2/item/get_ratings"
+RATINGS_HOST = "shopee.co.id"
+PAGE_LIMIT = 50
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'application/json',
+    'Accept-Language': 'id-ID,id;q=0.9,en;q=0.8',
+}
+
+
+def parse_item_url(url):
+    """从Shopee产品URL解析 (shopid, itemid)，失败返回None"""
+    match = re.search(r'i\.(\d+)\.(\d+)', url)
+    if not match:
+        return None
+    return match.group(1), match.group(2)
+
+
+def parse_id_lines(text):
+    """解析批量输入（每行 shopid,itemid），忽略空行和格式错误的行"""
+    targets = []
+    for line in text.split('\n'):
+        parts = [p.strip() for p in line.replace('，', ',').split(',')]
+        if len(parts) == 2 and parts[0].isdigit() and parts[1].isdigit():
+            targets.append((parts[0], parts[1]))
+    return targets
+
+
+def parse_targets(text):
+    """每行一个 shopid,itemid 或产品URL，去重并保持顺序"""
+    targets = []
+    for line in text.split('\n'):
+        target = parse_item_url(line) if 'i.' in line else None
+        targets.extend([target] if target else parse_id_lines(line))
+    return list(dict.fromkeys(targets))
+
+
+def item_referer(shopid, itemid):
+    return f"https://shopee.co.id/product-i.{shopid}.{itemid}"
+
+
+def build_params(shopid, itemid, offset, limit=PAGE_LIMIT, rating_filter=0):
+    return {
+        'itemid': itemid,
+        'shopid': shopid,
+        'limit': limit,
+        'offset': offset,
+        'filter': rating_filter,
+        'flag': 1,
+        'type': 0
+    }
+
+
+def rating_to_row(rating, shopid, itemid, crawl_time=None):
+    product_items = rating.get('product_items') or [{}]
+    row = {
+        'product_id': itemid,
+        'shop_id': shopid,
+        'rating_id': rating.get('cmtid'),
+        'crawl_date': crawl_time or now_epoch(),
+        'platform': 'Shopee Indonesia',
+        'username': rating.get('author_username', ''),
+        'rating': rating.get('rating_star', 0),
+        'comment': rating.get('comment', ''),
+        'likes': rating.get('like_count', 0),
+        # UTC epoch 秒，显示/导出时再格式化为WIB时间
+        'create_time': int(rating['ctime']) if rating.get('ctime') else None,
+        'item_name': product_items[0].get('name', ''),
+        'variation': product_items[0].get('model_name', '')
+    }
+
+    # 处理图片
+    if rating.get('images'):
+        row['images'] = ','.join(rating['images'])
+
+    return row
+
+
+def rating_mark(rating):
+    return (int(rating.get('ctime') or 0), int(rating.get('cmtid') or 0))
+
+
+def newest_first(ratings, previous_oldest=None):
+    """本页评论时间不递增，且不晚于上一页最旧的评论"""
+    times = [int(r.get('ctime') or 0) for r in ratings]
+    if previous_oldest is not None and times and times[0] > previous_oldest:
+        return False
+    return all(a >= b for a, b in zip(times, times[1:]))
+
+
+def resumes_at(ratings, resume):
+    """跳过已爬区间后落到的页：包含续爬点，或第一条仍晚于续爬点（跳过的都是已爬评论）"""
+    if not ratings:
+        return False
+    return int(ratings[0].get('ctime') or 0) > resume[0] or any(rating_mark(r) == resume for r in ratings)
+
+
+@dataclass
+class ItemResult:
+    shopid: str
+    itemid: str
+    rows: list = field(default_factory=list)
+    pages: int = 0
+    error: str = ''
+    # 本次看到的最新 (ctime, cmtid)，以及是否已完整覆盖到旧水位线
+    newest: tuple = None
+    complete: bool = False
+    # 达到 max_comments 时最后处理的评论及其位置（从最新评论数起的条数），下次从这里续爬
+    resume: tuple = None
+    resume_count: int = 0
+    # 入库前被过滤的评论数：{(原因, 详情): 条数}
+    rejected: Counter = field(default_factory=Counter)
+
+
+# ============================================
+# 异步爬取引擎：多商品并发分页，连接池复用
+# ============================================
+class ShopeeRatingsEngine:
+    def __init__(self, max_connections=20, requests_per_second=None, timeout=20,
+                 base_url=RATINGS_URL, max_retries=4, cache=None):
+        self.base_url = base_url
+        self.cache = cache
+        self.max_connections = max_connections
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.requests_sent = 0
+        self.limiter = None
+
+    def stats(self):
+        stats = self.limiter.stats() if self.limiter else {}
+        stats['requests'] = self.requests_sent
+        return stats
+
+    async def _get_json(self, session, bucket, params, referer, validators=None):
+        headers = dict(DEFAULT_HEADERS, Referer=referer, **(validators or {}))
+        status, retry_after, data, response_headers = 0, None, None, {}
+        acquired = False
+        started = time.monotonic()
+        try:
+            # 排队等待时任务被取消也要经过 finally，否则占用的并发名额永远不归还
+            await self.limiter.acquire()
+            acquired = True
+            if bucket is not None:
+                await bucket.acquire()
+            started = time.monotonic()
+            self.requests_sent += 1
+            async with session.get(self.base_url, params=params, headers=headers) as response:
+                status = response.status
+                response_headers = response.headers
+                if status == 200:
+                    try:
+                        data = await response.json(content_type=None)
+                    except (ValueError, aiohttp.ContentTypeError):
+                        data = None
+                    if not isinstance(data, dict):
+                        # 反爬验证码/登录页也返回200；按失败计入限流器并重试，不能当作成功提速
+                        status, data = None, "响应不是评论数据（可能被反爬拦截）"
+                    elif data.get('error'):
+                        # 软封禁/限流：200 + 非零 error + data 为空，不能当作"没有更多评论"，也不写入缓存
+                        status, data = None, f"接口返回错误: {data.get('error')}"
+                else:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            return status, retry_after, data, response_headers
+        finally:
+            # 网络异常按5xx计入，同样触发退避
+            if acquired:
+                await self.limiter.release(status or 599, time.monotonic() - started, retry_after)
+
+    async def _fetch_page(self, session, bucket, params, referer, revalidate=False):
+        cached, validators = None, None
+        if self.cache is not None:
+            cached, fresh, validators = self.cache.lookup(params, revalidate)
+            if fresh and not revalidate:
+                return cached, ''
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, retry_after, data, response_headers = await self._get_json(
+                    session, bucket, params, referer, validators)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, retry_after, data = None, None, f"网络错误: {e}"
+            if status == 304 and cached is not None:
+                self.cache.mark_revalidated(params)
+                return cached, ''
+            if status == 200:
+                if self.cache is not None:
+                    self.cache.store(params, data, response_headers.get('ETag'),
+                                     response_headers.get('Last-Modified'))
+                return data, ''
+            retryable = status is None or status == 429 or status >= 500
+            if not retryable or attempt == self.max_retries:
+                return None, data if status is None else f"API请求失败: {status}"
+            # 有Retry-After时由限流器统一暂停所有请求，否则指数退避
+            if retry_after is None:
+                await asyncio.sleep(min(2 ** attempt, 30) * 0.5)
+        return None, "API请求失败"
+
+    async def _crawl_item(self, session, bucket, shopid, itemid,
+                          max_comments, rating_filter, on_page, on_item, watermark=None, row_filter=None):
+        result = ItemResult(shopid, itemid)
+        referer = item_referer(shopid, itemid)
+        offset = 0
+        oldest = None
+        # 最后处理过的评论 (标记, 在列表中的位置)；达到上限时下次从它之后续爬
+        last = None
+        # 是否已越过上次的最新评论；跳过已爬区间后，校验失败时回到的 (offset, last, oldest)
+        passed_newest = False
+        fallback = None
+
+        while True:
+            params = build_params(shopid, itemid, offset, PAGE_LIMIT, rating_filter)
+            # 增量模式下分页会随新评论整体后移，缓存页面必须重新验证
+            data, error = await self._fetch_page(session, bucket, params, referer,
+                                                 revalidate=watermark is not None)
+            if error:
+                result.error = error
+                break
+            if not isinstance(data, dict) or data.get('error'):
+                # 旧版本缓存中可能存有非评论数据或错误响应
+                result.error = "响应不是评论数据"
+                break
+
+            ratings = (data.get('data') or {}).get('ratings') or []
+            if fallback is not None:
+                if not resumes_at(ratings, watermark.resume):
+                    # 已爬区间中有评论被删除，位置对不上：回到跳转前的位置顺序翻页
+                    (offset, last, oldest), fallback = fallback, None
+                    continue
+                fallback = None
+            if not ratings:
+                result.complete = True
+                break
+
+            # 遇到水位线即停止翻页的前提是接口按时间从新到旧分页（接口默认顺序，没有排序参数）；
+            # 顺序不符时不能确定水位线之前的评论都已取到，报错而不是推进水位线
+            page_size = len(ratings)
+            if watermark is not None and not newest_first(ratings, oldest):
+                result.error = "评论分页不是按时间从新到旧，无法增量爬取"
+                break
+            oldest = min(int(r.get('ctime') or 0) for r in ratings)
+            ratings = sorted(ratings, key=rating_mark, reverse=True)
+            newest = rating_mark(ratings[0])
+            if result.newest is None or newest > result.newest:
+                result.newest = newest
+
+            crawl_time = now_epoch()
+            rows, stop = [], None
+            for index, rating in enumerate(ratings):
+                mark, position = rating_mark(rating), offset + index
+                if watermark is not None and watermark.reached_end(mark):
+                    stop = 'end'
+                    break
+                if watermark is not None and watermark.covers(mark):
+                    if not passed_newest:
+                        # 第一次遇到已爬评论：[resume, newest] 上次都已处理，直接跳到 resume 所在位置
+                        passed_newest = True
+                        stop = 'skip'
+                        skip_from = (mark, position)
+                        break
+                    last = (mark, position)
+                    continue
+                if len(result.rows) + len(rows) >= max_comments:
+                    stop = 'full'
+                    break
+                last = (mark, position)
+                row = rating_to_row(rating, shopid, itemid, crawl_time)
+                # 被过滤的评论不入库，也不占用 max_comments 名额
+                rows.extend(row_filter.apply([row], result.rejected) if row_filter else [row])
+            result.rows.extend(rows)
+            result.pages += 1
+            if on_page:
+                on_page(result, rows)
+
+            if stop == 'end' or (stop is None and page_size < PAGE_LIMIT):
+                # 已衔接上次的进度，或没有更多评论
+                result.complete = True
+                break
+            if stop == 'skip':
+                mark, position = skip_from
+                skip_to = position + watermark.resume_count - 1
+                if len(result.rows) >= max_comments:
+                    last = (watermark.resume, skip_to)
+                    break
+                fallback = (position + 1, skip_from, mark[0])
+                offset, last, oldest = skip_to, (watermark.resume, skip_to), mark[0]
+                continue
+            if stop == 'full' or len(result.rows) >= max_comments:
+                break
+            offset += page_size
+
+        if not result.complete and last is not None:
+            result.resume, result.resume_count = last[0], last[1] + 1
+        if on_item:
+            on_item(result)
+        return result
+
+    async def crawl(self, targets, max_comments=100, rating_filter=0, on_page=None, on_item=None,
+                    watermarks=None, row_filter=None):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections,
+            ttl_dns_cache=300,
+            keepalive_timeout=30
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        # 实际速率由AIMD并发控制随限流和延迟调整；令牌桶只作为可选的硬上限
+        bucket = TokenBucket(self.requests_per_second) if self.requests_per_second else None
+        self.limiter = AdaptiveLimiter(initial=min(4, self.max_connections), max_limit=self.max_connections)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            tasks = [
+                self._crawl_item(session, bucket, shopid, itemid,
+                                 max_comments, rating_filter, on_page, on_item,
+                                 (watermarks or {}).get((shopid, itemid)), row_filter)
+                for shopid, itemid in targets
+            ]
+            return await asyncio.gather(*tasks)
+
+    def crawl_sync(self, targets, max_comments=100, rating_filter=0, on_page=None, on_item=None,
+                   watermarks=None, row_filter=None):
+        return asyncio.run(self.crawl(targets, max_comments, rating_filter, on_page, on_item, watermarks,
+                                      row_filter))
+
+    def crawl_incremental(self, targets, watermark_store, max_comments=100, rating_filter=0, on_page=None,
+                          on_item=None, row_filter=None):
+        """按水位线只爬新评论，再接着补爬上次因 max_comments 没爬完的旧评论。返回 (结果列表, 已有水位线的商品数)"""
+        watermarks = watermark_store.get_many(targets, rating_filter)
+        results = self.crawl_sync(targets, max_comments, rating_filter, on_page, on_item, watermarks, row_filter)
+        # 中途失败的商品不推进，避免留下缺口；达到上限的商品记下续爬点
+        for result in results:
+            if result.error or not result.newest or not (result.complete or result.resume):
+                continue
+            previous = watermarks.get((result.shopid, result.itemid))
+            if previous is None:
+                mark = Watermark(result.newest, result.resume, result.resume_count)
+            else:
+                mark = previous.advance(result.newest, result.resume, result.resume_count)
+            watermark_store.advance(result.shopid, result.itemid, mark, rating_filter)
+        return results, len(watermarks)
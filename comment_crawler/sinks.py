@@ -0,0 +1,132 @@
+import csv
+import json
+import os
+import sys
+from abc import ABC, abstractmethod
+
+# 输出文件扩展名 -> 格式
+SINK_FORMATS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv', '.parquet': 'parquet',
+                '.feather': 'feather', '.db': 'sqlite', '.sqlite': 'sqlite'}
+# CSV固定列（两个平台爬虫输出字段的并集，与Parquet导出结构同序）；行中没有的字段留空
+CSV_FIELDS = ('platform', 'shop_id', 'product_id', 'video_id', 'item_name', 'variation', 'rating_id', 'comment_id',
+              'username', 'comment', 'rating', 'likes', 'reply_count', 'create_time', 'crawl_date', 'time_text',
+              'images', 'product_url', 'cursor')
+
+
+# ============================================
+# 命令行爬取的输出：逐批写入评论行（原始字段，时间为UTC epoch秒）
+# ============================================
+class _Sink(ABC):
+    def __init__(self):
+        self.rows = 0
+
+    @abstractmethod
+    def write(self, dataset, rows):
+        """写入一批评论，返回写入条数"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlSink(_Sink):
+    """每行一个JSON对象，边爬边写"""
+
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+
+    def write(self, dataset, rows):
+        for row in rows:
+            self._stream.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+        self._stream.flush()
+        self.rows += len(rows)
+        return len(rows)
+
+    def close(self):
+        if self._stream is not sys.stdout:
+            self._stream.close()
+
+
+class CsvSink(_Sink):
+    """打开时写表头（固定列），之后边爬边追加；中途崩溃时已写入的行仍保留"""
+
+    def __init__(self, path, fields=CSV_FIELDS):
+        super().__init__()
+        # utf-8-sig：Excel直接打开时印尼文/中文不乱码（与界面导出一致）
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction='ignore')
+        self._writer.writeheader()
+        self._file.flush()
+
+    def write(self, dataset, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows += len(rows)
+        return len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ColumnarSink(_Sink):
+    """Parquet/Feather：先追加到列式存储，结束时按固定结构写出"""
+
+    def __init__(self, path, fmt):
+        from .store import CommentStore
+
+        super().__init__()
+        self.path = path
+        self.fmt = fmt
+        self._store = CommentStore()
+
+    def write(self, dataset, rows):
+        added = self._store.extend(rows)
+        self.rows += added
+        return added
+
+    def close(self):
+        from .columnar import write_feather, write_parquet
+
+        writer = write_parquet if self.fmt == 'parquet' else write_feather
+        with open(self.path, 'wb') as f:
+            writer(self._store.frame(), f)
+
+
+class ArchiveSink(_Sink):
+    """写入SQLite评论归档（与界面的持久化选项同一结构），重复评论只刷新可变字段"""
+
+    def __init__(self, path):
+        from .archive import CommentArchive
+
+        super().__init__()
+        self._archive = CommentArchive(path)
+
+    def write(self, dataset, rows):
+        added = self._archive.upsert(dataset, rows)
+        self.rows += added
+        return added
+
+    def close(self):
+        self._archive.close()
+
+
+def open_sink(path, fmt=None):
+    """按 fmt 或扩展名选择输出；path 为 '-' 时以JSON Lines写到标准输出"""
+    if path == '-':
+        return JsonlSink(sys.stdout)
+    fmt = fmt or SINK_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt == 'jsonl':
+        return JsonlSink(open(path, 'w', encoding='utf-8'))
+    if fmt == 'csv':
+        return CsvSink(path)
+    if fmt in ('parquet', 'feather'):
+        return ColumnarSink(path, fmt)
+    if fmt == 'sqlite':
+        return ArchiveSink(path)
+    raise ValueError(f"无法识别的输出格式: {path}")
@@ -0,0 +1,272 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from .times import NAT, to_epoch
+
+# 低基数字符串字段：字典编码（整数代码 + 去重后的取值表）
+CATEGORY_FIELDS = {'platform', 'shop_id', 'product_id', 'video_id', 'product_url', 'item_name', 'variation'}
+# 计数类字段：int64 + 缺失值掩码
+INT_FIELDS = {'rating', 'likes', 'reply_count', 'rating_id', 'cursor'}
+# 时间字段：UTC epoch 秒（int64），视图中为不带时区的 datetime64[s]（UTC）
+TIME_FIELDS = {'crawl_date', 'create_time'}
+
+# 页面上的计数文本，如 "1.2K"、"3,4rb"、"Balas 5"
+COUNT_PATTERN = re.compile(r'(\d+(?:[.,]\d+)*)\s*(k|m|rb|jt|b)?', re.IGNORECASE)
+COUNT_SUFFIXES = {'k': 1e3, 'rb': 1e3, 'm': 1e6, 'jt': 1e6, 'b': 1e9}
+
+
+def parse_count(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, float):
+        return None if value != value else int(value)
+    match = COUNT_PATTERN.search(str(value))
+    if not match:
+        return None
+    number, suffix = match.groups()
+    if not suffix:
+        # 没有单位时 "." 和 "," 都是千位分隔符
+        return int(re.sub(r'[.,]', '', number))
+    return int(float(number.replace(',', '.')) * COUNT_SUFFIXES[suffix.lower()])
+
+
+def _grow(array, capacity, fill):
+    grown = np.full(capacity, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _readonly(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+# ============================================
+# 列实现：预分配、按倍数扩容，写入只追加
+# ============================================
+class _IntColumn:
+    def __init__(self, capacity):
+        self.values = np.zeros(capacity, dtype=np.int64)
+        self.missing = np.ones(capacity, dtype=bool)
+
+    def reserve(self, capacity):
+        self.values = _grow(self.values, capacity, 0)
+        self.missing = _grow(self.missing, capacity, True)
+
+    def write(self, start, values):
+        parsed = [parse_count(v) for v in values]
+        end = start + len(parsed)
+        self.values[start:end] = [0 if v is None else v for v in parsed]
+        self.missing[start:end] = [v is None for v in parsed]
+
+    def series(self, n):
+        return pd.arrays.IntegerArray(_readonly(self.values[:n]), _readonly(self.missing[:n]))
+
+    def nbytes(self, n):
+        return n * 9
+
+
+class _TimeColumn:
+    def __init__(self, capacity):
+        self.values = np.full(capacity, NAT, dtype=np.int64)
+        self._last = (None, NAT)
+
+    def reserve(self, capacity):
+        self.values = _grow(self.values, capacity, NAT)
+
+    def _epoch(self, value):
+        if value is None:
+            return NAT
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        # 旧数据中的时间文本（WIB），同一批次通常相同，只解析一次
+        if value == self._last[0]:
+            return self._last[1]
+        epoch = to_epoch(value)
+        epoch = NAT if epoch is None else epoch
+        self._last = (value, epoch)
+        return epoch
+
+    def write(self, start, values):
+        self.values[start:start + len(values)] = [self._epoch(v) for v in values]
+
+    def series(self, n):
+        return _readonly(self.values[:n]).view('datetime64[s]')
+
+    def nbytes(self, n):
+        return n * 8
+
+
+class _CategoryColumn:
+    def __init__(self, capacity):
+        self.codes = np.full(capacity, -1, dtype=np.int8)
+        self.categories = []
+        self.lookup = {}
+        self._dtype = None
+
+    def reserve(self, capacity):
+        self.codes = _grow(self.codes, capacity, -1)
+
+    def _code(self, value):
+        if value is None:
+            return -1
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.categories)
+            self.categories.append(value)
+            self._dtype = None
+        return code
+
+    def write(self, start, values):
+        codes = [self._code(v) for v in values]
+        # 代码宽度与pandas一致（int8/int16/int32），构建Categorical时不必转换
+        width = np.int8 if len(self.categories) < 127 else np.int16 if len(self.categories) < 32767 else np.int32
+        if self.codes.dtype != width:
+            self.codes = self.codes.astype(width)
+        self.codes[start:start + len(codes)] = codes
+
+    def series(self, n):
+        if self._dtype is None:
+            self._dtype = pd.CategoricalDtype(pd.Index(self.categories, dtype=object))
+        return pd.Categorical.from_codes(_readonly(self.codes[:n]), dtype=self._dtype, validate=False)
+
+    def nbytes(self, n):
+        return n * self.codes.itemsize + sum(len(str(v)) + 50 for v in self.categories)
+
+
+class _TextColumn:
+    def __init__(self, capacity):
+        self.values = np.full(capacity, None, dtype=object)
+
+    def reserve(self, capacity):
+        self.values = _grow(self.values, capacity, None)
+
+    def write(self, start, values):
+        self.values[start:start + len(values)] = values
+
+    def series(self, n):
+        return pd.Series(_readonly(self.values[:n]), dtype=object, copy=False)
+
+    def nbytes(self, n):
+        return n * 8 + sum(len(v) + 50 for v in self.values[:n] if isinstance(v, str))
+
+
+def _column_for(name, capacity):
+    if name in CATEGORY_FIELDS:
+        return _CategoryColumn(capacity)
+    if name in INT_FIELDS:
+        return _IntColumn(capacity)
+    if name in TIME_FIELDS:
+        return _TimeColumn(capacity)
+    return _TextColumn(capacity)
+
+
+# ============================================
+# 列式评论存储：替代session_state中的字典列表
+# ============================================
+class CommentStore:
+    """只追加的列式存储；frame() 返回零拷贝的只读DataFrame视图"""
+
+    def __init__(self, key_fields=None, capacity=1024):
+        self.key_fields = tuple(key_fields) if key_fields else None
+        # version 每次变更递增；generation 只在清空时递增，增量计算据此判断能否接着算
+        self.version = 0
+        self.generation = 0
+        self._capacity = capacity
+        self._size = 0
+        self._columns = {}
+        self._keys = set()
+        self._frame = None
+
+    def __len__(self):
+        return self._size
+
+    def _reserve(self, needed):
+        if needed <= self._capacity:
+            return
+        while self._capacity < needed:
+            self._capacity *= 2
+        for column in self._columns.values():
+            column.reserve(self._capacity)
+
+    def extend(self, rows):
+        """追加一批评论，返回实际新增的条数（设置了key_fields时跳过重复评论）"""
+        rows = list(rows)
+        if self.key_fields:
+            fresh = []
+            for row in rows:
+                key = tuple(row.get(name) for name in self.key_fields)
+                # 没有评论ID的行无法判断是否重复，一律保留，也不记入已见集合
+                if key[-1] is not None:
+                    if key in self._keys:
+                        continue
+                    self._keys.add(key)
+                fresh.append(row)
+            rows = fresh
+        if not rows:
+            return 0
+
+        names = dict.fromkeys(name for row in rows for name in row)
+        self._reserve(self._size + len(rows))
+        for name in names:
+            if name not in self._columns:
+                self._columns[name] = _column_for(name, self._capacity)
+        for name, column in self._columns.items():
+            # 本批没有的字段保持预填充的缺失值
+            if name in names:
+                column.write(self._size, [row.get(name) for row in rows])
+
+        self._size += len(rows)
+        self.version += 1
+        self._frame = None
+        return len(rows)
+
+    def append(self, row):
+        return self.extend([row])
+
+    def clear(self):
+        version, generation = self.version, self.generation
+        self.__init__(self.key_fields)
+        self.version = version + 1
+        self.generation = generation + 1
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def frame(self):
+        """只读DataFrame视图，不复制底层数组；数据不变时重复调用直接返回同一对象"""
+        if self._frame is None:
+            self._frame = pd.DataFrame(
+                {name: column.series(self._size) for name, column in self._columns.items()},
+                copy=False
+            )
+        return self._frame
+
+    def to_arrow(self):
+        """pyarrow.Table视图；数值列和字典编码列直接引用底层缓冲区"""
+        import pyarrow as pa
+
+        arrays = {}
+        for name, column in self._columns.items():
+            n = self._size
+            if isinstance(column, _IntColumn):
+                arrays[name] = pa.array(column.values[:n], mask=column.missing[:n])
+            elif isinstance(column, _TimeColumn):
+                values = column.values[:n]
+                arrays[name] = pa.array(values.view('datetime64[s]'), mask=values == NAT, type=pa.timestamp('s', tz='UTC'))
+            elif isinstance(column, _CategoryColumn):
+                codes = column.codes[:n]
+                arrays[name] = pa.DictionaryArray.from_arrays(
+                    pa.array(codes, mask=codes < 0), pa.array([str(v) for v in column.categories], type=pa.string()))
+            else:
+                arrays[name] = pa.array(column.values[:n], type=pa.string(), from_pandas=True)
+        return pa.table(arrays)
+
+    def nbytes(self):
+        return sum(column.nbytes(self._size) for column in self._columns.values())
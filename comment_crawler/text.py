@@ -0,0 +1,95 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import pandas as pd
+
+# ============================================
+# 印尼语评论文本规范化与分词
+# ============================================
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+|@\w+')
+# 同一字母连续出现3次及以上（"bagusss"、"mantappp"）压缩为1次
+REPEAT_PATTERN = re.compile(r'([a-z])\1{2,}')
+TOKEN_PATTERN = re.compile(r'[a-z]+(?:-[a-z]+)*')
+# 同上，另外把句读符号（数字中的小数点/千位分隔符除外）作为独立的词保留，供情感分析切分子句
+CLAUSE_TOKEN_PATTERN = re.compile(r'[a-z]+(?:-[a-z]+)*|[.,;:!?]+(?!\d)')
+
+# 常见缩写与网络用语 -> 标准写法
+SLANG = {
+    'yg': 'yang', 'dgn': 'dengan', 'dg': 'dengan', 'utk': 'untuk', 'untk': 'untuk', 'krn': 'karena',
+    'karna': 'karena', 'tp': 'tapi', 'tpi': 'tapi', 'jg': 'juga', 'aja': 'saja', 'aj': 'saja',
+    'sdh': 'sudah', 'udh': 'sudah', 'udah': 'sudah', 'dah': 'sudah', 'blm': 'belum', 'blom': 'belum',
+    'gak': 'tidak', 'ga': 'tidak', 'gk': 'tidak', 'nggak': 'tidak', 'ngga': 'tidak', 'engga': 'tidak',
+    'enggak': 'tidak', 'tdk': 'tidak', 'tak': 'tidak', 'g': 'tidak',
+    'bgt': 'banget', 'bngt': 'banget', 'bgd': 'banget', 'sngt': 'sangat', 'sgt': 'sangat',
+    'bgs': 'bagus', 'mantul': 'mantap', 'mantab': 'mantap', 'mntp': 'mantap', 'brg': 'barang',
+    'brang': 'barang', 'krim': 'kirim', 'pengirimannya': 'pengiriman', 'cpt': 'cepat', 'cepet': 'cepat',
+    'lmbt': 'lambat', 'lelet': 'lambat', 'bnyk': 'banyak', 'byk': 'banyak', 'sm': 'sama', 'sma': 'sama',
+    'sy': 'saya', 'aku': 'saya', 'gw': 'saya', 'gue': 'saya', 'kak': 'kakak', 'min': 'admin',
+    'ok': 'oke', 'okee': 'oke', 'okey': 'oke', 'oks': 'oke', 'recomended': 'rekomendasi',
+    'recommended': 'rekomendasi', 'rekomen': 'rekomendasi', 'recommend': 'rekomendasi',
+    'trims': 'terima kasih', 'makasih': 'terima kasih', 'mksh': 'terima kasih', 'thx': 'terima kasih',
+    'tq': 'terima kasih', 'ori': 'original', 'kw': 'palsu', 'hrg': 'harga', 'mrh': 'murah',
+    'pesen': 'pesan', 'order': 'pesan', 'packing': 'kemasan', 'paking': 'kemasan',
+    'packingnya': 'kemasan', 'seller': 'penjual', 'bs': 'bisa', 'bsa': 'bisa',
+    'lg': 'lagi', 'lgi': 'lagi', 'msh': 'masih', 'masi': 'masih', 'dtg': 'datang', 'nyampe': 'sampai',
+    'nyampai': 'sampai', 'sampe': 'sampai', 'kyk': 'seperti', 'kayak': 'seperti',
+    'bkn': 'bukan', 'jgn': 'jangan', 'blh': 'boleh', 'lbh': 'lebih', 'kurg': 'kurang', 'krg': 'kurang',
+}
+
+# 结尾是 -nya 但不是附着词的词
+NYA_WORDS = {'punya', 'hanya', 'tanya', 'bertanya', 'ditanya', 'menanyakan', 'ditanyakan', 'nyanya',
+             'bunya', 'sanya', 'karunia', 'dunia', 'senyanya'}
+
+# 分析关键词时忽略的虚词；否定词（tidak、belum、kurang……）保留，"tidak sesuai" 这类短语有意义
+STOPWORDS = frozenset("""
+yang dan di ke dari ini itu untuk dengan ada pada juga saja sudah akan bisa dalam atau karena
+jadi kalau kalo tapi tetapi namun lagi masih sama seperti oleh agar supaya bahwa biar pun
+nya sih deh dong kok loh lho ya yah yaa nih tuh kan wkwk wkwkwk haha hehe hihi
+saya kamu dia kami kita mereka anda kakak gan sis bro admin
+adalah ialah para tersebut nah aduh eh oh ah
+banget sangat sekali lebih paling cukup agak
+buat bikin mau ingin pengen pingin biasa memang emang
+apa siapa mana kapan bagaimana gimana kenapa mengapa berapa
+sini situ sana begitu begini gitu gini
+satu dua tiga lalu terus trus
+""".split())
+
+
+def normalize_token(token):
+    token = SLANG.get(token, token)
+    # 重叠词 "barang-barang" -> "barang"
+    if '-' in token:
+        parts = token.split('-')
+        if len(set(parts)) == 1:
+            token = parts[0]
+    # 附着词 "barangnya" -> "barang"
+    if token.endswith('nya') and len(token) > 6 and token not in NYA_WORDS:
+        token = SLANG.get(token[:-3], token[:-3])
+    return token
+
+
+@lru_cache(maxsize=None)
+def _token_words(token):
+    # 词表有限，规范化结果按原始词缓存；俚语可能展开成多个词
+    return tuple(normalize_token(token).split())
+
+
+def _clean_lines(texts):
+    # 整批拼成一个字符串，规范化/小写/正则替换各只调用一次，避免逐条调用的开销
+    lines = texts.fillna('').astype(str).str.replace('\n', ' ', regex=False)
+    joined = unicodedata.normalize('NFKC', '\n'.join(lines)).lower()
+    joined = REPEAT_PATTERN.sub(r'\1', URL_PATTERN.sub(' ', joined))
+    return joined.split('\n') if len(lines) else []
+
+
+def clean_texts(texts):
+    """批量清洗：统一字符宽度和大小写，去掉链接/@提及，压缩重复字母"""
+    return pd.Series(_clean_lines(texts), index=texts.index, dtype=object)
+
+
+def tokenize_texts(texts, punctuation=False):
+    """pandas Series -> 每条评论规范化后的词列表（包含停用词，由调用方决定是否过滤）；
+    punctuation=True 时句读符号也作为词保留"""
+    findall = (CLAUSE_TOKEN_PATTERN if punctuation else TOKEN_PATTERN).findall
+    return [[word for token in findall(line) for word in _token_words(token)] for line in _clean_lines(texts)]
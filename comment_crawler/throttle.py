@@ -0,0 +1,158 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# ============================================
+# 全局请求预算（令牌桶，所有商品共享）
+# ============================================
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def parse_retry_after(value):
+    """解析Retry-After头（秒数或HTTP日期），返回等待秒数或None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# ============================================
+# AIMD自适应并发控制
+# ============================================
+class AdaptiveLimiter:
+    """根据429/5xx、延迟和错误率自动调整在途请求数（加性增、乘性减）"""
+
+    def __init__(self, initial=4, min_limit=1, max_limit=100, backoff_factor=0.5,
+                 latency_target=2.0, latency_spike=3.0, max_error_rate=0.05, window=200):
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.latency_target = latency_target
+        self.latency_spike = latency_spike
+        self.max_error_rate = max_error_rate
+
+        self.in_flight = 0
+        self.state = "启动"
+        self.backoff_count = 0
+        self.blocked_until = 0.0
+
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._completions = deque()
+        self._baseline = None
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    def _percentile(self, q):
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def _error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return 1 - sum(self._outcomes) / len(self._outcomes)
+
+    async def acquire(self):
+        async with self._cond:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait > 0:
+                    self.state = f"退避中 {wait:.0f}s"
+                    # 退避期间释放锁，到期后重新检查
+                    self._cond.release()
+                    try:
+                        await asyncio.sleep(wait)
+                    finally:
+                        await self._cond.acquire()
+                    continue
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                await self._cond.wait()
+
+    async def release(self, status, latency, retry_after=None):
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            failed = status == 429 or status >= 500
+            self._outcomes.append(0 if failed else 1)
+            self._completions.append(now)
+
+            if not failed:
+                self._latencies.append(latency)
+                # 基线延迟取慢速跟随的最小值，避免被尖峰拉高
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    self._baseline += (latency - self._baseline) * 0.01
+
+            spike = (not failed and self._baseline is not None
+                     and latency > max(self.latency_target, self._baseline * self.latency_spike))
+
+            if failed or spike:
+                # 同一轮在途请求只触发一次乘性减
+                if now - self._last_decrease > max(self._percentile(0.5), 0.2):
+                    self.limit = max(self.min_limit, self.limit * self.backoff_factor)
+                    self._last_decrease = now
+                    self.backoff_count += 1
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+                self.state = f"退避 (HTTP {status})" if failed else "退避 (延迟尖峰)"
+            elif self._percentile(0.95) <= self.latency_target and self._error_rate() <= self.max_error_rate:
+                # 加性增：每完成约一个窗口的请求，并发+1
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.state = "提速" if self.limit < self.max_limit else "满速"
+            else:
+                self.state = "保持"
+
+            self._cond.notify_all()
+
+    def throughput(self, horizon=10.0):
+        now = time.monotonic()
+        while self._completions and now - self._completions[0] > horizon:
+            self._completions.popleft()
+        if not self._completions:
+            return 0.0
+        return len(self._completions) / max(now - self._completions[0], 1.0)
+
+    def stats(self):
+        return {
+            'concurrency': int(self.limit),
+            'in_flight': self.in_flight,
+            'throughput': self.throughput(),
+            'p95_latency': self._percentile(0.95),
+            'error_rate': self._error_rate(),
+            'backoffs': self.backoff_count,
+            'state': self.state,
+        }
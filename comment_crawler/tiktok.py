@@ -0,0 +1,575 @@
+import base64
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+
+from .times import NAT, now_epoch, resolve_times
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+# 轻量模式下限制渲染进程内存、关闭后台功能
+LEAN_CHROME_ARGS = [
+    "--js-flags=--max-old-space-size=512",
+    "--renderer-process-limit=2",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-sync",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+    "--disable-features=MediaRouter,OptimizationHints,Translate",
+]
+
+# 轻量模式通过CDP屏蔽的URL模式（按类别统计屏蔽数量）
+BLOCK_PATTERNS = {
+    'media': ["*.mp4*", "*.webm*", "*.m3u8*", "*.m4a*", "*.mp3*", "*mime_type=video*",
+              "*://v*-webapp*.tiktok.com/*", "*://*.tiktokcdn*.com/*/video/*"],
+    'image': ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.heic*", "*.image?*",
+              "*~tplv-*"],
+    'font': ["*.woff*", "*.ttf*", "*.otf*", "*.eot*"],
+    'tracker': ["*google-analytics.com/*", "*googletagmanager.com/*", "*doubleclick.net/*",
+                "*connect.facebook.net/*", "*analytics.tiktok.com/*", "*mon.tiktokv.com/*",
+                "*mcs.tiktokv.com/*", "*/slardar/*", "*sentry*"],
+}
+
+# 各类被屏蔽资源的典型大小（字节），仅用于估算节省流量
+TYPICAL_BLOCKED_BYTES = {'media': 1500000, 'image': 40000, 'font': 60000, 'tracker': 30000}
+
+
+def build_chrome_options(lean=True):
+    # selenium/undetected-chromedriver 只在真正启动浏览器时导入，只用Shopee时不付出导入开销
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")  # 无头模式
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    if lean:
+        for arg in LEAN_CHROME_ARGS:
+            chrome_options.add_argument(arg)
+    # 开启性能日志以便从网络事件中截获评论接口的JSON
+    chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return chrome_options
+
+
+_binary_lock = threading.Lock()
+_binary_ready = False
+
+
+def prepare_driver_binary():
+    """下载并修补一次chromedriver；之后并行启动的浏览器都以 user_multi_procs 复用这个文件，
+    不再各自改写同一个二进制（同时改写会让部分进程启动失败）"""
+    global _binary_ready
+    with _binary_lock:
+        if not _binary_ready:
+            import undetected_chromedriver as uc
+
+            uc.Patcher().auto()
+            _binary_ready = True
+
+
+def launch_driver(lean=True, prepared=False):
+    """prepared=True 表示父进程已调用过 prepare_driver_binary（进程池工作进程）"""
+    import undetected_chromedriver as uc
+
+    if not prepared:
+        prepare_driver_binary()
+    # 使用undetected-chromedriver避免被检测
+    return uc.Chrome(options=build_chrome_options(lean), user_multi_procs=True)
+
+
+def blocked_url_patterns(block_images=True):
+    patterns = []
+    for category, category_patterns in BLOCK_PATTERNS.items():
+        if category == 'image' and not block_images:
+            continue
+        patterns.extend(category_patterns)
+    return patterns
+
+
+def apply_request_blocking(driver, patterns):
+    """通过CDP设置本页的URL屏蔽列表（传空列表即取消屏蔽）"""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+
+def blocked_category(url):
+    for category, patterns in BLOCK_PATTERNS.items():
+        if any(fnmatchcase(url, pattern) for pattern in patterns):
+            return category
+    return 'other'
+
+
+def reset_driver(driver):
+    """归还浏览器池前清理页面，并丢弃未读取的性能日志"""
+    driver.get("about:blank")
+    driver.get_log('performance')
+
+
+def extract_video_id(url):
+    match = re.search(r'video/(\d+)', url)
+    return match.group(1) if match else "unknown"
+
+
+# ============================================
+# 评论批量提取：每次滚动只执行一次execute_script
+# ============================================
+# 依次尝试的评论节点选择器
+COMMENT_SELECTORS = [
+    "div[data-e2e='comment-list'] div.css-1soki6-DivCommentItemContainer",
+    "div[class*='CommentItem']",
+    "div.comment-item",
+    "div[data-e2e='comment-item']"
+]
+
+# (字段名, 子元素选择器, 找不到时的默认值)
+USERNAME_FIELD = ('username', "a[href*='/@'], span[class*='username']", "Unknown")
+CONTENT_FIELD = ('comment', "div[class*='content'], p, span[class*='text']", "")
+LIKES_FIELD = ('likes', "span[class*='like'], button[class*='like']", "0")
+# 页面上的时间文本（"2小时前"、"3-15"），爬取时按爬取时间解析为 create_time
+TIME_FIELD = ('time_text', "span[class*='time'], time", "")
+REPLY_FIELD = ('reply_count', "div[class*='reply'], button[class*='reply']", "0")
+
+# 页面内的增量收集器：选定选择器后只通过MutationObserver登记新增节点，
+# 每次提取只处理上次之后新增的节点，避免每次滚动重新扫描整个评论列表
+INSTALL_COLLECTOR_JS = """
+const [selectors] = arguments;
+if (!window.__ccCollector) {
+    const c = {selector: null, queue: [], queued: new WeakSet(), seen: 0, last: null};
+    const enqueue = (node) => {
+        if (c.queued.has(node) || node.hasAttribute('data-cc-seen')) return;
+        c.queued.add(node);
+        c.queue.push(node);
+    };
+    const pick = () => {
+        for (const sel of selectors) {
+            const nodes = document.querySelectorAll(sel);
+            if (nodes.length) {
+                c.selector = sel;
+                nodes.forEach(enqueue);
+                return;
+            }
+        }
+    };
+    c.observer = new MutationObserver((records) => {
+        if (!c.selector) { pick(); return; }
+        for (const record of records) {
+            for (const node of record.addedNodes) {
+                if (node.nodeType !== 1) continue;
+                if (node.matches(c.selector)) enqueue(node);
+                node.querySelectorAll(c.selector).forEach(enqueue);
+            }
+        }
+    });
+    c.observer.observe(document.body, {childList: true, subtree: true});
+    pick();
+    window.__ccCollector = c;
+}
+return {selector: window.__ccCollector.selector, pending: window.__ccCollector.queue.length};
+"""
+
+DRAIN_COMMENTS_JS = """
+const [fields, prune] = arguments;
+const c = window.__ccCollector;
+if (!c) return {selector: null, rows: [], errors: 0, seen: 0};
+const batch = c.queue.splice(0, c.queue.length);
+const rows = [];
+let errors = 0;
+for (const node of batch) {
+    try {
+        const row = {};
+        for (const [name, sel, fallback] of fields) {
+            const el = node.querySelector(sel);
+            row[name] = el ? el.innerText.trim() : fallback;
+        }
+        if (fields.length) rows.push(row);
+    } catch (e) {
+        errors++;
+    }
+    node.setAttribute('data-cc-seen', '1');
+    c.seen++;
+    c.last = node;
+    if (prune) {
+        // 用等高的空占位替换已处理节点的内容，保持滚动位置同时释放DOM内存
+        const height = node.offsetHeight;
+        node.replaceChildren();
+        if (height) node.style.minHeight = height + 'px';
+    }
+}
+return {selector: c.selector, rows: rows, errors: errors, seen: c.seen};
+"""
+
+
+def comment_fields(include_ratings=True, include_replies=True):
+    fields = [USERNAME_FIELD, CONTENT_FIELD]
+    if include_ratings:
+        fields.append(LIKES_FIELD)
+    fields.append(TIME_FIELD)
+    if include_replies:
+        fields.append(REPLY_FIELD)
+    return [list(field) for field in fields]
+
+
+def install_comment_collector(driver, selectors=COMMENT_SELECTORS):
+    """安装页面内评论收集器（每个页面只安装一次），返回 (选定的选择器, 待提取节点数)"""
+    result = driver.execute_script(INSTALL_COLLECTOR_JS, selectors) or {}
+    return result.get('selector'), result.get('pending', 0)
+
+
+def drain_comment_batch(driver, fields, prune=True):
+    """一次往返取出上次之后新增的评论行，返回 (行列表, 选择器, 出错节点数)"""
+    result = driver.execute_script(DRAIN_COMMENTS_JS, fields, prune) or {}
+    return result.get('rows', []), result.get('selector'), result.get('errors', 0)
+
+
+# ============================================
+# 事件驱动的加载等待（MutationObserver + 网络空闲），替代固定sleep
+# ============================================
+# 网络活动以 performance 资源条目数的变化近似
+_RESOURCE_COUNT_JS = """
+const resourceCount = () => (window.performance && performance.getEntriesByType)
+    ? performance.getEntriesByType('resource').length : 0;
+const pending = () => window.__ccCollector ? window.__ccCollector.queue.length : 0;
+"""
+
+WAIT_FOR_COMMENTS_JS = _RESOURCE_COUNT_JS + """
+const [timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const started = Date.now();
+let finished = false;
+const finish = () => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearInterval(timer);
+    done({pending: pending(), waited: Date.now() - started});
+};
+const observer = new MutationObserver(() => { if (pending() > 0) finish(); });
+observer.observe(document.documentElement || document.body, {childList: true, subtree: true});
+const timer = setInterval(() => {
+    if (pending() > 0 || Date.now() - started >= timeoutMs) finish();
+}, 100);
+if (pending() > 0) finish();
+"""
+
+SCROLL_AND_WAIT_JS = _RESOURCE_COUNT_JS + """
+const [timeoutMs, quietMs] = arguments;
+const done = arguments[arguments.length - 1];
+const started = Date.now();
+let lastActivity = started;
+let resources = resourceCount();
+let finished = false;
+const finish = (ended) => {
+    if (finished) return;
+    finished = true;
+    observer.disconnect();
+    clearInterval(timer);
+    done({pending: pending(), ended: ended, waited: Date.now() - started});
+};
+const observer = new MutationObserver(() => {
+    lastActivity = Date.now();
+    if (pending() > 0) finish(false);
+});
+observer.observe(document.body, {childList: true, subtree: true});
+
+// 同时滚动页面和最后一条已处理评论，兼容评论在独立滚动面板中的布局
+window.scrollTo(0, document.body.scrollHeight);
+const last = window.__ccCollector && window.__ccCollector.last;
+if (last && last.scrollIntoView) last.scrollIntoView({block: 'end'});
+
+const timer = setInterval(() => {
+    const now = Date.now();
+    const current = resourceCount();
+    if (current !== resources) {
+        resources = current;
+        lastActivity = now;
+    }
+    if (pending() > 0) return finish(false);
+    // DOM和网络都安静了一段时间仍无新评论，视为已到列表末尾
+    if (now - lastActivity >= quietMs || now - started >= timeoutMs) finish(true);
+}, 50);
+"""
+
+
+def wait_for_comment_list(driver, timeout, selectors=COMMENT_SELECTORS):
+    """安装收集器并等待评论出现（最多timeout秒），返回待提取的评论数"""
+    install_comment_collector(driver, selectors)
+    driver.set_script_timeout(timeout + 5)
+    result = driver.execute_async_script(WAIT_FOR_COMMENTS_JS, int(timeout * 1000)) or {}
+    return result.get('pending', 0)
+
+
+def scroll_and_wait(driver, timeout, quiet=0.8):
+    """滚动一次并等到新评论出现即返回，返回 (待提取评论数, 是否判定到达末尾)"""
+    driver.set_script_timeout(timeout + 5)
+    result = driver.execute_async_script(SCROLL_AND_WAIT_JS, int(timeout * 1000), int(quiet * 1000)) or {}
+    return result.get('pending', 0), result.get('ended', True)
+
+
+# ============================================
+# 网络拦截：从性能日志中截获评论列表接口的JSON响应
+# ============================================
+# 只匹配一级评论列表；/api/comment/list/reply/ 是楼中楼回复，游标与一级列表不同
+COMMENT_API_PATTERN = re.compile(r'/api/comment/list/?(?:\?|$)')
+
+
+class CommentResponseCapture:
+    def __init__(self, driver, pattern=COMMENT_API_PATTERN):
+        self.driver = driver
+        self.pattern = pattern
+        self._pending = {}
+        self._urls = {}
+        self.responses = 0
+        # 流量统计：实际下载字节数和按类别统计的被屏蔽请求数
+        self.bytes_received = 0
+        self.blocked = {}
+
+    def poll(self):
+        """读取新的性能日志，返回已完成加载的评论接口响应（解析后的JSON）"""
+        payloads = []
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params', {})
+            request_id = params.get('requestId')
+            if method == 'Network.requestWillBeSent':
+                self._urls[request_id] = params.get('request', {}).get('url', '')
+            elif method == 'Network.responseReceived':
+                if self.pattern.search(params.get('response', {}).get('url', '')):
+                    self._pending[request_id] = True
+            elif method == 'Network.loadingFinished':
+                self._urls.pop(request_id, None)
+                self.bytes_received += int(params.get('encodedDataLength') or 0)
+                if request_id in self._pending:
+                    del self._pending[request_id]
+                    payload = self._read_body(request_id)
+                    if payload is not None:
+                        payloads.append(payload)
+            elif method == 'Network.loadingFailed':
+                self._pending.pop(request_id, None)
+                url = self._urls.pop(request_id, '')
+                if params.get('blockedReason'):
+                    category = blocked_category(url)
+                    self.blocked[category] = self.blocked.get(category, 0) + 1
+        self.responses += len(payloads)
+        return payloads
+
+    def _read_body(self, request_id):
+        try:
+            result = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception:
+            return None
+        body = result.get('body', '')
+        if result.get('base64Encoded'):
+            body = base64.b64decode(body).decode('utf-8', errors='replace')
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def wait(self, timeout, interval=0.1):
+        """轮询直到截获新响应或超时"""
+        deadline = time.monotonic() + timeout
+        while True:
+            payloads = self.poll()
+            if payloads or time.monotonic() >= deadline:
+                return payloads
+            time.sleep(interval)
+
+
+def api_comment_to_row(comment, video_id, cursor, include_ratings=True, include_replies=True):
+    user = comment.get('user') or {}
+    row = {
+        'video_id': str(comment.get('aweme_id') or video_id),
+        'comment_id': str(comment.get('cid', '')),
+        'crawl_date': now_epoch(),
+        'platform': 'TikTok Shop',
+        'username': user.get('unique_id') or user.get('nickname') or "Unknown",
+        'comment': comment.get('text', ''),
+    }
+    if include_ratings:
+        row['likes'] = int(comment.get('digg_count') or 0)
+    row['create_time'] = int(comment['create_time']) if comment.get('create_time') else None
+    if include_replies:
+        row['reply_count'] = int(comment.get('reply_comment_total') or 0)
+    row['cursor'] = cursor
+    return row
+
+
+# ============================================
+# 单个页面的评论爬取流程（DOM解析或网络拦截）
+# ============================================
+@dataclass
+class TikTokCrawlOptions:
+    max_comments: int = 100
+    include_ratings: bool = True
+    include_replies: bool = True
+    capture_mode: str = 'dom'  # 'dom' 页面解析 | 'network' 网络拦截
+    wait_time: float = 3
+    scroll_timeout: float = 2
+    max_idle_scrolls: int = 3
+    prune_nodes: bool = True
+    lean_profile: bool = True  # 屏蔽视频、字体、统计脚本（及图片）
+    block_images: bool = True
+    max_scrolls: int = 500  # 安全上限，正常情况由末尾检测提前结束
+    comment_filter: object = None  # filters.CommentFilter，入库前丢弃的评论不计入 max_comments
+
+
+@dataclass
+class TikTokCrawlStats:
+    selector: str = None
+    scrolls: int = 0
+    responses: int = 0
+    errors: int = 0
+    ended: bool = False
+    bytes_received: int = 0
+    blocked: dict = field(default_factory=dict)
+    warnings: list = field(default_factory=list)
+    rejected: Counter = field(default_factory=Counter)
+
+    def estimated_bytes_saved(self):
+        return sum(TYPICAL_BLOCKED_BYTES.get(category, 0) * count for category, count in self.blocked.items())
+
+
+def crawl_comments(driver, url, options, on_rows=None):
+    """爬取一个TikTok页面的评论，返回 (行列表, 统计)；on_rows(新行, 累计条数) 用于实时进度"""
+    video_id = extract_video_id(url)
+    stats = TikTokCrawlStats()
+    rows = []
+
+    def emit(batch):
+        if options.comment_filter and batch:
+            batch = options.comment_filter.apply(batch, stats.rejected)
+        # 一次滚动或一个接口响应可能带来多条评论，超出 max_comments 的部分丢弃
+        batch = batch[:max(options.max_comments - len(rows), 0)]
+        rows.extend(batch)
+        if on_rows and batch:
+            on_rows(batch, len(rows))
+
+    # 网络日志同时用于截获评论接口和统计流量
+    capture = CommentResponseCapture(driver)
+    try:
+        capture.poll()
+    except Exception:
+        capture = None
+        if options.capture_mode == 'network':
+            # 浏览器未开启性能日志时无法拦截，退回页面解析
+            stats.warnings.append("浏览器未开启网络日志，已改用页面解析")
+
+    try:
+        # 浏览器池中的driver会被复用，每次按本次选项重新设置屏蔽列表
+        patterns = blocked_url_patterns(options.block_images) if options.lean_profile else []
+        apply_request_blocking(driver, patterns)
+    except Exception:
+        if options.lean_profile:
+            stats.warnings.append("无法设置请求屏蔽，已使用完整页面加载")
+
+    driver.get(url)
+    # 等待评论列表出现即继续，最长等待 wait_time
+    wait_for_comment_list(driver, options.wait_time)
+
+    network_done = False
+    if capture and options.capture_mode == 'network':
+        payloads = capture.wait(options.wait_time)
+        if payloads:
+            _crawl_network(driver, capture, payloads, video_id, options, stats, emit, rows)
+            network_done = True
+        else:
+            stats.warnings.append("未截获评论接口响应，已改用页面解析")
+    if not network_done:
+        _crawl_dom(driver, video_id, options, stats, emit, rows)
+
+    if capture:
+        try:
+            capture.poll()
+        except Exception:
+            pass
+        stats.bytes_received = capture.bytes_received
+        stats.blocked = dict(capture.blocked)
+    return rows, stats
+
+
+def _crawl_dom(driver, video_id, options, stats, emit, rows):
+    fields = comment_fields(options.include_ratings, options.include_replies)
+    idle_scrolls = 0
+
+    for _ in range(options.max_scrolls):
+        # 提取评论：只取上次之后新增的节点，整批在页面内序列化，一次往返
+        try:
+            batch, selector, errors = drain_comment_batch(driver, fields, options.prune_nodes)
+            stats.selector = selector or stats.selector
+            stats.errors += errors
+            if batch:
+                crawl_date = now_epoch()
+                # 整批相对时间一次向量化解析
+                created = resolve_times([row.get('time_text') for row in batch], crawl_date)
+                emit([dict({'video_id': video_id, 'crawl_date': crawl_date, 'platform': 'TikTok Shop',
+                            'create_time': None if epoch == NAT else int(epoch)}, **row)
+                      for row, epoch in zip(batch, created)])
+        except Exception as e:
+            stats.warnings.append(f"提取评论时出错: {str(e)}")
+
+        # 如果达到最大数量，停止
+        if len(rows) >= options.max_comments:
+            break
+
+        # 滚动后等到新评论出现即继续，不再固定sleep
+        pending, ended = scroll_and_wait(driver, options.scroll_timeout)
+        stats.scrolls += 1
+        if pending:
+            idle_scrolls = 0
+        elif ended:
+            # 连续多次滚动都没有新评论，判定已到列表末尾
+            idle_scrolls += 1
+            if idle_scrolls >= options.max_idle_scrolls:
+                stats.ended = True
+                break
+
+
+def _crawl_network(driver, capture, payloads, video_id, options, stats, emit, rows):
+    seen_ids = set()
+    idle_scrolls = 0
+
+    for _ in range(options.max_scrolls):
+        has_more = True
+        for payload in payloads:
+            cursor = payload.get('cursor')
+            batch = []
+            for comment in payload.get('comments') or []:
+                cid = comment.get('cid')
+                if cid in seen_ids:
+                    continue
+                seen_ids.add(cid)
+                batch.append(api_comment_to_row(comment, video_id, cursor,
+                                                options.include_ratings, options.include_replies))
+            emit(batch)
+            has_more = bool(payload.get('has_more', 1))
+        stats.responses = capture.responses
+
+        if len(rows) >= options.max_comments or not has_more:
+            stats.ended = not has_more
+            break
+
+        # 页面节点只用来触发加载，直接丢弃以保持DOM精简
+        drain_comment_batch(driver, [], options.prune_nodes)
+        scroll_and_wait(driver, options.scroll_timeout)
+        stats.scrolls += 1
+        payloads = capture.wait(options.scroll_timeout)
+        if payloads:
+            idle_scrolls = 0
+        else:
+            idle_scrolls += 1
+            if idle_scrolls >= options.max_idle_scrolls:
+                stats.ended = True
+                break
@@ -0,0 +1,182 @@
+import re
+import time
+from numbers import Integral
+
+# ============================================
+# 时间约定：采集、存储、分析一律使用 UTC epoch 秒（int64），
+# 只在页面显示和导出时转换为印尼西部时间（WIB, UTC+7，无夏令时）
+# numpy/pandas 在函数内导入：爬虫只用到 now_epoch，脚本化爬取不必加载它们
+# ============================================
+NAT = -(1 << 63)  # 即 np.iinfo(np.int64).min，datetime64 的 NaT
+DISPLAY_TZ = 'Asia/Jakarta'
+WIB_OFFSET = 7 * 3600
+DAY = 86400
+DISPLAY_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 导出时由时间列派生的文本列：列名 -> 来源列
+DERIVED_FIELDS = {'timestamp': 'create_time'}
+
+# 页面相对时间的单位，如 "2小时前"、"3 jam yang lalu"、"5m ago"、"1w"
+UNIT_SECONDS = {
+    '秒': 1, '分钟': 60, '分': 60, '小时': 3600, '天': DAY, '周': 7 * DAY, '星期': 7 * DAY,
+    '个月': 30 * DAY, '月': 30 * DAY, '年': 365 * DAY,
+    'detik': 1, 'menit': 60, 'jam': 3600, 'hari': DAY, 'minggu': 7 * DAY, 'bulan': 30 * DAY, 'tahun': 365 * DAY,
+    'seconds': 1, 'second': 1, 'sec': 1, 's': 1, 'minutes': 60, 'minute': 60, 'min': 60, 'm': 60,
+    'hours': 3600, 'hour': 3600, 'hr': 3600, 'h': 3600, 'days': DAY, 'day': DAY, 'd': DAY,
+    'weeks': 7 * DAY, 'week': 7 * DAY, 'w': 7 * DAY, 'months': 30 * DAY, 'month': 30 * DAY, 'mo': 30 * DAY,
+    'years': 365 * DAY, 'year': 365 * DAY, 'y': 365 * DAY,
+}
+# 长单位在前，"分钟" 不会被当成 "分"，"menit" 不会被当成 "m"
+RELATIVE_PATTERN = re.compile(
+    r'^(\d+)\s*(' + '|'.join(map(re.escape, sorted(UNIT_SECONDS, key=len, reverse=True))) + r')(?![a-z])'
+)
+# 绝对日期：今年的评论显示 "3-15"，往年的显示 "2023-3-15"
+DATE_PATTERN = re.compile(r'^(?:(\d{4})[-/.])?(\d{1,2})[-/.](\d{1,2})$')
+JUST_NOW = {'刚刚', 'baru saja', 'just now', 'now', 'sekarang'}
+YESTERDAY = {'昨天', 'kemarin', 'yesterday'}
+
+
+def now_epoch():
+    return int(time.time())
+
+
+def to_epoch(value):
+    """单个时间值 -> UTC epoch 秒；整数视为 epoch，不带时区的日期/字符串按WIB解释"""
+    if value is None or isinstance(value, bool):
+        return None
+    # Integral 也包括 numpy 整数
+    if isinstance(value, Integral):
+        return int(value)
+    if isinstance(value, float):
+        return None if value != value else int(value)
+
+    import pandas as pd
+
+    try:
+        stamp = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        return None
+    if stamp is pd.NaT:
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize(DISPLAY_TZ)
+    return int(stamp.timestamp())
+
+
+def epoch_values(series):
+    """时间列 -> int64 epoch 数组（NaT 为 NAT）；不带时区的datetime列视为UTC"""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_convert('UTC').dt.tz_localize(None)
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.to_numpy(dtype='datetime64[s]').view(np.int64)
+    return pd.to_numeric(series, errors='coerce').astype('Int64').to_numpy(dtype=np.int64, na_value=NAT)
+
+
+# ============================================
+# 页面时间文本的向量化解析
+# ============================================
+def _date_epochs(year, month, day):
+    import numpy as np
+    import pandas as pd
+
+    parts = pd.DataFrame({'year': year, 'month': month, 'day': day})
+    days = pd.to_datetime(parts, errors='coerce').to_numpy(dtype='datetime64[s]').view(np.int64)
+    return np.where(days == NAT, NAT, days - WIB_OFFSET)
+
+
+def resolve_times(texts, reference):
+    """把页面上的时间文本（相对时间或月-日）按爬取时间 reference 解析为UTC epoch数组，无法识别的为NAT"""
+    import numpy as np
+    import pandas as pd
+
+    # 时间文本高度重复（"2小时前"……），只解析去重后的取值
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object).fillna('').astype(str), use_na_sentinel=False)
+    text = pd.Series(uniques, dtype=object).str.strip().str.lower()
+    text = text.str.replace(r'\s*(?:前|yang lalu|lalu|ago)$', '', regex=True)
+
+    relative = text.str.extract(RELATIVE_PATTERN)
+    offset = (pd.to_numeric(relative[0], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+              * relative[1].map(UNIT_SECONDS).to_numpy(dtype=float, na_value=np.nan))
+    offset[text.isin(JUST_NOW).to_numpy()] = 0
+    offset[text.isin(YESTERDAY).to_numpy()] = DAY
+    dated = text.str.extract(DATE_PATTERN).apply(pd.to_numeric).to_numpy(dtype=float, na_value=np.nan)
+
+    reference = np.broadcast_to(np.asarray(reference, dtype=np.int64), len(codes))
+    result = np.full(len(codes), NAT, dtype=np.int64)
+    offset = offset[codes]
+    found = ~np.isnan(offset)
+    result[found] = reference[found] - offset[found].astype(np.int64)
+
+    dated = dated[codes]
+    has_date = ~np.isnan(dated[:, 1]) & ~found
+    if has_date.any():
+        year, month, day = dated[has_date].T
+        # 没写年份的按爬取时（WIB）的年份；得到的日期晚于爬取时间说明是去年的评论
+        no_year = np.isnan(year)
+        crawl_year = pd.to_datetime(reference[has_date] + WIB_OFFSET, unit='s').year.to_numpy()
+        year = np.where(no_year, crawl_year, year)
+        epochs = _date_epochs(year, month, day)
+        future = no_year & (epochs != NAT) & (epochs > reference[has_date])
+        if future.any():
+            epochs[future] = _date_epochs(year[future] - 1, month[future], day[future])
+        result[has_date] = epochs
+    return result
+
+
+# ============================================
+# 显示与导出：只在这里格式化
+# ============================================
+def to_wib(series):
+    """UTC时间列（datetime或epoch）-> WIB墙上时间（不带时区的datetime64[s]，便于Excel等显示）"""
+    import numpy as np
+    import pandas as pd
+
+    values = epoch_values(series)
+    local = np.where(values == NAT, NAT, values + WIB_OFFSET).view('datetime64[s]')
+    return pd.Series(local, index=series.index, name=series.name)
+
+
+def format_times(series, fmt=DISPLAY_FORMAT):
+    return to_wib(series).dt.strftime(fmt)
+
+
+def format_epoch(value, fmt=DISPLAY_FORMAT):
+    """单个epoch -> WIB时间文本，空值返回 '-'"""
+    import pandas as pd
+
+    if value is None or value == NAT:
+        return '-'
+    return pd.Timestamp(int(value) + WIB_OFFSET, unit='s').strftime(fmt)
+
+
+def display_frame(frame, columns=None):
+    """渲染/导出前的最后一步：时间列换算为WIB，并按需派生文本时间列（如 timestamp）"""
+    import pandas as pd
+
+    columns = list(frame.columns) if columns is None else columns
+    data = {}
+    for name in columns:
+        if name in frame.columns:
+            series = frame[name]
+            data[name] = to_wib(series) if pd.api.types.is_datetime64_any_dtype(series.dtype) else series
+        elif DERIVED_FIELDS.get(name) in frame.columns:
+            data[name] = format_times(frame[DERIVED_FIELDS[name]])
+    return pd.DataFrame(data, index=frame.index, copy=False)
+
+
+def daily_counts(series, days=None):
+    """按WIB自然日统计条数（整数运算，不解析字符串）；包含中间没有评论的日期"""
+    import numpy as np
+    import pandas as pd
+
+    values = epoch_values(series)
+    values = values[values != NAT]
+    if not len(values):
+        return pd.Series(dtype=np.int64)
+    day = (values + WIB_OFFSET) // DAY
+    first = day.min() if days is None else max(day.min(), day.max() - days + 1)
+    counts = np.bincount(day[day >= first] - first)
+    index = pd.to_datetime((np.arange(len(counts)) + first) * DAY, unit='s').date
+    return pd.Series(counts, index=index)
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Watermark:
+    """增量爬取进度（标记均为 (ctime, cmtid)）：newest 及更早的评论都已爬过，
+    除非有未爬完的积压区间 (floor, resume)——上次达到 max_comments 时停在 resume，
+    floor 为 None 表示 resume 之前的评论都还没爬"""
+    newest: tuple
+    resume: tuple = None
+    # 上次爬取时从最新评论到 resume（含）的条数，下次据此直接跳过已爬区间
+    resume_count: int = 0
+    floor: tuple = None
+
+    def covers(self, mark):
+        """该评论已在之前的爬取中处理过"""
+        if mark > self.newest:
+            return False
+        if self.resume is None or mark >= self.resume:
+            return True
+        return self.floor is not None and mark <= self.floor
+
+    def reached_end(self, mark):
+        """mark 及更早的评论都已处理过，可以停止翻页"""
+        if self.resume is None:
+            return mark <= self.newest
+        return self.floor is not None and mark <= self.floor
+
+    def advance(self, newest, resume=None, resume_count=0):
+        """本次从最新评论连续处理到 resume 后的进度；resume 为 None 表示已衔接上旧进度或到了末尾"""
+        newest = max(newest, self.newest)
+        if resume is None:
+            return Watermark(newest)
+        # 只记录一个积压区间：新评论就已超过上限时，更早的积压区间不再补爬
+        floor = self.newest if resume > self.newest else self.floor
+        return Watermark(newest, resume, resume_count, floor)
+
+
+# ============================================
+# 增量爬取水位线：每个商品已见过的最新 (ctime, cmtid)，以及未爬完的积压区间
+# ============================================
+class WatermarkStore:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                shopid TEXT NOT NULL,
+                itemid TEXT NOT NULL,
+                filter INTEGER NOT NULL,
+                ctime INTEGER NOT NULL,
+                cmtid INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (shopid, itemid, filter)
+            );
+            CREATE TABLE IF NOT EXISTS backlogs (
+                shopid TEXT NOT NULL,
+                itemid TEXT NOT NULL,
+                filter INTEGER NOT NULL,
+                resume_ctime INTEGER NOT NULL,
+                resume_cmtid INTEGER NOT NULL,
+                resume_count INTEGER NOT NULL,
+                floor_ctime INTEGER,
+                floor_cmtid INTEGER,
+                PRIMARY KEY (shopid, itemid, filter)
+            );
+        """)
+        self._conn.commit()
+
+    def get_many(self, targets, rating_filter=0):
+        """返回 {(shopid, itemid): Watermark}，没有水位线的商品不出现在结果中"""
+        marks = {}
+        with self._lock:
+            for shopid, itemid in targets:
+                row = self._conn.execute("""
+                    SELECT w.ctime, w.cmtid, b.resume_ctime, b.resume_cmtid, b.resume_count,
+                           b.floor_ctime, b.floor_cmtid
+                    FROM watermarks w LEFT JOIN backlogs b
+                        ON b.shopid = w.shopid AND b.itemid = w.itemid AND b.filter = w.filter
+                    WHERE w.shopid = ? AND w.itemid = ? AND w.filter = ?
+                """, (shopid, itemid, rating_filter)).fetchone()
+                if row:
+                    resume = (row[2], row[3]) if row[2] is not None else None
+                    floor = (row[5], row[6]) if row[5] is not None else None
+                    marks[(shopid, itemid)] = Watermark((row[0], row[1]), resume, row[4] or 0, floor)
+        return marks
+
+    def advance(self, shopid, itemid, watermark, rating_filter=0):
+        """保存新进度；最新水位线只前进不后退"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("""
+                INSERT INTO watermarks VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(shopid, itemid, filter) DO UPDATE SET
+                    ctime = excluded.ctime, cmtid = excluded.cmtid, updated_at = excluded.updated_at
+                WHERE (excluded.ctime, excluded.cmtid) >= (watermarks.ctime, watermarks.cmtid)
+            """, (shopid, itemid, rating_filter, *watermark.newest, time.time()))
+            if not cursor.rowcount:
+                return
+            key = (shopid, itemid, rating_filter)
+            if watermark.resume is None:
+                self._conn.execute("DELETE FROM backlogs WHERE shopid = ? AND itemid = ? AND filter = ?", key)
+            else:
+                floor = watermark.floor or (None, None)
+                self._conn.execute("INSERT OR REPLACE INTO backlogs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (*key, *watermark.resume, watermark.resume_count, *floor))
+
+    def reset(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM watermarks")
+            self._conn.execute("DELETE FROM backlogs")
@@ -0,0 +1,250 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+# 任务状态
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+TASK_STATES = (QUEUED, LEASED, DONE, FAILED)
+
+
+@dataclass
+class Task:
+    id: int
+    kind: str
+    target: str
+    attempts: int
+    token: str
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ============================================
+# 分布式爬取任务队列：多台机器上的无头爬虫共享一个SQLite文件（放在支持文件锁的共享目录），
+# 按租约领取目标；租约到期未续期（进程崩溃、断网）的目标由其他爬虫接手，
+# 完成/失败时校验租约令牌，过期租约的结果不会覆盖新持有者
+# ============================================
+class WorkQueue:
+    def __init__(self, path, max_attempts=3):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # 多个进程同时领取时由SQLite的写锁串行化，等待而不是立即报错
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # 不用WAL：WAL依赖同一台机器上的共享内存索引，多台机器通过网络文件系统访问时会损坏数据库；
+        # 回滚日志模式只依赖文件锁，共享目录须支持POSIX文件锁（不支持时应改用独立的队列服务）
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                token TEXT,
+                lease_expires REAL,
+                rows INTEGER,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_target ON tasks(kind, target);
+            CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks(kind, state, lease_expires);
+        """)
+        self._conn.commit()
+
+    def enqueue(self, kind, targets):
+        """加入目标，返回新增条数；已在队列中的目标（包括已完成的）不会重复加入"""
+        now = time.time()
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO tasks (kind, target, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(kind, target, QUEUED, now) for target in dict.fromkeys(targets)]
+            )
+            return self._conn.total_changes - before
+
+    def lease(self, kind, worker, limit=10, lease_seconds=120):
+        """领取最多 limit 个排队中或租约已过期的目标；超过重试上限的过期目标标记为失败"""
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock, self._conn:
+            # 过期租约说明上一个爬虫没能完成，同样计入尝试次数
+            self._conn.execute(
+                "UPDATE tasks SET state = ?, error = ?, token = NULL, updated_at = ? "
+                "WHERE kind = ? AND state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, "租约过期次数超过上限", now, kind, LEASED, now, self.max_attempts)
+            )
+            # 单条 UPDATE ... RETURNING 在写锁内完成选取和占用，多个爬虫不会领到同一目标
+            rows = self._conn.execute(
+                "UPDATE tasks SET state = ?, attempts = attempts + 1, worker = ?, token = ?, "
+                "lease_expires = ?, updated_at = ? "
+                "WHERE id IN (SELECT id FROM tasks WHERE kind = ? AND "
+                "(state = ? OR (state = ? AND lease_expires < ?)) ORDER BY id LIMIT ?) "
+                "RETURNING id, kind, target, attempts",
+                (LEASED, worker, token, now + lease_seconds, now, kind, QUEUED, LEASED, now, limit)
+            ).fetchall()
+        return [Task(*row, token) for row in sorted(rows)]
+
+    def heartbeat(self, tasks, lease_seconds=120):
+        """为仍持有的租约续期，返回仍持有的任务ID集合"""
+        if not tasks:
+            return set()
+        held = set()
+        expires = time.time() + lease_seconds
+        with self._lock, self._conn:
+            for task in tasks:
+                cursor = self._conn.execute(
+                    "UPDATE tasks SET lease_expires = ? WHERE id = ? AND token = ? AND state = ?",
+                    (expires, task.id, task.token, LEASED)
+                )
+                if cursor.rowcount:
+                    held.add(task.id)
+        return held
+
+    def complete(self, task, rows=0):
+        """标记完成；租约已被他人接手时返回 False"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET state = ?, rows = ?, error = NULL, token = NULL, updated_at = ? "
+                "WHERE id = ? AND token = ? AND state = ?",
+                (DONE, rows, time.time(), task.id, task.token, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, task, error, retry=True):
+        """释放租约；未超过重试上限时重新排队，否则标记为失败"""
+        state = QUEUED if retry and task.attempts < self.max_attempts else FAILED
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET state = ?, error = ?, token = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND token = ? AND state = ?",
+                (state, error, time.time(), task.id, task.token, LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def pending(self, kind):
+        """排队中和租约中的目标数；为0时说明所有目标都已结束"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE kind = ? AND state IN (?, ?)", (kind, QUEUED, LEASED)
+            ).fetchone()[0]
+
+    def retry_failed(self, kind=None):
+        """失败的目标重新排队并清零尝试次数，返回条数"""
+        where, params = "state = ?", [FAILED]
+        if kind:
+            where, params = where + " AND kind = ?", params + [kind]
+        with self._lock, self._conn:
+            return self._conn.execute(
+                f"UPDATE tasks SET state = ?, attempts = 0, updated_at = ? WHERE {where}",
+                [QUEUED, time.time()] + params
+            ).rowcount
+
+    def summary(self):
+        """按类型和状态统计条数、评论数，以及当前持有租约的爬虫"""
+        now = time.time()
+        with self._lock:
+            counts = self._conn.execute(
+                "SELECT kind, state, COUNT(*), COALESCE(SUM(rows), 0) FROM tasks GROUP BY kind, state"
+            ).fetchall()
+            workers = self._conn.execute(
+                "SELECT worker, COUNT(*) FROM tasks WHERE state = ? AND lease_expires >= ? GROUP BY worker",
+                (LEASED, now)
+            ).fetchall()
+        return counts, dict(workers)
+
+    def failures(self, limit=20):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT kind, target, attempts, error FROM tasks WHERE state = ? ORDER BY updated_at DESC LIMIT ?",
+                (FAILED, limit)
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Heartbeat:
+    """后台线程：在爬取期间定期为当前批次续租"""
+
+    def __init__(self, queue, tasks, lease_seconds):
+        self.queue = queue
+        self.tasks = tasks
+        self.lease_seconds = lease_seconds
+        self.held = {task.id for task in tasks}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self.held = self.queue.heartbeat(self.tasks, self.lease_seconds)
+            except sqlite3.Error:
+                # 一次续期失败不致命，租约还有剩余时间
+                continue
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue, kind, crawl, write, worker=None, batch_size=10, lease_seconds=120, poll=1.0,
+               on_task=None, stop=None):
+    """爬虫主循环：领取一批目标 -> crawl(目标列表, on_result) -> 逐个写入结果并确认。
+
+    crawl 对每个目标调用 on_result(target, rows, error)。结果先写入再确认完成，
+    确认前崩溃的目标会在租约过期后重爬，输出应按评论ID去重（如SQLite归档）。
+    队列中没有排队或租约中的目标时返回 (完成的目标数, 失败次数)。
+    """
+    worker = worker or default_worker_id()
+    done = failed = 0
+    while stop is None or not stop.is_set():
+        tasks = queue.lease(kind, worker, batch_size, lease_seconds)
+        if not tasks:
+            # 其他爬虫仍持有租约时继续等待，它们掉线后接手过期的目标
+            if not queue.pending(kind):
+                break
+            time.sleep(poll)
+            continue
+
+        by_target = {task.target: task for task in tasks}
+        with _Heartbeat(queue, tasks, lease_seconds) as heartbeat:
+            def on_result(target, rows, error=''):
+                nonlocal done, failed
+                task = by_target.pop(target, None)
+                if task is None:
+                    return
+                if task.id not in heartbeat.held:
+                    # 租约已被其他爬虫接手，丢弃本次结果
+                    return
+                if error:
+                    queue.fail(task, error)
+                    failed += 1
+                else:
+                    write(rows)
+                    done += queue.complete(task, len(rows))
+                if on_task:
+                    on_task(task, len(rows), error)
+
+            crawl([task.target for task in tasks], on_result)
+        # crawl 没有回报的目标立即释放，不必等租约过期
+        for task in by_target.values():
+            queue.fail(task, "爬取未返回结果")
+            failed += 1
+    return done, failed
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+BASE_CTIME = 1700000000
+
+
+def make_ratings(itemid, count, start=BASE_CTIME, step=60):
+    """按接口默认顺序（从新到旧）生成评论"""
+    return [{
+        'cmtid': int(itemid) * 100000 + count - i,
+        'author_username': f"user{i}",
+        'rating_star': 5 - i % 5,
+        'comment': f"barang bagus sekali nomor {i}",
+        'like_count': i % 3,
+        'ctime': start - i * step,
+        'product_items': [{'name': f"Item {itemid}", 'model_name': 'Merah'}],
+    } for i in range(count)]
+
+
+class FakeRatingsApi:
+    """本地假 get_ratings 接口；override(request) 返回非None时代替正常分页响应"""
+
+    def __init__(self):
+        self.ratings = {}
+        self.requests = 0
+        self.override = None
+        self.url = None
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.override is not None:
+            response = self.override(request)
+            if response is not None:
+                return response
+        offset, limit = int(request.query['offset']), int(request.query['limit'])
+        page = self.ratings.get(request.query['itemid'], [])[offset:offset + limit]
+        return web.json_response({'error': 0, 'data': {'ratings': page}})
+
+
+@pytest.fixture
+def shopee_api():
+    api = FakeRatingsApi()
+    app = web.Application()
+    app.router.add_get('/api/v2/item/get_ratings', api.handle)
+    runner = web.AppRunner(app)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    api.url = f"http://127.0.0.1:{runner.addresses[0][1]}/api/v2/item/get_ratings"
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield api
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(runner.cleanup())
+    loop.close()
@@ -0,0 +1,87 @@
+from comment_crawler.archive import CommentArchive, native_id, record_to_row, row_to_record
+
+
+def shopee_row(rating_id, likes=0, **fields):
+    return dict({'platform': 'Shopee Indonesia', 'shop_id': 9, 'product_id': 1, 'rating_id': rating_id,
+                 'username': 'u', 'comment': f"ulasan {rating_id}", 'rating': 5, 'likes': likes,
+                 'create_time': 1700000000 + (rating_id or 0), 'crawl_date': 1700100000}, **fields)
+
+
+def test_native_id_prefers_platform_id():
+    assert native_id({'rating_id': 7}) == '7'
+    assert native_id({'comment_id': 'abc'}) == 'abc'
+    # 没有原生ID时用内容哈希，相对时间文本不参与
+    first = native_id({'video_id': 'v', 'username': 'u', 'comment': 'x', 'timestamp': '2 jam lalu'})
+    second = native_id({'video_id': 'v', 'username': 'u', 'comment': 'x', 'timestamp': '3 jam lalu'})
+    assert first == second and first.startswith('h:')
+
+
+def test_record_round_trip_keeps_extra_fields():
+    row = shopee_row(5, variation='Merah', timestamp='2023-11-15 05:13')
+    restored = record_to_row(dict(row_to_record('shopee', row), id=1))
+    assert restored['rating_id'] == 5 and restored['product_id'] == '1' and restored['shop_id'] == '9'
+    assert restored['variation'] == 'Merah'
+    assert 'timestamp' not in restored
+    assert restored['create_time'] == 1700000005
+
+    hashed = record_to_row(dict(row_to_record('tt_video', {'video_id': 'v', 'comment': 'x'}), id=2))
+    assert 'comment_id' not in hashed and hashed['video_id'] == 'v'
+
+
+def test_upsert_counts_new_rows_and_refreshes_mutable_fields(tmp_path):
+    archive = CommentArchive(str(tmp_path / 'a.db'))
+    assert archive.upsert('shopee', [shopee_row(1), shopee_row(2), shopee_row(1)]) == 2
+    assert archive.upsert('shopee', [shopee_row(2, likes=9, comment='diubah'), shopee_row(3)]) == 1
+    assert archive.count() == 3
+
+    rows = {row['rating_id']: row for batch in archive.query() for row in batch}
+    # 重复爬取只刷新点赞数等可变字段，评论内容保持首次写入的版本
+    assert rows[2]['likes'] == 9
+    assert rows[2]['comment'] == 'ulasan 2'
+
+
+def test_upsert_missing_value_does_not_erase_existing(tmp_path):
+    archive = CommentArchive(str(tmp_path / 'a.db'))
+    archive.upsert('shopee', [shopee_row(1, likes=4)])
+    archive.upsert('shopee', [shopee_row(1, likes=None)])
+    row, = next(archive.query())
+    assert row['likes'] == 4
+
+
+def test_upsert_large_batch_spans_parameter_chunks(tmp_path):
+    archive = CommentArchive(str(tmp_path / 'a.db'))
+    assert archive.upsert('shopee', [shopee_row(i) for i in range(1, 1201)]) == 1200
+    assert archive.upsert('shopee', [shopee_row(i) for i in range(1, 1301)]) == 100
+
+
+def test_query_keyset_pages_newest_first(tmp_path):
+    archive = CommentArchive(str(tmp_path / 'a.db'))
+    archive.upsert('shopee', [shopee_row(i) for i in range(1, 26)])
+    batches = list(archive.query(batch_size=10))
+    assert [len(b) for b in batches] == [10, 10, 5]
+    ids = [row['rating_id'] for batch in batches for row in batch]
+    assert ids == list(range(25, 0, -1))
+
+    limited = list(archive.query(limit=12, batch_size=5))
+    assert [len(b) for b in limited] == [5, 5, 2]
+
+
+def test_query_filters(tmp_path):
+    archive = CommentArchive(str(tmp_path / 'a.db'))
+    archive.upsert('shopee', [shopee_row(i, rating=1 if i % 2 else 5) for i in range(1, 11)])
+    archive.upsert('shopee', [shopee_row(100, product_id=2)])
+    archive.upsert('tt_video', [{'video_id': 'v', 'comment_id': 'c1', 'comment': 'x'}])
+
+    assert archive.count(dataset='shopee') == 11
+    assert archive.count(dataset='shopee', item_id=2) == 1
+    assert archive.count(dataset='shopee', rating=1) == 5
+    assert archive.count(dataset='shopee', start=1700000003, end=1700000006) == 3
+    assert archive.count(dataset='tt_video') == 1
+
+    summary = {s['dataset']: s for s in archive.summary()}
+    assert summary['shopee']['items'] == 2
+
+    archive.clear('tt_video')
+    assert archive.count() == 11
+    archive.clear()
+    assert archive.count() == 0
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from functools import partial
+
+from comment_crawler.batch import crawl_urls
+from comment_crawler.tiktok import DRAIN_COMMENTS_JS, TikTokCrawlOptions
+
+
+class StubDriver:
+    """工作进程中的假浏览器：URL含 crash 时整个进程崩溃，含 slow 时页面一直加载；
+    browser_pid 指向一个代替Chrome的子进程"""
+
+    def __init__(self, pid_dir):
+        self.browser = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(120)'])
+        self.browser_pid = self.browser.pid
+        if pid_dir:
+            open(os.path.join(pid_dir, str(self.browser_pid)), 'w').close()
+        self.rows = []
+
+    def get(self, url):
+        if 'crash' in url:
+            os._exit(1)
+        if 'slow' in url:
+            time.sleep(120)
+        self.rows = [{'username': 'user', 'comment': f"komentar untuk {url}", 'time_text': ''}]
+
+    def execute_script(self, script, *args):
+        if script is not DRAIN_COMMENTS_JS:
+            return {'selector': 'div.comment', 'pending': len(self.rows)}
+        rows, self.rows = self.rows, []
+        return {'rows': rows, 'selector': 'div.comment', 'errors': 0}
+
+    def execute_async_script(self, script, *args):
+        return {'pending': 0, 'ended': True}
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_cdp_cmd(self, command, params):
+        return {}
+
+    def get_log(self, kind):
+        return []
+
+    def quit(self):
+        self.browser.kill()
+
+
+def stub_launcher(pid_dir, lean):
+    return StubDriver(pid_dir)
+
+
+OPTIONS = TikTokCrawlOptions(max_comments=5, wait_time=0.1, scroll_timeout=0.1, max_idle_scrolls=1)
+
+
+def test_results_stream_and_crash_is_isolated():
+    urls = ['https://www.tiktok.com/video/1', 'https://www.tiktok.com/video/2/crash',
+            'https://www.tiktok.com/video/3']
+    results = {r.url: r for r in crawl_urls(urls, OPTIONS, workers=2, launcher=partial(stub_launcher, None))}
+
+    assert set(results) == set(urls)
+    assert results[urls[1]].error == "浏览器进程崩溃"
+    for url in (urls[0], urls[2]):
+        assert not results[url].error
+        assert results[url].rows[0]['product_url'] == url
+
+
+def test_stop_terminates_running_workers_and_browsers(tmp_path):
+    urls = [f"https://www.tiktok.com/video/{i}/slow" for i in range(2)]
+    stop = threading.Event()
+    threading.Timer(3, stop.set).start()
+    started = time.monotonic()
+    results = list(crawl_urls(urls, OPTIONS, workers=2, launcher=partial(stub_launcher, str(tmp_path)), stop=stop))
+
+    assert results == []
+    assert time.monotonic() - started < 15
+    assert not multiprocessing.active_children()
+    browsers = [int(name) for name in os.listdir(tmp_path)]
+    assert browsers
+    time.sleep(0.5)
+    for pid in browsers:
+        # 代替Chrome的子进程已被结束（僵尸进程也算已退出）
+        try:
+            os.kill(pid, 0)
+            with open(f"/proc/{pid}/stat") as f:
+                assert f.read().split()[2] == 'Z'
+        except (ProcessLookupError, FileNotFoundError):
+            pass
+
+
+def test_closing_generator_does_not_wait_for_running_pages():
+    urls = ['https://www.tiktok.com/video/1', 'https://www.tiktok.com/video/2/slow',
+            'https://www.tiktok.com/video/3/slow']
+    results = crawl_urls(urls, OPTIONS, workers=3, launcher=partial(stub_launcher, None))
+    first = next(results)
+    started = time.monotonic()
+    results.close()
+
+    assert first.url == urls[0]
+    assert time.monotonic() - started < 10
+    assert not multiprocessing.active_children()
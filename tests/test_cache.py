@@ -0,0 +1,88 @@
+from aiohttp import web
+
+from comment_crawler.cache import ResponseCache, cache_key
+from comment_crawler.shopee import ShopeeRatingsEngine, build_params
+
+from conftest import make_ratings
+
+PARAMS = build_params('9', '1', 0)
+
+
+def test_cache_key_ignores_unrelated_params():
+    assert cache_key(dict(PARAMS, extra='x')) == cache_key(PARAMS)
+    assert cache_key(dict(PARAMS, offset=50)) != cache_key(PARAMS)
+
+
+def test_fresh_entry_is_a_hit(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'c.db'))
+    assert cache.lookup(PARAMS) == (None, False, {})
+    cache.store(PARAMS, {'data': {'ratings': [1]}}, etag='"v1"')
+
+    data, fresh, validators = cache.lookup(PARAMS)
+    assert data == {'data': {'ratings': [1]}}
+    assert fresh
+    assert validators == {'If-None-Match': '"v1"'}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_revalidating_lookup_is_not_a_hit_until_304(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'c.db'))
+    cache.store(PARAMS, {'data': {}}, etag='"v1"')
+    cache.lookup(PARAMS, revalidate=True)
+    assert cache.hits == 0
+    cache.mark_revalidated(PARAMS)
+    assert (cache.hits, cache.revalidated) == (1, 1)
+
+
+def test_expired_entry_without_validators_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'c.db'), ttl=0)
+    cache.store(PARAMS, {'data': {}})
+    assert cache.lookup(PARAMS) == (None, False, {})
+
+    cache.store(PARAMS, {'data': {}}, last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+    data, fresh, validators = cache.lookup(PARAMS)
+    assert data == {'data': {}} and not fresh
+    assert validators == {'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'c.db'), max_bytes=300)
+    for offset in range(5):
+        cache.store(dict(PARAMS, offset=offset), {'pad': 'x' * 80})
+    stats = cache.stats()
+    assert stats['size_bytes'] <= 300
+    assert stats['evictions'] >= 1
+    assert cache.lookup(dict(PARAMS, offset=0))[0] is None
+    assert cache.lookup(dict(PARAMS, offset=4))[0] is not None
+
+
+def test_engine_revalidates_stale_pages(tmp_path, shopee_api):
+    ratings = make_ratings(1, 10)
+
+    def conditional(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+        return web.json_response({'error': 0, 'data': {'ratings': ratings}}, headers={'ETag': '"v1"'})
+
+    shopee_api.override = conditional
+    cache = ResponseCache(str(tmp_path / 'c.db'), ttl=0)
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url, cache=cache)
+    first, = engine.crawl_sync([('9', '1')])
+    second, = engine.crawl_sync([('9', '1')])
+
+    assert len(first.rows) == len(second.rows) == 10
+    assert shopee_api.requests == 2
+    assert cache.stats()['revalidated'] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_engine_serves_fresh_pages_without_requests(tmp_path, shopee_api):
+    shopee_api.ratings = {'1': make_ratings(1, 10)}
+    cache = ResponseCache(str(tmp_path / 'c.db'))
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url, cache=cache)
+    engine.crawl_sync([('9', '1')])
+    result, = engine.crawl_sync([('9', '1')])
+
+    assert len(result.rows) == 10
+    assert shopee_api.requests == 1
+    assert cache.hits == 1
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from comment_crawler import driver_pool
+from comment_crawler.driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self, launch_delay=0):
+        time.sleep(launch_delay)
+        self.alive = True
+        self.quit_called = False
+        self.pages = []
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("renderer crashed")
+        return 1
+
+    def get(self, url):
+        self.pages.append(url)
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture(autouse=True)
+def unlimited_memory(monkeypatch):
+    monkeypatch.setattr(driver_pool, 'available_memory_mb', lambda: None)
+
+
+def make_pool(launch_delay=0, **kwargs):
+    launched = []
+
+    def factory():
+        driver = FakeDriver(launch_delay)
+        launched.append(driver)
+        return driver
+
+    kwargs.setdefault('warm_size', 0)
+    return DriverPool(factory, **kwargs), launched
+
+
+def test_driver_is_reused_across_checkouts():
+    pool, launched = make_pool()
+    with pool.driver() as first:
+        pass
+    with pool.driver() as second:
+        pass
+    assert first is second
+    assert len(launched) == 1
+    assert first.pages == ['about:blank', 'about:blank']
+
+
+def test_driver_is_recycled_after_max_pages():
+    pool, launched = make_pool(max_pages_per_driver=2)
+    for _ in range(3):
+        with pool.driver():
+            pass
+    assert len(launched) == 2
+    assert launched[0].quit_called
+    assert pool.stats()['recycled'] == 1
+
+
+def test_crashed_idle_driver_is_replaced():
+    pool, launched = make_pool()
+    with pool.driver() as driver:
+        pass
+    driver.alive = False
+    with pool.driver() as replacement:
+        pass
+    assert replacement is not driver
+    assert driver.quit_called
+    assert pool.stats()['crashed'] == 1
+
+
+def test_checkout_waits_for_warming_driver():
+    pool, launched = make_pool(launch_delay=0.3, max_size=2, warm_size=1)
+    driver = pool.checkout()
+    pool.checkin(driver)
+    time.sleep(0.5)
+    # 预热中的实例就绪后直接使用，不会再冷启动第二个
+    assert len(launched) == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_checkout_times_out_when_pool_is_full():
+    pool, _ = make_pool(max_size=1, checkout_timeout=0.2)
+    pool.checkout()
+    with pytest.raises(TimeoutError):
+        pool.checkout()
+
+
+def test_waiting_checkout_gets_returned_driver():
+    pool, launched = make_pool(max_size=1)
+    driver = pool.checkout()
+    threading.Timer(0.1, pool.checkin, args=(driver,)).start()
+    assert pool.checkout() is driver
+    assert len(launched) == 1
+
+
+def test_close_quits_idle_drivers_and_rejects_checkout():
+    pool, launched = make_pool()
+    with pool.driver():
+        pass
+    pool.close()
+    assert launched[0].quit_called
+    with pytest.raises(RuntimeError):
+        pool.checkout()
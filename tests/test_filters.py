@@ -0,0 +1,52 @@
+from collections import Counter
+
+from comment_crawler.filters import (REJECT_KEYWORD, REJECT_MIN_WORDS, CommentFilter, KeywordAutomaton,
+                                     count_words, parse_keywords, summarize_rejects)
+
+
+def test_parse_keywords():
+    assert parse_keywords(" spam, 广告，推广;spam\n") == ('spam', '广告', '推广')
+    assert parse_keywords('') == ()
+
+
+def test_count_words_counts_cjk_characters():
+    assert count_words("barang bagus, 2 hari") == 4
+    assert count_words("质量很好 ok") == 5
+    assert count_words("") == 0
+
+
+def test_automaton_finds_first_match_case_insensitive():
+    automaton = KeywordAutomaton(['he', 'she', 'hers', 'HIS'])
+    assert automaton.search('uShers') == 'she'
+    assert automaton.search('this') == 'his'
+    assert automaton.search('ahishers') == 'his'
+    assert automaton.search('hxs') is None
+    assert not KeywordAutomaton(['', ''])
+
+
+def test_automaton_follows_failure_links():
+    # "abcd" 匹配失败后要沿失败链回到 "bc"，否则会漏掉 "bcx"
+    automaton = KeywordAutomaton(['abcd', 'bcx', 'c'])
+    assert automaton.search('abcx') == 'c'
+    assert KeywordAutomaton(['abcd', 'bcx']).search('abcx') == 'bcx'
+    # 较短的关键词是较长关键词的后缀时也能在同一状态输出
+    assert KeywordAutomaton(['xab', 'ab']).search('xxab') == 'xab'
+    assert KeywordAutomaton(['广告', '推广']).search('这是推广链接') == '推广'
+
+
+def test_filter_reasons_and_counts():
+    row_filter = CommentFilter(['spam'], min_words=2)
+    rows = [{'comment': 'bagus sekali'}, {'comment': 'SPAM link'}, {'comment': 'ok'}, {'comment': None}]
+    rejected = Counter()
+    assert row_filter.apply(rows, rejected) == rows[:1]
+    assert rejected == Counter({(REJECT_KEYWORD, 'spam'): 1, (REJECT_MIN_WORDS, ''): 2})
+    assert summarize_rejects(rejected) == (Counter({REJECT_KEYWORD: 1, REJECT_MIN_WORDS: 2}), [('spam', 1)])
+
+
+def test_empty_filter_keeps_rows_without_text():
+    row_filter = CommentFilter()
+    assert not row_filter
+    rows = [{'comment': ''}, {'rating': 5}]
+    assert row_filter.apply(rows) is rows
+    # 只设排除关键词时，只有星级没有文字的评论也保留
+    assert CommentFilter(['spam']).apply(rows) == rows
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from comment_crawler.keywords import KeywordIndex
+from comment_crawler.store import CommentStore
+
+
+def test_top_counts_terms_and_documents():
+    index = KeywordIndex()
+    index.add('shopee', pd.Series(['barang bagus barang bagus', 'barang murah']), pd.Series(['1', '2']))
+    assert index.top('shopee', 1) == [('barang', 3)]
+    assert index.top('shopee', 1, by='df') == [('barang', 2)]
+    assert index.top('shopee', 1, n=2) == [('barang bagus', 2)]
+    assert index.top('shopee', item='2') == [('barang', 1), ('murah', 1)]
+    assert index.documents('shopee') == 2 and index.documents('shopee', '1') == 1
+    assert index.top('shopee', n=4) == []
+
+
+def test_missing_item_ids_are_not_an_item():
+    store = CommentStore()
+    store.extend([{'comment': 'barang bagus', 'product_id': '1'}, {'comment': 'barang murah'}])
+    index = KeywordIndex()
+    index.sync('shopee', store)
+    assert index.items('shopee') == ['1']
+    assert index.documents('shopee') == 2
+    assert index.top('shopee', item='nan') == []
+
+
+def test_sync_is_incremental_and_rebuilds_after_clear():
+    store = CommentStore()
+    index = KeywordIndex()
+    store.extend([{'comment': 'barang bagus', 'product_id': '1'}])
+    index.sync('shopee', store)
+    store.extend([{'comment': 'barang murah', 'product_id': '1'}])
+    index.sync('shopee', store)
+    index.sync('shopee', store)
+    assert index.top('shopee', 1) == [('barang', 2)]
+
+    store.clear()
+    store.extend([{'comment': 'harga murah', 'product_id': '2'}])
+    index.sync('shopee', store)
+    assert index.items('shopee') == ['2']
+    assert index.top('shopee', 1, by='df')[0][1] == 1
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from comment_crawler.neardup import NearDuplicateIndex, _shingle_hashes, lsh_params
+from comment_crawler.store import CommentStore
+
+TEMPLATE = "Barang sudah sampai dengan selamat, pengiriman cepat, seller ramah, rekomendasi {}"
+DISTINCT = [
+    "Warna tidak sesuai dengan gambar di etalase, agak kecewa",
+    "Kemasan rapi pakai bubble wrap tebal dan kardus",
+    "Ukurannya kekecilan, harus tukar ke ukuran yang lebih besar",
+    "Kurir ramah sekali, paket diantar sampai depan pintu rumah",
+]
+
+
+def test_lsh_params_cover_num_perm():
+    bands, rows = lsh_params(0.7, 64)
+    assert bands * rows <= 64
+    assert abs((1 / bands) ** (1 / rows) - 0.7) < 0.1
+
+
+def test_shingles_do_not_cross_comments():
+    hashes, docs = _shingle_hashes(['abcde', 'xy', 'fghij'], 3)
+    assert len(hashes) == 6
+    assert docs.tolist() == [0, 0, 0, 2, 2, 2]
+
+
+def test_identical_texts_have_identical_signatures():
+    index = NearDuplicateIndex()
+    signatures, eligible = index.signatures(pd.Series([TEMPLATE.format(1), TEMPLATE.format(1), 'bagus']))
+    assert eligible.tolist() == [True, True, False]
+    assert np.array_equal(signatures[0], signatures[1])
+
+
+def test_template_comments_cluster_and_short_ones_are_ignored():
+    store = CommentStore()
+    store.extend([{'comment': TEMPLATE.format(i), 'username': f"u{i}", 'product_id': '1'} for i in range(5)])
+    store.extend([{'comment': text, 'username': 'x', 'product_id': '1'} for text in DISTINCT])
+    store.extend([{'comment': 'bagus', 'username': f"s{i}"} for i in range(5)])
+    index = NearDuplicateIndex()
+    clusters = index.clusters('shopee', store)
+
+    assert (clusters['cluster'][:5] == 0).all()
+    assert (clusters['cluster_size'][:5] == 5).all()
+    assert (clusters['cluster_size'][5:9] == 1).all()
+    assert (clusters['cluster'][9:] == -1).all()
+
+    templates = index.templates('shopee', store)
+    assert len(templates) == 1
+    assert templates.loc[0, 'comments'] == 5 and templates.loc[0, 'users'] == 5
+
+
+def test_incremental_sync_joins_existing_cluster():
+    store = CommentStore()
+    index = NearDuplicateIndex()
+    store.extend([{'comment': TEMPLATE.format(i)} for i in range(2)] + [{'comment': DISTINCT[0]}])
+    index.sync('shopee', store)
+    store.extend([{'comment': TEMPLATE.format(9)}] * 1100)
+    clusters = index.clusters('shopee', store)
+    # 后来的评论并入最早的簇根，且扩容后已有行的簇不变
+    assert clusters['cluster'][[0, 1, 3, len(store) - 1]].tolist() == [0, 0, 0, 0]
+    assert clusters['cluster'][2] == 2
+
+    store.clear()
+    store.extend([{'comment': DISTINCT[1]}])
+    assert index.clusters('shopee', store)['cluster'].tolist() == [0]
+
+
+def test_store_without_text_has_no_templates():
+    store = CommentStore()
+    store.extend([{'likes': 1}] * 3)
+    index = NearDuplicateIndex()
+    assert index.clusters('shopee', store)['cluster'].tolist() == [-1, -1, -1]
+    assert index.templates('shopee', store).empty
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from comment_crawler.sentiment import ASPECT_NAMES, SentimentIndex, score_texts, sentiment_labels
+from comment_crawler.store import CommentStore
+from comment_crawler.text import tokenize_texts
+
+
+def aspect_scores(text):
+    scores, aspects = score_texts(pd.Series([text]))
+    return scores[0], dict(zip(ASPECT_NAMES, aspects[0]))
+
+
+def test_aspect_windows_stop_at_contrast_words():
+    _, aspects = aspect_scores('pengiriman lambat tapi harga murah')
+    assert aspects['price'] > 0
+    assert aspects['shipping'] < 0
+
+
+def test_aspect_windows_stop_at_punctuation():
+    _, aspects = aspect_scores('pengiriman lambat, harga murah')
+    assert aspects['price'] > 0 and aspects['shipping'] < 0
+    assert np.isnan(aspects['packaging'])
+
+
+def test_negation_does_not_cross_clauses():
+    _, aspects = aspect_scores('tidak lambat tp mahal')
+    assert aspects['shipping'] > 0
+    assert aspects['price'] < 0
+    assert aspect_scores('tidak bagus')[0] < 0
+
+
+def test_intensifier_and_phrase():
+    assert aspect_scores('bagus banget')[0] > aspect_scores('bagus')[0]
+    assert aspect_scores('biasa saja')[0] < 0
+
+
+def test_punctuation_tokens_are_opt_in():
+    texts = pd.Series(['harga 1.500, murah!'])
+    assert tokenize_texts(texts) == [['harga', 'murah']]
+    assert tokenize_texts(texts, punctuation=True) == [['harga', ',', 'murah', '!']]
+
+
+def test_labels_and_incremental_index():
+    assert list(sentiment_labels(np.array([0.5, 0.0, -0.5]))) == [1, 0, -1]
+    store = CommentStore()
+    index = SentimentIndex()
+    store.extend([{'comment': 'barang bagus', 'product_id': '1'}])
+    index.sync('shopee', store)
+    store.extend([{'comment': 'barang rusak', 'product_id': '2'}])
+    frame = index.sync('shopee', store)
+    assert list(frame['label']) == [1, -1]
+
+    by_item = index.aggregate('shopee', store)
+    assert list(by_item.index) == ['1', '2']
+    assert by_item.loc['2', 'quality'] < 0
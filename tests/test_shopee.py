@@ -0,0 +1,57 @@
+import asyncio
+
+from aiohttp import web
+
+from comment_crawler.shopee import ShopeeRatingsEngine, parse_targets
+from comment_crawler.throttle import AdaptiveLimiter, TokenBucket
+
+from conftest import make_ratings
+
+
+def test_parse_targets_accepts_urls_and_id_pairs():
+    text = "https://shopee.co.id/Barang-i.11.22\n11,22\n33，44\nbukan target\n"
+    assert parse_targets(text) == [('11', '22'), ('33', '44')]
+
+
+def test_crawl_pages_until_max_comments(shopee_api):
+    shopee_api.ratings = {'1': make_ratings(1, 120), '2': make_ratings(2, 30)}
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url)
+    results = engine.crawl_sync([('9', '1'), ('9', '2')], max_comments=100)
+
+    assert [len(r.rows) for r in results] == [100, 30]
+    assert [r.pages for r in results] == [2, 1]
+    assert not any(r.error for r in results)
+    assert results[0].rows[0]['rating_id'] == shopee_api.ratings['1'][0]['cmtid']
+    assert engine.limiter.in_flight == 0
+
+
+def test_non_json_200_is_item_error(shopee_api):
+    shopee_api.override = lambda request: web.Response(text="<html>captcha</html>", content_type='text/html')
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url, max_retries=1)
+    result, = engine.crawl_sync([('9', '1')])
+
+    assert result.error
+    assert result.rows == []
+    # 按失败计入限流器并重试
+    assert shopee_api.requests == 2
+    assert engine.limiter.backoff_count >= 1
+
+
+def test_cancelled_wait_releases_limiter_slot():
+    async def run():
+        engine = ShopeeRatingsEngine()
+        engine.limiter = AdaptiveLimiter(initial=2)
+        bucket = TokenBucket(0.01)
+        await bucket.acquire()
+        # 令牌已用完：请求停在令牌桶等待处，此时已占用一个并发名额
+        task = asyncio.create_task(engine._get_json(None, bucket, {}, 'https://shopee.co.id'))
+        await asyncio.sleep(0.05)
+        assert engine.limiter.in_flight == 1
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return engine.limiter.in_flight
+
+    assert asyncio.run(run()) == 0
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from comment_crawler.store import CommentStore, parse_count
+
+SHOPEE_KEY = ('shop_id', 'product_id', 'rating_id')
+
+
+def shopee_row(rating_id, comment='bagus', **fields):
+    return dict({'platform': 'Shopee Indonesia', 'shop_id': '9', 'product_id': '1', 'rating_id': rating_id,
+                 'comment': comment, 'rating': 5, 'create_time': 1700000000}, **fields)
+
+
+def test_parse_count():
+    assert parse_count('1.2K') == 1200
+    assert parse_count('3,4rb') == 3400
+    assert parse_count('Balas 5') == 5
+    assert parse_count('1.234') == 1234
+    assert parse_count(7) == 7
+    assert parse_count(float('nan')) is None
+    assert parse_count('tidak ada') is None
+    assert parse_count(None) is None
+
+
+def test_dedup_on_key_fields():
+    store = CommentStore(key_fields=SHOPEE_KEY)
+    assert store.extend([shopee_row(1), shopee_row(2), shopee_row(1)]) == 2
+    assert store.extend([shopee_row(2), shopee_row(3)]) == 1
+    assert list(store.frame()['rating_id']) == [1, 2, 3]
+
+
+def test_rows_without_id_are_kept_and_not_tracked():
+    store = CommentStore(key_fields=SHOPEE_KEY)
+    assert store.extend([shopee_row(None, 'a'), shopee_row(None, 'b')]) == 2
+    assert store.extend([shopee_row(None, 'a')]) == 1
+    assert len(store) == 3
+    assert store._keys == set()
+
+
+def test_growth_keeps_values_and_missing_fields():
+    store = CommentStore(capacity=4)
+    store.extend([{'comment': f"c{i}", 'likes': i} for i in range(5)])
+    store.extend([{'comment': 'baru', 'username': 'u'}] * 6)
+    frame = store.frame()
+
+    assert len(frame) == 11
+    assert store._capacity == 16
+    assert list(frame['likes'][:5]) == [0, 1, 2, 3, 4]
+    assert frame['likes'][5:].isna().all()
+    assert frame['username'][:5].isna().all()
+    assert list(frame['comment'][-2:]) == ['baru', 'baru']
+
+
+def test_frame_types_and_caching():
+    store = CommentStore()
+    store.extend([shopee_row(1, likes='1.2K', crawl_date=1700000000), shopee_row(2, likes=None)])
+    frame = store.frame()
+
+    assert isinstance(frame['platform'].dtype, pd.CategoricalDtype)
+    assert str(frame['likes'].dtype) == 'Int64'
+    assert frame['likes'].tolist()[0] == 1200 and pd.isna(frame['likes'].tolist()[1])
+    assert frame['create_time'].dtype == np.dtype('datetime64[s]')
+    assert store.frame() is frame
+    store.append(shopee_row(3))
+    assert store.frame() is not frame
+    assert len(store.frame()) == 3
+
+
+def test_frame_is_read_only_view():
+    store = CommentStore()
+    store.extend([{'comment': 'a', 'likes': 1}])
+    comments = store.frame()['comment'].to_numpy()
+    # 视图直接引用底层数组，不能被调用方改写
+    assert np.shares_memory(comments, store._columns['comment'].values)
+    assert not comments.flags.writeable
+
+
+def test_clear_bumps_generation():
+    store = CommentStore(key_fields=SHOPEE_KEY)
+    store.extend([shopee_row(1)])
+    version, generation = store.version, store.generation
+    store.clear()
+    assert len(store) == 0
+    assert store.generation == generation + 1 and store.version > version
+    assert store.extend([shopee_row(1)]) == 1
+
+
+def test_category_codes_widen():
+    store = CommentStore()
+    store.extend([{'product_id': str(i)} for i in range(300)])
+    column = store.frame()['product_id']
+    assert column.cat.codes.dtype == np.int16
+    assert column.tolist() == [str(i) for i in range(300)]
+
+
+def test_to_arrow_matches_frame():
+    store = CommentStore()
+    store.extend([shopee_row(1, likes=3), shopee_row(None, likes=None)])
+    table = store.to_arrow()
+    assert table.num_rows == 2
+    assert table.column('likes').to_pylist() == [3, None]
+    assert table.column('product_id').to_pylist() == ['1', '1']
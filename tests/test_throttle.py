@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from comment_crawler.throttle import AdaptiveLimiter, TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('5') == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('bukan tanggal') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+def test_limiter_backs_off_on_429_and_grows_on_success():
+    async def run():
+        limiter = AdaptiveLimiter(initial=8, max_limit=20)
+        await limiter.acquire()
+        await limiter.release(429, 0.1)
+        after_429 = limiter.limit
+        for _ in range(50):
+            await limiter.acquire()
+            await limiter.release(200, 0.05)
+        return after_429, limiter
+
+    after_429, limiter = asyncio.run(run())
+    assert after_429 == 4
+    assert limiter.limit > after_429
+    assert limiter.in_flight == 0
+    assert limiter.stats()['backoffs'] == 1
+
+
+def test_limiter_caps_in_flight():
+    async def run():
+        limiter = AdaptiveLimiter(initial=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.05)
+        blocked = not waiter.done()
+        await limiter.release(200, 0.01)
+        await asyncio.wait_for(waiter, 1)
+        return blocked, limiter.in_flight
+
+    assert asyncio.run(run()) == (True, 2)
+
+
+def test_retry_after_pauses_new_requests():
+    async def run():
+        limiter = AdaptiveLimiter(initial=4)
+        await limiter.acquire()
+        await limiter.release(429, 0.01, retry_after=0.3)
+        started = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.25
+
+
+def test_token_bucket_rate():
+    async def run():
+        bucket = TokenBucket(20, burst=1)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.2
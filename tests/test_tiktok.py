@@ -0,0 +1,140 @@
+import json
+
+from comment_crawler.filters import CommentFilter
+from comment_crawler.tiktok import (COMMENT_API_PATTERN, DRAIN_COMMENTS_JS, CommentResponseCapture,
+                                    TikTokCrawlOptions, blocked_category, blocked_url_patterns, crawl_comments,
+                                    extract_video_id)
+
+VIDEO_URL = 'https://www.tiktok.com/@toko/video/7300000000000000001'
+
+
+def api_comments(start, count):
+    return [{'cid': str(7000 + i), 'text': f"komentar nomor {i} bagus", 'create_time': 1700000000 + i,
+             'digg_count': i, 'reply_comment_total': i % 3, 'user': {'unique_id': f"user{i}"}}
+            for i in range(start, start + count)]
+
+
+class FakeDriver:
+    """只实现爬取流程用到的接口：打开页面后性能日志里的接口响应，以及页面内收集器返回的DOM行"""
+
+    def __init__(self, responses=(), dom_rows=(), blocked=()):
+        self.logs = []
+        self.bodies = {}
+        self.responses = list(responses)
+        self.dom_rows = list(dom_rows)
+        self.blocked = list(blocked)
+        self.blocked_patterns = None
+
+    def get_log(self, kind):
+        logs, self.logs = self.logs, []
+        return logs
+
+    def log(self, method, **params):
+        self.logs.append({'message': json.dumps({'message': {'method': method, 'params': params}})})
+
+    def respond(self, url, payload):
+        request_id = str(len(self.bodies) + 1)
+        self.bodies[request_id] = json.dumps(payload)
+        self.log('Network.requestWillBeSent', requestId=request_id, request={'url': url})
+        self.log('Network.responseReceived', requestId=request_id, response={'url': url})
+        self.log('Network.loadingFinished', requestId=request_id, encodedDataLength=1000)
+
+    def execute_cdp_cmd(self, command, params):
+        if command == 'Network.getResponseBody':
+            return {'body': self.bodies[params['requestId']], 'base64Encoded': False}
+        if command == 'Network.setBlockedURLs':
+            self.blocked_patterns = params['urls']
+        return {}
+
+    def get(self, url):
+        for response in self.responses:
+            self.respond(*response)
+        for index, blocked in enumerate(self.blocked):
+            self.log('Network.requestWillBeSent', requestId=f"b{index}", request={'url': blocked})
+            self.log('Network.loadingFailed', requestId=f"b{index}", blockedReason='inspector')
+        self.responses, self.blocked = [], []
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_script(self, script, *args):
+        if script is not DRAIN_COMMENTS_JS:
+            return {'selector': 'div.comment', 'pending': len(self.dom_rows)}
+        rows, self.dom_rows = self.dom_rows, []
+        return {'rows': rows, 'selector': 'div.comment', 'errors': 0}
+
+    def execute_async_script(self, script, *args):
+        return {'pending': 0, 'ended': True}
+
+
+def test_comment_api_pattern_excludes_reply_lists():
+    assert COMMENT_API_PATTERN.search('https://www.tiktok.com/api/comment/list/?aweme_id=1&cursor=20')
+    assert COMMENT_API_PATTERN.search('https://www.tiktok.com/api/comment/list')
+    assert not COMMENT_API_PATTERN.search('https://www.tiktok.com/api/comment/list/reply/?item_id=1')
+    assert not COMMENT_API_PATTERN.search('https://www.tiktok.com/api/comment/list/reply')
+
+
+def test_capture_ignores_reply_responses():
+    driver = FakeDriver([
+        ('https://www.tiktok.com/api/comment/list/?cursor=0', {'comments': api_comments(0, 3), 'cursor': 3}),
+        ('https://www.tiktok.com/api/comment/list/reply/?comment_id=7000', {'comments': api_comments(50, 2)}),
+    ])
+    driver.get(VIDEO_URL)
+    payloads = CommentResponseCapture(driver).poll()
+    assert [p['cursor'] for p in payloads] == [3]
+
+
+def test_network_capture_stops_at_max_comments():
+    driver = FakeDriver([('https://www.tiktok.com/api/comment/list/?cursor=0',
+                          {'comments': api_comments(0, 30), 'cursor': 30, 'has_more': 1})])
+    options = TikTokCrawlOptions(max_comments=10, capture_mode='network', wait_time=0.1)
+    rows, stats = crawl_comments(driver, VIDEO_URL, options)
+
+    assert len(rows) == 10
+    assert [row['comment_id'] for row in rows] == [str(7000 + i) for i in range(10)]
+    assert rows[0]['video_id'] == '7300000000000000001'
+    assert stats.responses == 1
+
+
+def test_dom_batch_stops_at_max_comments():
+    dom_rows = [{'username': f"user{i}", 'comment': f"komentar nomor {i} bagus", 'time_text': '2 hari lalu'}
+                for i in range(25)]
+    options = TikTokCrawlOptions(max_comments=10, wait_time=0.1,
+                                 comment_filter=CommentFilter(['nomor 3 ']))
+    rows, stats = crawl_comments(FakeDriver(dom_rows=dom_rows), VIDEO_URL, options)
+
+    # 被过滤的评论不占名额
+    assert len(rows) == 10
+    assert 'komentar nomor 3 bagus' not in [row['comment'] for row in rows]
+    assert sum(stats.rejected.values()) == 1
+
+
+def test_extract_video_id():
+    assert extract_video_id(VIDEO_URL) == '7300000000000000001'
+    assert extract_video_id('https://shop.tiktok.com/view/product/1') == 'unknown'
+
+
+def test_blocked_url_patterns_and_categories():
+    assert not any('jpeg' in pattern for pattern in blocked_url_patterns(block_images=False))
+    assert len(blocked_url_patterns()) > len(blocked_url_patterns(block_images=False))
+    assert blocked_category('https://v16-webapp-prime.tiktok.com/video/tos/abc') == 'media'
+    assert blocked_category('https://p16-sign.tiktokcdn.com/obj~tplv-abc.jpeg?x=1') == 'image'
+    assert blocked_category('https://www.google-analytics.com/collect') == 'tracker'
+    assert blocked_category('https://www.tiktok.com/api/comment/list/') == 'other'
+
+
+
+def test_lean_profile_blocks_and_counts_requests():
+    driver = FakeDriver([('https://www.tiktok.com/api/comment/list/?cursor=0',
+                          {'comments': api_comments(0, 3), 'cursor': 3, 'has_more': 0})],
+                        blocked=['https://v16-webapp-prime.tiktok.com/video/tos/x'])
+    rows, stats = crawl_comments(driver, VIDEO_URL, TikTokCrawlOptions(capture_mode='network', wait_time=0.1))
+
+    assert len(rows) == 3
+    assert driver.blocked_patterns == blocked_url_patterns()
+    assert stats.blocked == {'media': 1}
+    assert stats.estimated_bytes_saved() > 0
+
+    crawl_comments(driver, VIDEO_URL, TikTokCrawlOptions(lean_profile=False, wait_time=0.1))
+    # 浏览器池复用的driver按本次选项取消屏蔽
+    assert driver.blocked_patterns == []
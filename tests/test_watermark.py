@@ -0,0 +1,125 @@
+from comment_crawler.shopee import ShopeeRatingsEngine
+from comment_crawler.watermark import Watermark, WatermarkStore
+
+from conftest import BASE_CTIME
+
+TARGET = ('9', '1')
+
+
+def rating(cmtid, ctime):
+    return {'cmtid': cmtid, 'ctime': ctime, 'rating_star': 5, 'comment': f"komentar {cmtid}"}
+
+
+def backlog(count, first_id=1000, newest=BASE_CTIME):
+    """count 条从新到旧的评论，cmtid 越新越大"""
+    return [rating(first_id + count - i, newest - i * 60) for i in range(count)]
+
+
+def newer(count, first_id, above):
+    return [rating(first_id + count - i, above + (count - i) * 60) for i in range(count)]
+
+
+def run(engine, store, max_comments):
+    results, known = engine.crawl_incremental([TARGET], store, max_comments)
+    result, = results
+    assert not result.error
+    return [row['rating_id'] for row in result.rows], known
+
+
+def test_watermark_covers_and_advance():
+    mark = Watermark((100, 5))
+    assert mark.covers((100, 5)) and mark.covers((50, 1)) and not mark.covers((101, 0))
+    assert mark.reached_end((100, 5))
+
+    partial = mark.advance((200, 9), resume=(150, 7), resume_count=3)
+    assert partial == Watermark((200, 9), (150, 7), 3, floor=(100, 5))
+    assert partial.covers((160, 8)) and partial.covers((90, 1))
+    assert not partial.covers((120, 6))
+    assert not partial.reached_end((120, 6)) and partial.reached_end((100, 5))
+    assert partial.advance((200, 9)) == Watermark((200, 9))
+
+
+def test_store_round_trip(tmp_path):
+    store = WatermarkStore(str(tmp_path / 'wm.db'))
+    store.advance('9', '1', Watermark((200, 9), (150, 7), 3))
+    assert store.get_many([TARGET, ('9', '2')]) == {TARGET: Watermark((200, 9), (150, 7), 3)}
+    store.advance('9', '1', Watermark((200, 9)))
+    assert store.get_many([TARGET]) == {TARGET: Watermark((200, 9))}
+    # 水位线不后退
+    store.advance('9', '1', Watermark((100, 1)))
+    assert store.get_many([TARGET]) == {TARGET: Watermark((200, 9))}
+    store.reset()
+    assert store.get_many([TARGET]) == {}
+
+
+def test_backlog_larger_than_max_comments_is_drained(tmp_path, shopee_api):
+    shopee_api.ratings = {'1': backlog(120)}
+    store = WatermarkStore(str(tmp_path / 'wm.db'))
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url)
+
+    runs = [run(engine, store, 50) for _ in range(4)]
+    assert [len(ids) for ids, _ in runs] == [50, 50, 20, 0]
+    assert [known for _, known in runs] == [0, 1, 1, 1]
+    collected = [i for ids, _ in runs for i in ids]
+    assert sorted(collected) == sorted(r['cmtid'] for r in shopee_api.ratings['1'])
+    assert store.get_many([TARGET])[TARGET] == Watermark((BASE_CTIME, 1120))
+
+    # 积压爬完后只爬新评论
+    shopee_api.ratings['1'] = newer(5, 5000, BASE_CTIME) + shopee_api.ratings['1']
+    ids, _ = run(engine, store, 50)
+    assert sorted(ids) == list(range(5001, 5006))
+
+
+def test_new_comments_are_taken_before_backlog(tmp_path, shopee_api):
+    shopee_api.ratings = {'1': backlog(120)}
+    store = WatermarkStore(str(tmp_path / 'wm.db'))
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url)
+    first, _ = run(engine, store, 50)
+
+    shopee_api.ratings['1'] = newer(30, 5000, BASE_CTIME) + shopee_api.ratings['1']
+    second, _ = run(engine, store, 50)
+    assert second[:30] == list(range(5030, 5000, -1))
+    assert second[30:] == list(range(1070, 1050, -1))
+
+    rest = [i for _ in range(3) for i in run(engine, store, 50)[0]]
+    collected = first + second + rest
+    assert len(collected) == len(set(collected)) == 150
+
+
+def test_skip_over_crawled_rows_saves_pages(tmp_path, shopee_api):
+    shopee_api.ratings = {'1': backlog(400)}
+    store = WatermarkStore(str(tmp_path / 'wm.db'))
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url)
+    for _ in range(4):
+        run(engine, store, 50)
+    before = shopee_api.requests
+    ids, _ = run(engine, store, 50)
+    assert ids == list(range(1200, 1150, -1))
+    # 第一页遇到已爬评论后直接跳到续爬点，不必逐页翻过前200条
+    assert shopee_api.requests - before <= 3
+
+
+def test_deleted_rows_fall_back_to_paging(tmp_path, shopee_api):
+    shopee_api.ratings = {'1': backlog(120)}
+    store = WatermarkStore(str(tmp_path / 'wm.db'))
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url)
+    first, _ = run(engine, store, 50)
+    # 已爬区间中删掉几条，续爬点的位置前移
+    del shopee_api.ratings['1'][10:15]
+    second, _ = run(engine, store, 50)
+    assert second == list(range(1070, 1020, -1))
+    assert not set(first) & set(second)
+
+
+def test_new_comments_beyond_max_comments_keep_one_gap(tmp_path, shopee_api):
+    shopee_api.ratings = {'1': backlog(120)}
+    store = WatermarkStore(str(tmp_path / 'wm.db'))
+    engine = ShopeeRatingsEngine(base_url=shopee_api.url)
+    first, _ = run(engine, store, 50)
+
+    shopee_api.ratings['1'] = newer(80, 5000, BASE_CTIME) + shopee_api.ratings['1']
+    collected = first + [i for _ in range(4) for i in run(engine, store, 50)[0]]
+    # 新评论先于旧积压；超过上限时更早的积压不再补爬，但不会重复
+    assert len(collected) == len(set(collected))
+    assert set(range(5001, 5081)) <= set(collected)
+    assert store.get_many([TARGET])[TARGET].resume is None
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import Counter
+
+from comment_crawler.workqueue import DONE, FAILED, QUEUED, WorkQueue, run_worker
+
+
+def states(queue, kind='shopee'):
+    counts, _ = queue.summary()
+    return {state: count for k, state, count, _ in counts if k == kind}
+
+
+def test_uses_rollback_journal(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.db'))
+    assert queue._conn.execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+
+
+def test_enqueue_ignores_known_targets(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.db'))
+    assert queue.enqueue('shopee', ['a', 'b', 'a']) == 2
+    assert queue.enqueue('shopee', ['b', 'c']) == 1
+    assert queue.enqueue('tt_product', ['a']) == 1
+    assert queue.pending('shopee') == 3
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.db'))
+    queue.enqueue('shopee', ['a', 'b', 'c'])
+    first = queue.lease('shopee', 'w1', limit=2, lease_seconds=0.05)
+    assert [task.target for task in first] == ['a', 'b']
+    second = queue.lease('shopee', 'w2', limit=5, lease_seconds=60)
+    assert [task.target for task in second] == ['c']
+    assert queue.lease('shopee', 'w2', limit=5) == []
+
+    time.sleep(0.1)
+    taken = queue.lease('shopee', 'w2', limit=5, lease_seconds=60)
+    assert [(task.target, task.attempts) for task in taken] == [('a', 2), ('b', 2)]
+    assert queue.heartbeat(first) == set()
+    assert queue.heartbeat(taken) == {task.id for task in taken}
+    assert queue.summary()[1] == {'w2': 3}
+
+
+def test_complete_and_fail_check_the_lease_token(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.db'))
+    queue.enqueue('shopee', ['a', 'b'])
+    stale = queue.lease('shopee', 'w1', lease_seconds=0.05)
+    time.sleep(0.1)
+    current = queue.lease('shopee', 'w2', lease_seconds=60)
+
+    # 过期租约的结果不会覆盖新持有者
+    assert not queue.complete(stale[0], 10)
+    assert not queue.fail(stale[1], "超时")
+    assert queue.complete(current[0], 5)
+    assert not queue.complete(current[0], 5)
+    assert queue.fail(current[1], "超时")
+    assert states(queue) == {DONE: 1, QUEUED: 1}
+
+
+def test_failures_stop_at_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.db'), max_attempts=2)
+    queue.enqueue('shopee', ['a', 'b'])
+    for _ in range(2):
+        task, = queue.lease('shopee', 'w', limit=1)
+        assert task.target == 'a'
+        queue.fail(task, "404")
+    assert states(queue) == {FAILED: 1, QUEUED: 1}
+    assert queue.failures() == [('shopee', 'a', 2, "404")]
+
+    # 不可重试的错误直接失败
+    task, = queue.lease('shopee', 'w')
+    queue.fail(task, "无效目标", retry=False)
+    assert states(queue) == {FAILED: 2}
+
+    assert queue.retry_failed('shopee') == 2
+    assert [task.attempts for task in queue.lease('shopee', 'w')] == [1, 1]
+
+
+def test_expired_leases_count_towards_max_attempts(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.db'), max_attempts=2)
+    queue.enqueue('shopee', ['a'])
+    for _ in range(2):
+        assert queue.lease('shopee', 'w', lease_seconds=0.01)
+        time.sleep(0.05)
+    assert queue.lease('shopee', 'w') == []
+    assert states(queue) == {FAILED: 1}
+    assert queue.pending('shopee') == 0
+
+
+def test_run_worker_releases_unreported_targets(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'q.db'), max_attempts=1)
+    queue.enqueue('shopee', ['a', 'b', 'c'])
+    written = []
+
+    def crawl(targets, on_result):
+        on_result('a', [{'id': 1}])
+        on_result('b', [], "HTTP 500")
+
+    assert run_worker(queue, 'shopee', crawl, written.extend, 'w') == (1, 2)
+    assert written == [{'id': 1}]
+    assert states(queue) == {DONE: 1, FAILED: 2}
+
+
+def test_concurrent_workers_never_share_a_target(tmp_path):
+    path = str(tmp_path / 'q.db')
+    WorkQueue(path).enqueue('shopee', [str(i) for i in range(60)])
+    crawled = Counter()
+    lock = threading.Lock()
+    results = {}
+
+    def crawl(targets, on_result):
+        for target in targets:
+            with lock:
+                crawled[target] += 1
+            time.sleep(0.002)
+            on_result(target, [target])
+
+    def worker(name):
+        # 每个爬虫用自己的连接，和分布在多个进程/机器上时一样靠SQLite的写锁串行化领取
+        queue = WorkQueue(path)
+        results[name] = run_worker(queue, 'shopee', crawl, lambda rows: None, name, batch_size=4, poll=0.01)
+        queue.close()
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert set(crawled) == {str(i) for i in range(60)}
+    assert max(crawled.values()) == 1
+    assert sum(done for done, _ in results.values()) == 60
+    assert all(done for done, _ in results.values())
+    assert states(WorkQueue(path)) == {DONE: 60}